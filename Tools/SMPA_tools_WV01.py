@@ -2,12 +2,22 @@
 # Module: SMPA_tools_V02
 # Purpose:  A library of many different functions that are used from several scripts
 # Functions:    1    time_calculations
+#               1.1  _elapsed_seconds
 #               2    set_time_for_SPC_to_datetime
 #               3    read_all
 #               4    df_uc_for_app
 #               5    df_spc_for_app
 #               6    calculate_strain
 #               7    calculate_rate_of_variable
+#               7.1  _section_slopes
+#               7.2  _section_rows
+#               7.3  _weighted_slopes
+#               7.4  _group_medians
+#               7.5  _pair_slopes
+#               7.6  _random_members
+#               7.7  _theil_sen_slopes
+#               7.8  _repeated_median_slopes
+#               7.9  _rate_of_variable_loop
 #               8    smoothen_curve
 #               9    part_of_curve
 #               10   calc_polynomial
@@ -21,12 +31,76 @@
 #               18   calculate_t0_index
 #               19   calculate_tR_index
 #               20   plot_u0_and_uR
+#               21   file_signature
+#               22   read_sidecar
+#               22.1 _sidecar_path
+#               22.2 _report_no_sidecars
+#               23   write_sidecar
+#               24   load_in_parallel
+#               25   read_csv_columns
+#               26   follow_csv
+#               26.1 _grow
+#               27   calendar_columns
+#               28   infer_time_parser
+#               28.1 _day_month_order
+#               28.2 _day_month_swap
+#               29   parse_time_column
+#               29.1 _parse_time_chunk
+#               29.2 _swap_day_month
+#               30   register_format_reader
+#               31   detect_format
+#               31.1 _head
+#               31.2 _find_line
+#               32   read_format
+#               32.1 _detect_campbell_log_data
+#               32.2 _read_campbell_log_data
+#               32.3 _detect_old_daq
+#               32.4 _read_old_daq
+#               32.5 _phoenix_header
+#               32.6 _phoenix_time_is_number
+#               32.7 _detect_phoenix_1
+#               32.8 _detect_phoenix_2
+#               32.9 _read_phoenix
+#               33   stitch_segments
+#               34   compact_experiment
+#               34.1 _float32_allowed
+#               35   elapsed_units
+#               36   calculate_local_rate
+#               36.1 _local_linear_slopes
+#               36.2 _convolve_valid
+#               36.3 _local_polynomial_slopes
+#               37   smooth_values
+#               38   find_minimum_rate_window
+#               39   find_rate_minima
+#               39.1 _sparse_table
+#               39.2 _range_query
+#               39.3 _nearest_lower
+#               40   fit_local_minimum
+#               41   flag_multiple_minima
+#               42   detect_trim_bounds
+#               43   segment_creep_stages
+#               43.1 _moments
+#               43.2 _segment_costs
+#               43.3 _best_change_points
+#               44   creep_stage_table
+#               45   trim_experiment
+#               46   trimmed_column
+#               47   downsample_indices
+#               47.1 _minmax_indices
+#               47.2 _lttb_indices
+#               48   build_minmax_pyramid
+#               49   query_pyramid
+#               49.1 _pyramid_extremes
+#               50   column_summary
+#               51   stitch_live_segments
 #           
 # External packages:
 #           |_____________  pandas
 #           |_____________  numpy
 #           |_____________  matplotlib
 #           |_____________  os
+#           |_____________  pyarrow (optional, for the columnar sidecar files)
+#           |_____________  concurrent.futures
 #
 # Author:   Georgia Manou, georgia.manou@outlook.com
 # Version:  2.0, 15th March 2024
@@ -40,75 +114,102 @@
 # Packages related to data manipulation
 import pandas as pd
 import numpy as np
+from pandas.tseries.api import guess_datetime_format
 
 # Package related to plotting
 import matplotlib.pyplot as plt
 
 # Packages related to directory handling
 import os
+import io
+import hashlib
+import itertools
+
+# Packages related to concurrency, timing, warnings and logging
+import time
+import warnings
+import logging
+from concurrent.futures import ThreadPoolExecutor
     
 ##################################################################################################################################################################################################
 ###########################################################               Function 1                 #############################################################################################
 ##################################################################################################################################################################################################
 
-def time_calculations(dataframe):
+def _elapsed_seconds(times, origin=None):
+    #------------------------------------------------------------------------------------
+    # Function: _elapsed_seconds
+    # Purpose:  Calculates the seconds elapsed since the origin for an array of timestamps, on the int64 nanoseconds in one pass
+    # Input:    times           ... a vector of datetime64 values
+    #           origin          ... the datetime64 origin, or None for the first valid timestamp
+    # Output:   seconds         ... a vector of the elapsed seconds (NaN for NaT)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    times = np.asarray(times, dtype='datetime64[ns]')
+    if origin is None:
+        valid = times[~np.isnat(times)]
+        if len(valid) == 0:
+            return np.full(len(times), np.nan)
+        origin = valid[0]
+    return (times - origin) / np.timedelta64(1, 's')
+
+def time_calculations(dataframe, calendar=False):
     #------------------------------------------------------------------------------------
     # Function: time_calculations
-    # Purpose:  From a pandas datetime object it derives and puts into separate columns the following:
-    #             Date
-    #             Time
-    #             Hour
-    #             Minute
-    #             Seconds
-    #           and calculates and puts into separate columns the following:
+    # Purpose:  From a pandas datetime column 'DateTime' it calculates and puts into separate columns the following:
     #             Total seconds since the beginning of the experiment
     #             Total minutes since the beginning of the experiment
     #             Total Hours since the beginning of the experiment
+    #           The timestamps are parsed once (only if they are not datetime already) and the elapsed time is computed on their
+    #           int64 nanoseconds, so the sub-second resolution is kept. The beginning of the experiment is the first valid timestamp
+    #           Optionally, it also derives the calendar columns Date, Time, Hour, Minute and Second (see Function 27)
     # Input:    dataframe     ... a pandas dataframe
+    #           calendar      ... if True, the calendar columns are also created
     # Output:   dataframe     ... the samme dataframe that was provided as input but appended with the calculations 
     #           
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/calendar_columns
     # External packages:
     #           |_____________  pandas
+    #           |_____________  numpy
     #
     # Author:   Georgia Manou, georgia.manou@outlook.com
     # Version:  1.0, 15th March 2024
     #------------------------------------------------------------------------------------ 
     
     # --- Start function ---
-    dataframe['Date'] = pd.to_datetime(dataframe['DateTime']).dt.date
-    dataframe['Time'] = pd.to_datetime(dataframe['DateTime']).dt.time
-    dataframe['Hour'] = pd.to_datetime(dataframe['DateTime']).dt.hour
-    dataframe['Minute'] = pd.to_datetime(dataframe['DateTime']).dt.minute
-    dataframe['Second'] = pd.to_datetime(dataframe['DateTime']).dt.second
-    dataframe['TotalSeconds'] = dataframe['DateTime'].diff().dt.total_seconds().cumsum()       # Calculate the total amount of seconds since the start of the experimet
-    dataframe.loc[0, 'TotalSeconds'] = 0
-    dataframe['TotalSeconds'] = dataframe['TotalSeconds'].astype(int, errors='ignore')
-    dataframe['TotalMinutes'] = dataframe['TotalSeconds']/60
-    dataframe['TotalHours'] = dataframe['TotalSeconds']/3600
+    if not pd.api.types.is_datetime64_any_dtype(dataframe['DateTime']):
+        dataframe['DateTime'] = pd.to_datetime(dataframe['DateTime'])
+    seconds = _elapsed_seconds(dataframe['DateTime'].values)
+    dataframe['TotalSeconds'] = seconds                                                      # Total amount of seconds since the start of the experiment
+    dataframe['TotalMinutes'] = seconds/60
+    dataframe['TotalHours'] = seconds/3600
+    if calendar == True:
+        calendar_columns(dataframe)
     return dataframe
 
 ##################################################################################################################################################################################################
 ###########################################################               Function 2                 #############################################################################################
 ##################################################################################################################################################################################################
 
-def set_time_for_SPC_to_datetime(dataframe):
+def set_time_for_SPC_to_datetime(dataframe, source=None, time_parsers=None):
     #------------------------------------------------------------------------------------
     # Function: set_time_for_SPC_to_datetime
     # Purpose:  Transforms the time column into a pandas datetime object
-    #           From this it derives and puts into separate columns the following:
-    #             Date
-    #             Time
-    #             Hour
-    #             Minute
-    #             Seconds
-    #           and calculates and puts into separate columns the following:
+    #           From this it calculates and puts into separate columns the following:
     #             Total seconds since the beginning of the experiment
     #             Total minutes since the beginning of the experiment
     #             Total Hours since the beginning of the experiment
+    #           The number of timestamps that could not be parsed (NaT) is stored in dataframe.attrs['coerced_timestamps']
     # Input:    dataframe     ... a pandas dataframe
+    #           source        ... a hashable identifying the rig/source of the file, to remember its time format (see Function 29)
+    #           time_parsers  ... a dictionary of the time formats remembered per source, or None
     # Output:   dataframe     ... the samme dataframe that was provided as input but with the time column transformed and appended with the calculations 
     # 
     # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/parse_time_column
     #           |_____________  SMPA_tools_v02.py/time_calculations        
     # External packages:
     #           |_____________  pandas
@@ -118,15 +219,12 @@ def set_time_for_SPC_to_datetime(dataframe):
     #------------------------------------------------------------------------------------ 
     
     # --- Start function ---
-    if dataframe.dtypes.iloc[0] != 'object':                                                # Phoenix - Format 2. When the 'Time' column is recorded in seconds, as in 0,1,2...
-        dataframe['DateTime'] = pd.to_datetime(dataframe['DateTime'], unit='s')
-        #print('The DateTime shown in the respective column is not the actual of the experiment. The time increment is indeed 1s')
-        # Create different columns for Date, Time, Hours, Minutes, Seconds, TotalSeconds and TotalHours since the start of each experiment
-        time_calculations(dataframe)
-    else:                                                                                   # Phoenix - Format 1 or FAST.
-        dataframe['DateTime'] = pd.to_datetime(dataframe['DateTime'], format = '%d-0%m-%y %H:%M:%S.%f')            
-        # Create different columns for Date, Time, Hours, Minutes, Seconds, TotalSeconds and TotalHours since the start of each experiment
-        time_calculations(dataframe)
+    # Phoenix - Format 2: the 'Time' column is recorded in seconds, as in 0,1,2... (the DateTime is then not the actual one of the experiment)
+    # Phoenix - Format 1 or FAST: the 'Time' column is recorded as '%d-0%m-%y %H:%M:%S.%f'
+    # Both are recognized by the format inference, which is remembered per source
+    dataframe['DateTime'], dataframe.attrs['coerced_timestamps'] = parse_time_column(dataframe['DateTime'], source, time_parsers)
+    # Create different columns for TotalSeconds, TotalMinutes and TotalHours since the start of each experiment
+    time_calculations(dataframe)
     return dataframe
 
 ##################################################################################################################################################################################################
@@ -137,12 +235,15 @@ def read_all(*args):
     #------------------------------------------------------------------------------------
     # Function: read_all
     # Purpose:  Reads all the data formats of Small punch creep and Uniaxial creep files, including Old_DAQ_Software format BUT NOT .tdms files        
-    #           Performs some initial cleaning/preprocessing of the data (e.g. removal of whitespaces), transformation of datatypes (e.g. time to pandas datetime), renaming of columns, calculation of extra columns related to time
+    #           The format of every file is recognized from its header (see Functions 30-32), and the file is read by the reader of its format,
+    #           which performs some initial cleaning/preprocessing of the data (e.g. removal of whitespaces), transformation of datatypes (e.g. time to pandas datetime), renaming of columns, calculation of extra columns related to time
+    #           All the files must be of the same format. They are the segments of one experiment and are stitched in the order they were given (see Function 33)
     # Input:    *args       ... a number of paths that is not predefined. The paths are full paths including each file's extension
     # Output:   df          ... a pandas dataframe (data tabular form)          
     # Internal functions:
-    #           |_____________  SMPA_tools_v02.py/time_calculations
-    #           |_____________  SMPA_tools_v02.py/set_time_for_SPC_to_datetime
+    #           |_____________  SMPA_tools_v02.py/detect_format
+    #           |_____________  SMPA_tools_v02.py/read_format
+    #           |_____________  SMPA_tools_v02.py/stitch_segments
     # External packages:
     #           |_____________  pandas
     # Author:   Georgia Manou, georgia.manou@outlook.com
@@ -150,9 +251,6 @@ def read_all(*args):
     #------------------------------------------------------------------------------------ 
     
     # --- Start function ---
-    count_uniaxial = 0
-    count_old_DAQ = 0
-    
     files = []
     count_arg = 0
     for arg in args:
@@ -160,112 +258,35 @@ def read_all(*args):
         if ('.csv' not in arg) & ('.txt' not in arg):
             print('The path number', count_arg, ' that you have provided is not a full path. Please provide the full path(s) of the experiment(s) you want to analyse')
             return
-        
         files.append(arg)
-        
-        if 'Log_Data' in arg:
-            count_uniaxial += 1
-        if 'Old_DAQ_Software' in arg:
-            count_old_DAQ += 1
     
     if len(files) == 0:
         print('You have not selected any files')
-            
-    if ((count_uniaxial != 0) & (count_uniaxial != len(files))) | ((count_old_DAQ != 0) & (count_old_DAQ != len(files))):
+        return
+
+    formats = [detect_format(file) for file in files]
+    if None in formats:
+        print('The format of the path number', formats.index(None) + 1, 'could not be recognized.')
+        return
+    if len(set(formats)) > 1:
         print('You have provided paths that correspond to different experiments or experiment formats. Please check again your inputs to the function.')
         return
-    
-    # Uniaxial Creep
-    if (count_uniaxial != 0) & (count_uniaxial == len(files)):
-        df = pd.read_csv(files[0], skiprows=[0,2,3], na_values="NAN")
-        df.rename(columns=lambda x: x.strip(), inplace=True)                                                       
-        if "OrbitDP10(1)" not in df.columns:
-            df.rename(columns={'TIMESTAMP': 'DateTime', 'LVDT(1)': 'lvdt1', 'LVDT(2)': 'lvdt2'}, inplace=True)
-        else:
-            df.rename(columns={'TIMESTAMP': 'DateTime', 'OrbitDP10(1)': 'lvdt1', 'OrbitDP10(2)': 'lvdt2'}, inplace=True)
-        df['DateTime'] = pd.to_datetime(df['DateTime'], format = '%Y-%m-%d %H:%M:%S')
-        time_calculations(df)
-        if len(files) > 1:
-            for i in range(1, len(files)):
-                df_additional = pd.read_csv(files[i], skiprows=[0,2,3], na_values="NAN")
-                df_additional.rename(columns=lambda x: x.strip(), inplace=True)                                   
-                if "OrbitDP10(1)" not in df_additional.columns:
-                    df_additional.rename(columns={'TIMESTAMP': 'DateTime', 'LVDT(1)': 'lvdt1', 'LVDT(2)': 'lvdt2'}, inplace=True)
-                else:
-                    df_additional.rename(columns={'TIMESTAMP': 'DateTime', 'OrbitDP10(1)': 'lvdt1', 'OrbitDP10(2)': 'lvdt2'}, inplace=True)
-                df_additional['DateTime'] = pd.to_datetime(df['DateTime'], format = '%Y-%m-%d %H:%M:%S')
-                time_calculations(df_additional)                                                                   
-                df = pd.concat([df, df_additional])
-        df.reset_index(inplace=True)
-        df.drop(columns=['index'], inplace=True)
-    
-    # SPC - Format: "Old DAQ Software" with file extention ".txt"
-    if (count_old_DAQ != 0) & (count_old_DAQ == len(files)):
-        with open(files[0]) as f:
-            lines=f.readlines()
-        counter = 0
-        for line in lines:
-            counter += 1
-            if (''.join(line).startswith('index')):
-                header_rows = counter
-                break
-        df = pd.read_csv(files[0], encoding='ansi', sep='\t', skiprows=header_rows, names=['index', 'DateTime', 'Temperature', 'Force', 'u', 'lvdt_AUX', 'flag', 'trigger'])
-        df = df.iloc[:len(df)-1 , 1:]
-        df['DateTime'] = pd.to_datetime(df['DateTime'], unit='s')
-        time_calculations(df)
-        if len(files) > 1:
-            for i in range(1, len(files)):
-                with open(files[i]):
-                    lines=i.readlines()
-                counter = 0
-                for line in lines:
-                    counter += 1
-                    if (''.join(line).startswith('index')):
-                        header_rows = counter
-                        break
-                df_additional = pd.read_csv(files[i], encoding='ansi', sep='\t', skiprows=header_rows, names=['index', 'DateTime', 'Temperature', 'Force', 'u', 'lvdt_AUX', 'flag', 'trigger'])
-                df_additional = df.iloc[:len(df)-1 , 1:]
-                df_additional['DateTime'] = pd.to_datetime(df_additional['DateTime'], unit='s')
-                time_calculations(df_additional)
-                
-                df = pd.concat([df, df_additional])
-        df.reset_index(inplace=True)
-        df.drop(columns=['index'], inplace=True)                
-                
-    # SPC - Format: with extention ".csv" where the time is either in datetime or in seconds
-    if (count_uniaxial == 0) & (count_old_DAQ == 0):
-        df = pd.read_csv(files[0])
-        df.rename(columns=lambda x: x.strip(), inplace=True)                                                      # It strips whitespaces from the columns' names
-        df.rename(columns={'Time': 'DateTime', 'LVDT_main': 'u'}, inplace=True)
-        set_time_for_SPC_to_datetime(df)                                                                      # It sets the DateTime to pandas datetime64 format
-        if len(files) > 1:
-            for i in range(1, len(files)):
-                df_additional = pd.read_csv(files[i])
-                df_additional.rename(columns=lambda x: x.strip(), inplace=True)                                   # It strips whitespaces from the columns' names
-                df_additional.rename(columns={'Time': 'DateTime', 'LVDT_main': 'u'}, inplace=True)
-                set_time_for_SPC_to_datetime(df_additional)                                                   # It sets the DateTime to pandas datetime64 format
-                df = pd.concat([df, df_additional])
-        df.reset_index(inplace=True)
-        df.drop(columns=['index'], inplace=True)          
-    
+
+    frames = [read_format(file, formats[0]) for file in files]
+    df = stitch_segments(frames)
     return df
 
 ##################################################################################################################################################################################################
 ###########################################################               Function 4                 #############################################################################################
 ##################################################################################################################################################################################################
 
-def df_uc_for_app(dataframe, time_col, lvdt1_col, lvdt2_col):
+def df_uc_for_app(dataframe, time_col, lvdt1_col, lvdt2_col, source=None, time_parsers=None):
     #------------------------------------------------------------------------------------
     # Function: df_uc_for_app
     # Use:      Web application solely
     # Purpose:  Renames columns
     #           Transforms time data to pandas datetime format
     #           Performs calculations related to the time column. It calculates and creates the following extra columns:
-    #             Date
-    #             Time
-    #             Hour
-    #             Minute
-    #             Seconds
     #             Total seconds since the beginning of the experiment
     #             Total minutes since the beginning of the experiment
     #             Total Hours since the beginning of the experiment
@@ -273,8 +294,12 @@ def df_uc_for_app(dataframe, time_col, lvdt1_col, lvdt2_col):
     #           time_col        ... exact name of the time column of the log data file
     #           lvdt1_col       ... exact name of the LVDT1 column of the log data file
     #           lvdt2_col       ... exact name of the LVDT2 column of the log data file
+    #           source          ... a hashable identifying the rig/source of the file, to remember its time format (see Function 29)
+    #           time_parsers    ... a dictionary of the time formats remembered per source (see Function 29), or None
     # Output:   dataframe       ... a pandas dataframe           
+    #                               The number of timestamps that could not be parsed (NaT) is stored in dataframe.attrs['coerced_timestamps']
     # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/parse_time_column
     #           |_____________  SMPA_tools_v02.py/time_calculations
     # External packages:
     #           |_____________  pandas
@@ -284,7 +309,7 @@ def df_uc_for_app(dataframe, time_col, lvdt1_col, lvdt2_col):
 
     # --- Start function ---
     dataframe.rename(columns={time_col: 'DateTime', lvdt1_col: 'lvdt1', lvdt2_col: 'lvdt2'}, inplace=True)
-    dataframe['DateTime'] = pd.to_datetime(dataframe['DateTime'])#, format='mixed')
+    dataframe['DateTime'], dataframe.attrs['coerced_timestamps'] = parse_time_column(dataframe['DateTime'], source, time_parsers)
     time_calculations(dataframe)
     return dataframe
 
@@ -292,18 +317,13 @@ def df_uc_for_app(dataframe, time_col, lvdt1_col, lvdt2_col):
 ###########################################################               Function 5                 #############################################################################################
 ##################################################################################################################################################################################################
 
-def df_spc_for_app(dataframe, time_col, u_col, force_col, temp_col):
+def df_spc_for_app(dataframe, time_col, u_col, force_col, temp_col, source=None, time_parsers=None):
     #------------------------------------------------------------------------------------
     # Function: df_spc_for_app
     # Use:      Web application solely
     # Purpose:  Renames columns
     #           Transforms time data to pandas datetime format
     #           Performs calculations related to the time column. It calculates and creates the following extra columns:
-    #             Date
-    #             Time
-    #             Hour
-    #             Minute
-    #             Seconds
     #             Total seconds since the beginning of the experiment
     #             Total minutes since the beginning of the experiment
     #             Total Hours since the beginning of the experiment
@@ -312,8 +332,12 @@ def df_spc_for_app(dataframe, time_col, u_col, force_col, temp_col):
     #           u_col           ... exact name of the deflection (u) column of the log data file
     #           force_col       ... exact name of the LVDT2 column of the log data file
     #           temp_col        ... exact name of the LVDT2 column of the log data file
+    #           source          ... a hashable identifying the rig/source of the file, to remember its time format (see Function 29)
+    #           time_parsers    ... a dictionary of the time formats remembered per source (see Function 29), or None
     # Output:   dataframe       ... a pandas dataframe           
+    #                               The number of timestamps that could not be parsed (NaT) is stored in dataframe.attrs['coerced_timestamps']
     # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/parse_time_column
     #           |_____________  SMPA_tools_v02.py/time_calculations
     # External packages:
     #           |_____________  pandas
@@ -323,7 +347,7 @@ def df_spc_for_app(dataframe, time_col, u_col, force_col, temp_col):
 
     # --- Start function ---   
     dataframe.rename(columns={time_col: 'DateTime', u_col: 'u', force_col: 'Force', temp_col: 'Temperature'}, inplace=True)
-    dataframe['DateTime'] = pd.to_datetime(dataframe['DateTime'], errors = 'coerce')#, format='%d-0%m-%y %H:%M:%S.%f')
+    dataframe['DateTime'], dataframe.attrs['coerced_timestamps'] = parse_time_column(dataframe['DateTime'], source, time_parsers)
     time_calculations(dataframe)
     return dataframe
 
@@ -331,42 +355,43 @@ def df_spc_for_app(dataframe, time_col, u_col, force_col, temp_col):
 ###########################################################               Function 6                 #############################################################################################
 ##################################################################################################################################################################################################
 
-def calculate_strain(dataframe, gauge_length):
+def calculate_strain(dataframe, gauge_length, channels=None, combine='mean'):
     #------------------------------------------------------------------------------------
     # Function: calculate_strain
-    # Purpose:  Calculates strain1, strain2, and average strain based on the values of LVDT1, LVDT2, and the average of the two LVDTs, respectively
+    # Purpose:  Calculates the strain of every displacement channel (LVDT or extensometer) and the average (or median) strain of all the channels
+    #           The displacement of every channel is its first valid reading minus its readings, the strain is the displacement over the gauge length in %
+    #           All the channels are calculated at once, as the columns of one 2-D array, and written as float32 columns
+    #           disp1, disp2, ..., strain1, strain2, ... (numbered in the order of the channels) and strain_avg, the combined strain of all the channels
+    #           (their mean, or their median with combine='median'), which is the column the app plots for the average of the LVDTs
     # Input:    datarame           ... a pandas dataframe
-    #           gauge_length       ... an integer or a string indicating a number
+    #           gauge_length       ... a number or a string indicating a number (in the units of the displacement, fractional lengths are kept)
+    #           channels           ... the columns of the displacement channels, by default all the 'lvdt' columns (lvdt1, lvdt2, ...)
+    #           combine            ... 'mean' or 'median', the strain that combines all the channels
     # Output:   datarame           ... a pandas dataframe appended with the calculated columns
     # External packages:
     #           |_____________  pandas
+    #           |_____________  numpy
     # Author:   Georgia Manou, georgia.manou@outlook.com
     # Version:  1.0, 15th March 2024
     #------------------------------------------------------------------------------------ 
     
     # --- Start function ---
-    dataframe.loc[0, 'disp1'] = 0
-    dataframe.loc[0, 'disp2'] = 0
-    dataframe.loc[0, 'strain1'] = 0
-    dataframe.loc[0, 'strain2'] = 0
-    dataframe.loc[0, 'strain_avg'] = 0
-
-    # # Alternative 1 - much slower
-    # for row in range(1, len(dataframe)):
-    #     dataframe.loc[row, 'disp1'] = dataframe.loc[0, 'lvdt1'] - dataframe.loc[row, 'lvdt1']
-    #     dataframe.loc[row, 'disp2'] = dataframe.loc[0, 'lvdt2'] - dataframe.loc[row, 'lvdt2']
+    if channels is None:
+        channels = sorted((column for column in dataframe.columns if str(column).startswith('lvdt')), key=lambda column: (len(column), column))
+    readings = dataframe[list(channels)].to_numpy(dtype='float64')
+    valid = np.isfinite(readings)
+    first = readings[valid.argmax(axis=0), np.arange(readings.shape[1])]            # The first valid reading of every channel
 
-    #     dataframe.loc[row, 'strain1'] = (dataframe.loc[row, 'disp1']/gauge_length)*100                    
-    #     dataframe.loc[row, 'strain2'] = (dataframe.loc[row, 'disp2']/gauge_length)*100
+    disp = np.subtract(first, readings, out=np.empty(readings.shape, dtype='float32'))  # Subtracted in double precision, written in single precision
+    strain = disp*np.float32(100/float(gauge_length))                               # in %
+    for k in range(len(channels)):
+        dataframe['disp' + str(k+1)] = disp[:, k]
+        dataframe['strain' + str(k+1)] = strain[:, k]
 
-    # Alternative 2 - fast!!
-    dataframe.loc[1:, 'disp1'] = dataframe.loc[0, 'lvdt1'] - dataframe.loc[1:, 'lvdt1'].astype('float')
-    dataframe.loc[1:, 'disp2'] = dataframe.loc[0, 'lvdt2'] - dataframe.loc[1:, 'lvdt2']  
-
-    dataframe.loc[1:, 'strain1'] = (dataframe.loc[1:, 'disp1']/int(gauge_length))*100            # in %                
-    dataframe.loc[1:, 'strain2'] = (dataframe.loc[1:, 'disp2']/int(gauge_length))*100            # in %
-    
-    dataframe.loc[1:, 'strain_avg'] = (dataframe.loc[1:, 'strain1']+dataframe.loc[1:, 'strain2'])/2
+    if combine == 'median':
+        dataframe['strain_avg'] = np.median(strain, axis=1)
+    else:
+        dataframe['strain_avg'] = strain.mean(axis=1, dtype='float32')
 
     return dataframe 
 
@@ -374,11 +399,24 @@ def calculate_strain(dataframe, gauge_length):
 ###########################################################               Function 7                 #############################################################################################
 ##################################################################################################################################################################################################
 
-def calculate_rate_of_variable(dataframe, variable, interval, t0, tR):
+RATE_METHODS = ('least squares', 'theil-sen', 'huber', 'repeated median')
+HUBER_CONSTANT = 1.345                                  # The threshold of the Huber weights, in robust standard deviations of the residuals of a section
+
+def calculate_rate_of_variable(dataframe, variable, interval, t0, tR, method='least squares'):
     #------------------------------------------------------------------------------------
     # Function: calculate_rate_of_variable
     # Purpose:  Calculates the rate/first derivative of a curve by splitting the dataset into a certain number of sections
     #           and in each section calculating the slope
+    #           The section k spans from the end of the previous section (t0 for the first) to the first time record at or after t0 + (k+1)*interval, both included
+    #           The bounds of all the sections are found with a binary search on the (monotonic) time and all the slopes are calculated at once,
+    #           as least-squares slopes of the points of each section. If the time is not monotonic, or tR is beyond the data, the sections are found one by one
+    #           The columns are read with trimmed_column, so that experiments trimmed with trim_experiment start from zero time
+    #           The slope of each section is, depending on the method:
+    #               'least squares'   ... the least-squares slope
+    #               'theil-sen'       ... the median of the slopes of 1000 random pairs of points of the section
+    #               'huber'           ... the Huber regression slope (iteratively reweighted least squares), which limits the pull of spikes and glitches
+    #               'repeated median' ... the median over 64 random points of the section of the median slope of each point with 32 random other points
+    #           The robust slopes are calculated for all the sections at once as well (the random pairs are the same on every call)
     # Input:    dataframe        ... a pandas dataframe
     #           variable         ... a string indicating deflection or strain, that can take the following values:
     #                                   'u'
@@ -388,11 +426,14 @@ def calculate_rate_of_variable(dataframe, variable, interval, t0, tR):
     #           interval         ... a number indicating the amount of points that fall into each section
     #           t0               ... time in seconds when the experiment started
     #           tR               ... time to rupture in seconds
+    #           method           ... one of RATE_METHODS, the estimator of the slope of each section
     # Output:   rate_points      ... a vector of all the calculated rates
     #           t_points         ... a vector of time records that correspond to the middle of each section (calculated so that we can realistically plot rates over time)
     #                                The times correspond to the middle of each section
     #           var_points       ... a vector of deflections/strains that correspong to the middle of each section (calculated to match deflections/strains to their rates in the same point in time)
     #           
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/trimmed_column
     # External packages:
     #           |_____________  pandas
     #           |_____________  numpy
@@ -401,6 +442,242 @@ def calculate_rate_of_variable(dataframe, variable, interval, t0, tR):
     # Version:  1.0, 15th March 2024
     #------------------------------------------------------------------------------------ 
     
+    # --- Start function ---
+    starts = []
+    i = t0
+    while i < tR - interval:
+        starts.append(i)
+        i+=interval
+    if len(starts) == 0:
+        return [], [], []
+
+    seconds = trimmed_column(dataframe, 'TotalSeconds').astype('float64')
+    hours = trimmed_column(dataframe, 'TotalHours').astype('float64')
+    values = trimmed_column(dataframe, variable)
+    if (len(seconds) == 0) or np.isnan(seconds).any() or (np.diff(seconds) < 0).any() or (starts[-1] + interval > seconds[-1]):
+        return _rate_of_variable_loop(pd.DataFrame({'TotalSeconds': seconds, 'TotalHours': hours, variable: values}), variable, interval, t0, tR, method)
+
+    # Bounds of the sections: the end of each section is also its "middle" record, as in the original walk over the records
+    middle = np.searchsorted(seconds, np.asarray(starts) + interval, side='left')
+    high = seconds[middle]
+    low = np.concatenate(([t0], high[:-1]))
+    first = np.searchsorted(seconds, low, side='left')
+    last = np.searchsorted(seconds, high, side='right')
+    rate_points = _section_slopes(hours, values.astype('float64'), first, last, method)
+
+    return list(rate_points), list(hours[middle]), list(values[middle])
+
+def _section_slopes(x, y, first, last, method='least squares'):
+    #------------------------------------------------------------------------------------
+    # Function: _section_slopes
+    # Purpose:  Calculates the slopes of y over x in the sections [first, last) at once for all the sections, with a method of RATE_METHODS
+    #           The sections may share their end points. The robust methods limit the pull of spikes and glitches (see Function 7)
+    # Input:    x, y            ... vectors of the coordinates of the records, x sorted
+    #           first, last     ... vectors of the first and the (excluded) last record of every section
+    #           method          ... one of RATE_METHODS
+    # Output:   slopes          ... a vector of the slopes of the sections (NaN for sections with less than two distinct x)
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_section_rows
+    #           |_____________  SMPA_tools_v02.py/_weighted_slopes
+    #           |_____________  SMPA_tools_v02.py/_group_medians
+    #           |_____________  SMPA_tools_v02.py/_theil_sen_slopes
+    #           |_____________  SMPA_tools_v02.py/_repeated_median_slopes
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    sections = len(first)
+    section, rows = _section_rows(first, last)
+    xs = x[rows]
+    ys = y[rows]
+    if method == 'theil-sen':
+        slopes = _theil_sen_slopes(xs, ys, first, last)
+    elif method == 'repeated median':
+        slopes = _repeated_median_slopes(xs, ys, first, last)
+    elif method in ('least squares', 'huber'):
+        slopes, residuals = _weighted_slopes(section, xs, ys, np.ones(len(xs)), sections)
+        if method == 'huber':
+            scale = 1.4826*_group_medians(section, np.abs(residuals), sections)   # The robust scale of the residuals (MAD), kept fixed in the iterations
+            for iteration in range(50):                                          # Iteratively reweighted least squares with the Huber weights
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    weights = np.minimum(1, HUBER_CONSTANT*scale[section]/np.abs(residuals))
+                weights[~np.isfinite(weights)] = 1
+                previous = slopes
+                slopes, residuals = _weighted_slopes(section, xs, ys, weights, sections)
+                if np.allclose(slopes, previous, rtol=1e-6, atol=0, equal_nan=True):
+                    break
+    else:
+        raise ValueError("Unknown rate estimator: " + str(method))
+    for k in np.flatnonzero(~(x[last - 1] > x[first])):
+        slopes[k] = np.polyfit(x[first[k]:last[k]], y[first[k]:last[k]], 1)[0]
+    return slopes
+
+def _section_rows(first, last):
+    #------------------------------------------------------------------------------------
+    # Function: _section_rows
+    # Purpose:  Finds the section and the row of every record of the sections [first, last), for the calculations of all the sections at once
+    # Input:    first, last     ... vectors of the first and the (excluded) last record of every section
+    # Output:   section         ... a vector of the section of every record
+    #           rows            ... a vector of the row of every record
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    lengths = last - first
+    section = np.repeat(np.arange(len(first)), lengths)
+    rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(first, lengths)
+    return section, rows
+
+def _weighted_slopes(section, xs, ys, weights, sections):
+    #------------------------------------------------------------------------------------
+    # Function: _weighted_slopes
+    # Purpose:  Calculates the weighted least-squares slopes of all the sections at once, from the weighted means and the centred sums of every section
+    # Input:    section         ... a vector of the section of every record
+    #           xs, ys          ... vectors of the coordinates of the records
+    #           weights         ... a vector of the weights of the records
+    #           sections        ... the number of sections
+    # Output:   slopes          ... a vector of the slopes of the sections
+    #           residuals       ... a vector of the residuals of the records from the line of their section
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    total = np.bincount(section, weights, sections)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dx = xs - (np.bincount(section, weights*xs, sections)/total)[section]
+        dy = ys - (np.bincount(section, weights*ys, sections)/total)[section]
+        slopes = np.bincount(section, weights*dx*dy, sections)/np.bincount(section, weights*dx*dx, sections)
+    return slopes, dy - slopes[section]*dx
+
+def _group_medians(group, values, groups):
+    #------------------------------------------------------------------------------------
+    # Function: _group_medians
+    # Purpose:  Calculates the medians of the values of every group at once, by sorting the values of all the groups together
+    #           NaN values are left out
+    # Input:    group           ... a vector of the group of every value
+    #           values          ... a vector of the values
+    #           groups          ... the number of groups
+    # Output:   medians         ... a vector of the medians of the groups (NaN for groups without values)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    kept = ~np.isnan(values)
+    group = group[kept]
+    values = values[kept]
+    order = np.lexsort((values, group))
+    values = values[order]
+    counts = np.bincount(group, minlength=groups)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(groups, np.nan)
+    full = counts > 0
+    medians[full] = (values[(starts + (counts - 1)//2)[full]] + values[(starts + counts//2)[full]])/2
+    return medians
+
+def _pair_slopes(xs, ys, i, j):
+    #------------------------------------------------------------------------------------
+    # Function: _pair_slopes
+    # Purpose:  Calculates the slopes between pairs of records
+    # Input:    xs, ys          ... vectors of the coordinates of the records
+    #           i, j            ... vectors of the positions of the two records of every pair
+    # Output:   slopes          ... a vector of the slopes of the pairs (NaN for records with the same x)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = (ys[j] - ys[i])/(xs[j] - xs[i])
+    slopes[xs[j] == xs[i]] = np.nan
+    return slopes
+
+def _random_members(first, last, count, rng):
+    #------------------------------------------------------------------------------------
+    # Function: _random_members
+    # Purpose:  Draws random records of every section (positions in the concatenated sections)
+    # Input:    first, last     ... vectors of the first and the (excluded) last record of every section
+    #           count           ... the number of records drawn from every section
+    #           rng             ... a numpy random generator
+    # Output:   section         ... a vector of the section of every drawn record
+    #           positions       ... a vector of the positions of the drawn records
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    lengths = last - first
+    starts = np.cumsum(lengths) - lengths
+    section = np.repeat(np.arange(len(first)), count)
+    return section, starts[section] + (rng.random(len(section))*lengths[section]).astype(int)
+
+def _theil_sen_slopes(xs, ys, first, last, pairs=1000):
+    #------------------------------------------------------------------------------------
+    # Function: _theil_sen_slopes
+    # Purpose:  Calculates the Theil-Sen slopes of all the sections: the median of the slopes between random pairs of records of every section
+    # Input:    xs, ys          ... vectors of the coordinates of the records of the concatenated sections
+    #           first, last     ... vectors of the first and the (excluded) last record of every section
+    #           pairs           ... the number of random pairs of every section
+    # Output:   slopes          ... a vector of the slopes of the sections
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_random_members
+    #           |_____________  SMPA_tools_v02.py/_pair_slopes
+    #           |_____________  SMPA_tools_v02.py/_group_medians
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rng = np.random.default_rng(0)
+    pair_section, i = _random_members(first, last, pairs, rng)
+    pair_section, j = _random_members(first, last, pairs, rng)
+    return _group_medians(pair_section, _pair_slopes(xs, ys, i, j), len(first))
+
+def _repeated_median_slopes(xs, ys, first, last, anchors=64, partners=32):
+    #------------------------------------------------------------------------------------
+    # Function: _repeated_median_slopes
+    # Purpose:  Calculates the repeated median slopes of all the sections: the median over random anchor records of every section
+    #           of the median slope of each anchor with random partners
+    # Input:    xs, ys          ... vectors of the coordinates of the records of the concatenated sections
+    #           first, last     ... vectors of the first and the (excluded) last record of every section
+    #           anchors         ... the number of anchor records of every section
+    #           partners        ... the number of partners of every anchor
+    # Output:   slopes          ... a vector of the slopes of the sections
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_random_members
+    #           |_____________  SMPA_tools_v02.py/_pair_slopes
+    #           |_____________  SMPA_tools_v02.py/_group_medians
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rng = np.random.default_rng(0)
+    lengths = last - first
+    starts = np.cumsum(lengths) - lengths
+    anchor_section, anchor = _random_members(first, last, anchors, rng)
+    pair_anchor = np.repeat(np.arange(len(anchor)), partners)
+    pair_section = anchor_section[pair_anchor]
+    partner = starts[pair_section] + (rng.random(len(pair_anchor))*lengths[pair_section]).astype(int)
+    anchor_medians = _group_medians(pair_anchor, _pair_slopes(xs, ys, anchor[pair_anchor], partner), len(anchor))
+    return _group_medians(anchor_section, anchor_medians, len(first))
+
+def _rate_of_variable_loop(dataframe, variable, interval, t0, tR, method='least squares'):
+    #------------------------------------------------------------------------------------
+    # Function: _rate_of_variable_loop
+    # Purpose:  Calculates the rate of a variable in sections found one by one, walking over the records
+    #           It is used by calculate_rate_of_variable for time records that are not monotonic
+    # Input:    dataframe, variable, interval, t0, tR, method... as in calculate_rate_of_variable
+    # Output:   rate_points, t_points, var_points... as in calculate_rate_of_variable
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_section_slopes
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
     # --- Start function ---
     rate_points = []
     t_points = []
@@ -419,8 +696,11 @@ def calculate_rate_of_variable(dataframe, variable, interval, t0, tR):
                 low = high 
                 break
 
-        model = np.polyfit(x, y, 1)          
-        rate_points.append(model[0])
+        if method == 'least squares':
+            model = np.polyfit(x, y, 1)          
+            rate_points.append(model[0])
+        else:
+            rate_points.append(_section_slopes(x, y, np.array([0]), np.array([len(x)]), method)[0])
         t_points.append(dataframe.TotalHours[dataframe.TotalSeconds == middle].values[0])      # choose hours or seconds!!!
         var_points.append(dataframe[variable][dataframe.TotalSeconds == middle].values[0])
         i+=interval
@@ -431,21 +711,24 @@ def calculate_rate_of_variable(dataframe, variable, interval, t0, tR):
 ###########################################################               Function 8                 #############################################################################################
 ##################################################################################################################################################################################################
 
-def smoothen_curve(rate_points, t_points, var_points, window_size):
+def smoothen_curve(rate_points, t_points, var_points, window_size, kernel='moving average'):
     #------------------------------------------------------------------------------------
     # Function: smoothen_curve
-    # Purpose:  Calculates a moving average
+    # Purpose:  Calculates a moving average (or another smoothing kernel, see Function 37) of the rate curve
+    #           The values are not rounded, so that small rates (e.g. strain rates of 1e-5 1/h) keep their precision
     # Input:    rate_points         ... a vector of either deflection rate or strain rate values
     #           t_points            ... a vector of time
     #           var_points          ... a vector of deflection or strain values 
     #           window_size         ... a number indicating the size of the window over which to calculate the moving average
+    #           kernel              ... the smoothing kernel, one of SMOOTHING_KERNELS (the moving average by default)
     # Output:   moving_averages     ... a vector of the calculated moving average
     #           tt                  ... a vector of time records that correspond to the middle of each window (calculated so that we can realistically plot rates over time)
     #                                   The times correspond to the middle of each section
     #           rate                ... a vector of deflections/strains that correspong to the middle of each window (calculated to match deflections/strains to their rates in the same point in time)
     #           
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/smooth_values
     # External packages:
-    #           |_____________  pandas
     #           |_____________  numpy
     #
     # Author:   Georgia Manou, georgia.manou@outlook.com
@@ -453,30 +736,10 @@ def smoothen_curve(rate_points, t_points, var_points, window_size):
     #------------------------------------------------------------------------------------ 
     
     # --- Start function ---
-    arr = rate_points
-    i = 0
-    # Initialize an empty list to store moving averages
-    moving_averages = []
-    # Initialize an empty list to store the "timestamps" to which we will assign each moving average
-    tt = []
-    rate = []
-
-    # Loop through the array to consider every window of size 25
-    while i < len(arr) - window_size + 1:
-
-        # Calculate the average of current window
-        window_average = round(np.sum(arr[i:i+window_size]) / window_size, 2)
-
-        # Store the average of current window in moving average list
-        moving_averages.append(window_average)
-        # Store the middle point of time in the window in the tt list
-        tt.append(t_points[int(i+(window_size/2))])
-        rate.append(var_points[int(i+(window_size/2))])
-
-        # Shift window to right by one position
-        i += 1
-
-    return moving_averages, tt, rate
+    moving_averages, positions = smooth_values(rate_points, window_size, kernel)
+    tt = list(np.asarray(t_points)[positions])
+    rate = list(np.asarray(var_points)[positions])
+    return list(moving_averages), tt, rate
 
 ##################################################################################################################################################################################################
 ###########################################################               Function 9                 #############################################################################################
@@ -759,6 +1022,7 @@ def calculate_t0_index(dataframe, first_magn_check, second_magn_check):
     #           Then, starting from the first data point the algorithm checks the differences.
     #           Once it finds one bigger than the first_magn_check, it checks the rest of the values (until the half point of the dataframe for more efficiency) to see if there is a difference bigger than the second_magn_check
     #           If there is, then the stop_end takes the index value of the last difference bigger than second_magn_check, otherwise of the first difference bigger than first_magn_check
+    #           All the differences are checked at once, the first one bigger than first_magn_check is found with an argmax over the boolean mask
     #
     # Input:    dataframe              ... a pandas dataframe
     #           first_magn_check       ... a number indiacting a magnitude of difference that is the first check 
@@ -766,6 +1030,7 @@ def calculate_t0_index(dataframe, first_magn_check, second_magn_check):
     # Output:   stop_start             ... the index of the input dataframe at the moment when the full load started being applied
     # External packages:
     #           |_____________  pandas
+    #           |_____________  numpy
     # Author:   Georgia Manou, georgia.manou@outlook.com
     # Version:  1.0, 15th March 2024
     #------------------------------------------------------------------------------------ 
@@ -773,10 +1038,11 @@ def calculate_t0_index(dataframe, first_magn_check, second_magn_check):
     # --- Start function ---
     dataframe['du'] = dataframe.u.diff().abs()
     
-    for i in range(int(len(dataframe)/2)):
-        if dataframe.loc[i, 'du'] > first_magn_check:
-            key = i
-            break
+    du = dataframe['du'].reindex(range(int(len(dataframe)/2))).to_numpy()
+    mask = du > first_magn_check
+    if not mask.any():
+        raise ValueError("No difference of the deflection bigger than " + str(first_magn_check) + " in the first half of the data")
+    key = int(np.argmax(mask))
 
     stop_ini = key - 1
 
@@ -794,6 +1060,7 @@ def calculate_tR_index(dataframe, first_magn_check, second_magn_check, variable)
     #           Then, starting from the last data point the algorithm checks the differences.
     #           Once it finds one bigger than the first_magn_check, it checks the rest of the values (until the half point of the dataframe for more efficiency) to see if there is a difference bigger than the second_magn_check
     #           If there is, then the stop_end takes the index value of the latter, otherwise of the former
+    #           All the differences are checked at once with boolean masks, instead of a walk over the rows
     #
     # Input:    dataframe              ... a pandas dataframe
     #           first_magn_check       ... a number indiacting a magnitude of difference that is the first check 
@@ -802,6 +1069,7 @@ def calculate_tR_index(dataframe, first_magn_check, second_magn_check, variable)
     # Output:   stop_end               ... the index of the input dataframe at the moment of rupture 
     # External packages:
     #           |_____________  pandas
+    #           |_____________  numpy
     # Author:   Georgia Manou, georgia.manou@outlook.com
     # Version:  1.0, 15th March 2024
     #------------------------------------------------------------------------------------ 
@@ -809,13 +1077,15 @@ def calculate_tR_index(dataframe, first_magn_check, second_magn_check, variable)
     # --- Start function ---
     dataframe['dvar'] = dataframe[variable].diff().abs()
     
-    for i in range(int(len(dataframe))-1, int(len(dataframe)/2), -1):
-        if dataframe.loc[i, 'dvar'] > first_magn_check:
-            key = i
-            for j in range(i-1, int(len(dataframe)/5), -1):
-                if dataframe.loc[j, 'dvar'] > second_magn_check:
-                    key = j
-            break
+    n = int(len(dataframe))
+    dvar = dataframe['dvar'].reindex(range(n)).to_numpy()
+    first = np.flatnonzero(dvar[int(n/2)+1:] > first_magn_check)
+    if len(first) == 0:
+        raise ValueError("No difference of " + variable + " bigger than " + str(first_magn_check) + " in the second half of the data")
+    key = int(n/2) + 1 + int(first[-1])                                               # The last difference bigger than first_magn_check
+    second = np.flatnonzero(dvar[int(n/5)+1:key] > second_magn_check)
+    if len(second) > 0:
+        key = int(n/5) + 1 + int(second[0])                                           # The earliest difference bigger than second_magn_check before it
     
     stop_end = key-1
     return stop_end
@@ -847,4 +1117,2242 @@ def plot_u0_and_uR(dataframe, i0, iR):
     plt.xlabel('Time [h]', color='grey')
     plt.ylabel('Deflection $u$ [µm]', color='grey')
     plt.tick_params(colors='grey', which='both')
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+##################################################################################################################################################################################################
+###########################################################               Function 21                #############################################################################################
+##################################################################################################################################################################################################
+
+def file_signature(path, sample_bytes=65536):
+    #------------------------------------------------------------------------------------
+    # Function: file_signature
+    # Purpose:  Creates a cheap fingerprint of a data file that changes whenever the file changes on disk
+    #           It combines the size and the modification time of the file with a hash of its first and last bytes,
+    #           so that a file that was rewritten within the resolution of the file system clock is still detected,
+    #           without having to read the whole file
+    # Input:    path            ... the full path of the file
+    #           sample_bytes    ... the number of bytes hashed at the beginning and at the end of the file
+    # Output:   signature       ... a tuple (size in bytes, modification time in ns, hex digest of the sampled bytes)
+    #                               Raises FileNotFoundError if the path does not exist
+    # External packages:
+    #           |_____________  os
+    #           |_____________  hashlib
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        if stat.st_size > sample_bytes:
+            f.seek(max(stat.st_size - sample_bytes, sample_bytes))
+            digest.update(f.read(sample_bytes))
+
+    signature = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return signature
+
+##################################################################################################################################################################################################
+###########################################################               Function 22                #############################################################################################
+##################################################################################################################################################################################################
+
+SIDECAR_FOLDER = '.smpa_cache'
+SIDECAR_VERSION = 1                                     # Increase it whenever the layout of the normalized dataframes changes, to invalidate the existing sidecars
+
+_sidecars_reported = False
+
+def _sidecar_path(path, signature, key):
+    #------------------------------------------------------------------------------------
+    # Function: _sidecar_path
+    # Purpose:  Builds the path of the sidecar of a data file. The sidecar lives in a hidden folder next to the data file and its name is derived
+    #           from the file signature and the key, so a sidecar that does not match the current state of the file is never picked up
+    #           The two digests are kept apart in the name (file.csv.<signature>.<key>.parquet), so that the sidecars of an older signature
+    #           of the file can be told from those of another key (see write_sidecar)
+    # Input:    path            ... the full path of the data file
+    #           signature       ... the signature of the file (see file_signature)
+    #           key             ... any hashable describing how the file was normalized (e.g. the type of experiment and the column mapping)
+    # Output:   sidecar         ... the full path of the sidecar
+    # External packages:
+    #           |_____________  os
+    #           |_____________  hashlib
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    def digest(value):
+        return hashlib.blake2b(repr((SIDECAR_VERSION, value)).encode('utf-8'), digest_size=8).hexdigest()
+    folder = os.path.join(os.path.dirname(os.path.abspath(path)), SIDECAR_FOLDER)
+    return os.path.join(folder, os.path.basename(path) + '.' + digest(signature) + '.' + digest(key) + '.parquet')
+
+def _report_no_sidecars(error):
+    #------------------------------------------------------------------------------------
+    # Function: _report_no_sidecars
+    # Purpose:  Reports that the sidecars are disabled, because pyarrow is not installed. It is logged once per process, instead of on every load
+    # Input:    error           ... the ImportError raised by pandas
+    # Output:   -
+    # External packages:
+    #           |_____________  logging
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    global _sidecars_reported
+    if not _sidecars_reported:
+        _sidecars_reported = True
+        logging.getLogger(__name__).warning("The columnar sidecars are disabled, the data files are parsed on every cold start (%s). Install pyarrow to enable them.", error)
+
+def read_sidecar(path, signature, key):
+    #------------------------------------------------------------------------------------
+    # Function: read_sidecar
+    # Purpose:  Reads back the already normalized dataframe of a data file from its binary columnar (Parquet) sidecar
+    #           A sidecar is only valid for the signature of the file (see Function 21) and the key it was written with,
+    #           so a stale sidecar (the file changed on disk or the columns were mapped differently) is never returned
+    # Input:    path            ... the full path of the original data file
+    #           signature       ... the current signature of the data file, as returned by file_signature
+    #           key             ... any hashable describing how the file was normalized (e.g. the column mapping)
+    # Output:   dataframe       ... a pandas dataframe, or None if there is no valid sidecar (or pyarrow is not installed)
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  pyarrow
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    sidecar = _sidecar_path(path, signature, key)
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        dataframe = pd.read_parquet(sidecar, memory_map=True)
+    except ImportError as error:                                                             # No pyarrow: fall back to the original file
+        _report_no_sidecars(error)
+        return None
+    except (OSError, ValueError, TypeError, NotImplementedError):                            # A corrupt sidecar: fall back to the original file
+        return None
+    return dataframe
+
+##################################################################################################################################################################################################
+###########################################################               Function 23                #############################################################################################
+##################################################################################################################################################################################################
+
+def write_sidecar(dataframe, path, signature, key):
+    #------------------------------------------------------------------------------------
+    # Function: write_sidecar
+    # Purpose:  Writes a normalized dataframe to a binary columnar (Parquet) sidecar of the data file it was read from,
+    #           so that the next loads can skip parsing the text file (see Function 22)
+    #           The sidecars of older signatures of the same data file are removed, since they can no longer be valid
+    #           (the sidecars of the current signature under other keys, e.g. another column mapping, are kept)
+    #           The sidecar is only an accelerator: if it cannot be written (no pyarrow, read-only folder, columns of mixed types)
+    #           nothing happens
+    # Input:    dataframe       ... the normalized pandas dataframe
+    #           path            ... the full path of the original data file
+    #           signature       ... the signature of the data file, as returned by file_signature
+    #           key             ... any hashable describing how the file was normalized (e.g. the column mapping)
+    # Output:   written         ... True if the sidecar was written, otherwise False
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  pyarrow
+    #           |_____________  os
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    sidecar = _sidecar_path(path, signature, key)
+    folder = os.path.dirname(sidecar)
+    prefix = os.path.basename(path) + '.'
+    current = os.path.basename(sidecar)[:len(prefix) + 17]                                   # The file name and the digest of the current signature
+    temporary = sidecar + '.' + str(os.getpid()) + '.tmp'
+    try:
+        os.makedirs(folder, exist_ok=True)
+        for name in os.listdir(folder):                                                      # Remove the sidecars of the older signatures of the same file
+            if name.startswith(prefix) and name.endswith('.parquet') and (name.count('.') == prefix.count('.') + 2) and not name.startswith(current):
+                os.remove(os.path.join(folder, name))
+        dataframe.to_parquet(temporary, index=False)
+        os.replace(temporary, sidecar)                                                       # Atomic, so a concurrent reader never sees half a file
+    except ImportError as error:
+        _report_no_sidecars(error)
+        return False
+    except (OSError, ValueError, TypeError, NotImplementedError):
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        return False
+    return True
+
+##################################################################################################################################################################################################
+###########################################################               Function 24                #############################################################################################
+##################################################################################################################################################################################################
+
+def load_in_parallel(function, jobs, max_workers=None, parallel=True, initializer=None):
+    #------------------------------------------------------------------------------------
+    # Function: load_in_parallel
+    # Purpose:  Runs the same loading function over many experiments concurrently, with a pool of threads
+    #           Parsing of the files (pandas/pyarrow) releases the GIL, so the files are read at the same time
+    #           The results are returned in the order of the jobs, and an error of one job does not stop the others:
+    #           it is returned next to the job, so that the caller can report it exactly as for a sequential loop
+    # Input:    function        ... the loading function, called as function(*job)
+    #           jobs            ... a list of tuples with the arguments of each call
+    #           max_workers     ... the maximum number of threads (default of concurrent.futures if None)
+    #           parallel        ... if False, the jobs run one after another in the calling thread
+    #           initializer     ... a callable that runs once in each worker thread before its first job
+    # Output:   results         ... a list with one tuple (output, error, seconds) per job, in the order of the jobs
+    #                               output is None if the job raised, error is None if it did not,
+    #                               seconds is the time spent on the job
+    # External packages:
+    #           |_____________  concurrent.futures
+    #           |_____________  time
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    def timed(job):
+        start = time.perf_counter()
+        try:
+            return function(*job), None, time.perf_counter() - start
+        except Exception as error:
+            return None, error, time.perf_counter() - start
+
+    if (parallel == False) | (len(jobs) < 2):
+        results = [timed(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers, initializer=initializer) as pool:
+            results = list(pool.map(timed, jobs))                                             # map keeps the order of the jobs
+    return results
+
+##################################################################################################################################################################################################
+###########################################################               Function 25                #############################################################################################
+##################################################################################################################################################################################################
+
+def read_csv_columns(path, time_col, value_cols, chunksize=250000, source=None, time_parsers=None, **read_csv_kwargs):
+    #------------------------------------------------------------------------------------
+    # Function: read_csv_columns
+    # Purpose:  Reads only the requested columns of a (very large) csv file, chunk by chunk, instead of materializing the whole file
+    #           Every chunk is written into output arrays whose capacity is doubled when they are full (see _grow), so the file is read once:
+    #           the memory needed is bounded by the output columns and one chunk, and not by the size of the text file
+    #           The time column is converted to pandas datetime in every chunk, with the format inferred once (unparsable values become NaT)
+    #           and the value columns to floats (unparsable values become NaN)
+    #           If a later chunk shows that the day and the month were read in the wrong order (all the days so far were up to 12), the rows
+    #           already read are corrected
+    # Input:    path            ... the full path of the csv file
+    #           time_col        ... exact name of the time column
+    #           value_cols      ... a list with the exact names of the other columns to read
+    #           chunksize       ... the number of rows parsed at a time
+    #           source          ... a hashable identifying the rig/source of the file, to remember its time format (see Function 29)
+    #           time_parsers    ... a dictionary of the time formats remembered per source (see Function 29), or None
+    #           read_csv_kwargs ... extra keyword arguments passed to pd.read_csv (e.g. sep, skiprows, encoding)
+    # Output:   dataframe       ... a pandas dataframe with the time column and the value columns only, under their original names
+    #                               The number of timestamps that could not be parsed (NaT) is stored in dataframe.attrs['coerced_timestamps']
+    #                               Raises KeyError if a column does not exist in the file, as the renaming of the full dataframe would
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    value_cols = list(value_cols)
+    times = np.empty(0, dtype='datetime64[ns]')
+    values = np.empty((len(value_cols), 0), dtype='float64')
+
+    try:
+        reader = pd.read_csv(path, usecols=[time_col] + value_cols, chunksize=chunksize, **read_csv_kwargs)
+        rows = 0
+        coerced = 0
+        time_parsers = {} if time_parsers is None else time_parsers                          # The chunks of the file share one parser
+        key = path if source is None else source
+        for chunk in reader:
+            n = len(chunk)
+            times = _grow(times, rows + n)
+            values = _grow(values, rows + n)
+            parsed, count, swapped = _parse_time_chunk(chunk[time_col], key, time_parsers)
+            if swapped:                                                                      # The previous chunks were read with the day and the month swapped
+                missing = np.isnat(times[:rows]).sum()
+                times[:rows] = _swap_day_month(times[:rows])
+                coerced += int(np.isnat(times[:rows]).sum() - missing)
+            times[rows:rows+n] = parsed
+            coerced += count
+            for j, col in enumerate(value_cols):
+                values[j, rows:rows+n] = pd.to_numeric(chunk[col], errors='coerce').values
+            rows += n
+    except ValueError as error:
+        if 'Usecols do not match columns' in str(error):
+            raise KeyError(str(error)) from error
+        raise
+
+    columns = {time_col: times[:rows]}
+    for j, col in enumerate(value_cols):
+        columns[col] = values[j, :rows]
+    dataframe = pd.DataFrame(columns, copy=False)
+    dataframe.attrs['coerced_timestamps'] = coerced
+    return dataframe
+
+##################################################################################################################################################################################################
+###########################################################               Function 26                #############################################################################################
+##################################################################################################################################################################################################
+
+def _grow(array, needed):
+    #------------------------------------------------------------------------------------
+    # Function: _grow
+    # Purpose:  Makes room for at least `needed` elements along the last axis of an array. The capacity is doubled, so that appending rows
+    #           costs amortized constant time
+    # Input:    array           ... a numpy array
+    #           needed          ... the number of elements needed along its last axis
+    # Output:   array           ... the same array if it has enough room, otherwise a larger copy
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    capacity = array.shape[-1]
+    if needed <= capacity:
+        return array
+    grown = np.empty(array.shape[:-1] + (max(needed, 2*capacity, 1024),), dtype=array.dtype)
+    grown[..., :capacity] = array
+    return grown
+
+def follow_csv(path, columns, names, state=None, block_size=1 << 26, source=None, compact=False, time_parsers=None, **read_csv_kwargs):
+    #------------------------------------------------------------------------------------
+    # Function: follow_csv
+    # Purpose:  Reads a csv file that is still being written (an experiment in progress) incrementally
+    #           The state returned by one call remembers the byte offset and the number of rows already read, so that
+    #           the next call parses only the lines appended to the file in the meantime and appends them to the arrays of the state
+    #           The total seconds/minutes/hours since the first timestamp are computed for the new rows only, the prefix is never recomputed
+    #           A line that is still being written (no line break yet) is left for the next call
+    #           If new lines show that the day and the month were read in the wrong order (all the days so far were up to 12), the rows
+    #           already read are corrected and their elapsed time is calculated again
+    #           If the file was truncated or replaced (smaller than the offset, or a different header) it is read again from the start
+    #           In compact mode the state keeps the compact representation of the experiment (see Function 34): the dtype of every channel
+    #           is decided once, from the first rows read, and the new rows are appended in that dtype, hence nothing is copied or rescanned
+    # Input:    path            ... the full path of the csv file
+    #           columns         ... a list with the exact names of the columns to read, the time column first
+    #           names           ... a list with the names of the columns in the output dataframe, in the same order (e.g. 'DateTime', 'u', ...)
+    #           state           ... the state returned by the previous call for the same file and columns, or None for the first call
+    #           block_size      ... the maximum number of bytes parsed at a time
+    #           source          ... a hashable identifying the rig/source of the file, to remember its time format (the path by default)
+    #           time_parsers    ... a dictionary of the time formats remembered per source (see Function 29), or None to remember it in the state
+    #           compact         ... True to keep only DateTime, TotalSeconds and the channels, in float32 where the precision allows it
+    #           read_csv_kwargs ... extra keyword arguments passed to pd.read_csv (e.g. sep)
+    # Output:   dataframe       ... a pandas dataframe with the renamed columns and TotalSeconds, TotalMinutes, TotalHours (TotalSeconds only in compact mode)
+    #                               Its columns are read-only views of the arrays of the state
+    #                               The number of timestamps that could not be parsed (NaT) is stored in dataframe.attrs['coerced_timestamps']
+    #                               In compact mode its memory footprint in bytes is stored in dataframe.attrs['memory_bytes']
+    #           state           ... the state to pass to the next call
+    #                               Raises KeyError if a column does not exist in the file
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #           |_____________  io
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    columns = list(columns)
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if (state is None) or (state['header'] != header) or (state['columns'] != columns) or (state['compact'] != compact) or (size < state['offset']):
+            state = {'header': header, 'columns': columns, 'compact': compact, 'offset': len(header), 'rows': 0, 't0': None, 'coerced': 0, 'time_parsers': {},
+                     'times': np.empty(0, dtype='datetime64[ns]'),
+                     'values': None,                                                         # One array per channel, created with the first rows
+                     'elapsed': np.empty((1 if compact else 3, 0), dtype='float64')}         # TotalSeconds (, TotalMinutes, TotalHours)
+
+        f.seek(state['offset'])
+        pending = b''
+        block = f.read(block_size)
+        while block:
+            block = pending + block
+            cut = block.rfind(b'\n') + 1
+            if cut > 0:
+                try:
+                    new = pd.read_csv(io.BytesIO(header + block[:cut]), usecols=columns, **read_csv_kwargs)
+                except ValueError as error:
+                    if 'Usecols do not match columns' in str(error):
+                        raise KeyError(str(error)) from error
+                    raise
+                except pd.errors.EmptyDataError:
+                    new = pd.DataFrame(columns=columns)
+
+                rows, n = state['rows'], len(new)
+                values = [pd.to_numeric(new[col], errors='coerce').to_numpy(dtype='float64') for col in columns[1:]]
+                if state['values'] is None:                                                  # The dtypes are decided once per state
+                    state['values'] = [np.empty(0, dtype='float32' if compact and _float32_allowed(channel) else 'float64') for channel in values]
+                state['times'] = _grow(state['times'], rows + n)
+                state['values'] = [_grow(array, rows + n) for array in state['values']]
+                state['elapsed'] = _grow(state['elapsed'], rows + n)
+
+                times, coerced, swapped = _parse_time_chunk(new[columns[0]], path if source is None else source,
+                                                            state['time_parsers'] if time_parsers is None else time_parsers)
+                if swapped:                                                                  # The rows already read had the day and the month swapped
+                    missing = np.isnat(state['times'][:rows]).sum()
+                    state['times'][:rows] = _swap_day_month(state['times'][:rows])
+                    state['coerced'] += int(np.isnat(state['times'][:rows]).sum() - missing)
+                    valid = state['times'][:rows][~np.isnat(state['times'][:rows])]
+                    state['t0'] = valid[0] if len(valid) > 0 else None
+                    if state['t0'] is not None:
+                        seconds = _elapsed_seconds(state['times'][:rows], state['t0'])
+                        state['elapsed'][0, :rows] = seconds
+                        if compact == False:
+                            state['elapsed'][1, :rows] = seconds/60
+                            state['elapsed'][2, :rows] = seconds/3600
+                state['times'][rows:rows+n] = times
+                state['coerced'] += coerced
+                for array, channel in zip(state['values'], values):
+                    array[rows:rows+n] = channel
+
+                if state['t0'] is None:
+                    valid = times[~np.isnat(times)]
+                    if len(valid) > 0:
+                        state['t0'] = valid[0]
+                if state['t0'] is None:
+                    seconds = np.full(n, np.nan)
+                else:
+                    seconds = _elapsed_seconds(times, state['t0'])
+                state['elapsed'][0, rows:rows+n] = seconds
+                if compact == False:
+                    state['elapsed'][1, rows:rows+n] = seconds/60
+                    state['elapsed'][2, rows:rows+n] = seconds/3600
+
+                state['rows'] = rows + n
+                state['offset'] += cut
+            pending = block[cut:]
+            block = f.read(block_size)
+
+    rows = state['rows']
+    channels = [array[:rows] for array in state['values']] if state['values'] is not None else [np.empty(0, dtype='float64') for col in columns[1:]]
+    if compact == True:
+        arrays = dict(zip(['DateTime', 'TotalSeconds'] + list(names[1:]), [state['times'][:rows], state['elapsed'][0, :rows]] + channels))
+    else:
+        arrays = dict(zip(list(names) + ['TotalSeconds', 'TotalMinutes', 'TotalHours'], [state['times'][:rows]] + channels + [state['elapsed'][k, :rows] for k in range(3)]))
+    for array in arrays.values():
+        array.flags.writeable = False                                                        # The arrays belong to the state
+    dataframe = pd.DataFrame(arrays, copy=False)
+    dataframe.attrs['coerced_timestamps'] = state['coerced']
+    if compact == True:
+        dataframe.attrs['memory_bytes'] = int(sum(array.nbytes for array in arrays.values()))
+    return dataframe, state
+
+##################################################################################################################################################################################################
+###########################################################               Function 27                #############################################################################################
+##################################################################################################################################################################################################
+
+def calendar_columns(dataframe):
+    #------------------------------------------------------------------------------------
+    # Function: calendar_columns
+    # Purpose:  Derives from the pandas datetime column 'DateTime' and puts into separate columns the following:
+    #             Date
+    #             Time
+    #             Hour
+    #             Minute
+    #             Second
+    #           These columns are not needed for the analysis, so they are only created on demand (e.g. for exporting the data)
+    # Input:    dataframe     ... a pandas dataframe with a 'DateTime' column of datetime type
+    # Output:   dataframe     ... the same dataframe appended with the calendar columns
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    times = dataframe['DateTime'].dt
+    dataframe['Date'] = times.date
+    dataframe['Time'] = times.time
+    dataframe['Hour'] = times.hour
+    dataframe['Minute'] = times.minute
+    dataframe['Second'] = times.second
+    return dataframe
+
+##################################################################################################################################################################################################
+###########################################################               Function 28                #############################################################################################
+##################################################################################################################################################################################################
+
+# Explicit formats tried when sniffing a time column, before the format guessed by pandas from the first value.
+# Formats that start with the day or the month are ambiguous for dates with a day up to 12, hence the order of the day and the month
+# is resolved afterwards from the whole column (see _day_month_order)
+TIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%d-0%m-%y %H:%M:%S.%f',                            # Phoenix - Format 1 or FAST
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S.%f',
+    '%d/%m/%Y %H:%M',
+    '%d.%m.%Y %H:%M:%S',
+    '%d-%m-%Y %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %I:%M:%S %p',
+]
+
+def infer_time_parser(values, sample_size=200):
+    #------------------------------------------------------------------------------------
+    # Function: infer_time_parser
+    # Purpose:  Sniffs the first values of a time column and chooses how the whole column should be parsed
+    #           Numbers are considered as a counter/epoch, with a unit chosen from their magnitude (e.g. Phoenix - Format 2, in seconds)
+    #           Text is tried against the TIME_FORMATS, the format guessed by pandas and ISO8601, and the first format that parses all of the sample
+    #           (otherwise the one that parses most of it) wins. If the format starts with the day or the month, their order is decided by the
+    #           whole column: the order that parses more values (i.e. the one that fits the values with a field greater than 12) wins,
+    #           and if both parse the same values, the month comes first, as in pandas
+    #           Parsing with an explicit format or unit is the fast path of pandas, instead of the format-less element-wise parsing
+    # Input:    values          ... a pandas series (or array) with the raw values of the time column
+    #           sample_size     ... the number of non-empty values checked for the format
+    # Output:   parser          ... a dictionary with the keyword arguments for pd.to_datetime, e.g. {'format': '%Y-%m-%d %H:%M:%S'} or {'unit': 's'}
+    #                               An empty dictionary if no explicit format fits (pandas will then infer it)
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    sample = pd.Series(values).dropna().iloc[:sample_size]
+    if (len(sample) == 0) | pd.api.types.is_datetime64_any_dtype(sample):
+        return {}
+
+    numbers = pd.to_numeric(sample, errors='coerce')
+    if numbers.notna().all():
+        magnitude = np.abs(numbers.astype('float64')).max()
+        if magnitude > 1e17:
+            return {'unit': 'ns'}
+        if magnitude > 1e14:
+            return {'unit': 'us'}
+        if magnitude > 1e11:
+            return {'unit': 'ms'}
+        return {'unit': 's'}
+
+    sample = sample.astype(str)
+    with warnings.catch_warnings():                                                          # pandas warns about the day first ambiguity
+        warnings.simplefilter('ignore')
+        guessed = guess_datetime_format(sample.iloc[0])
+    candidates = TIME_FORMATS + ([guessed] if (guessed is not None) and (guessed not in TIME_FORMATS) else []) + ['ISO8601']
+    parser = {}
+    best = 0
+    for fmt in candidates:
+        count = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if count > best:
+            parser = {'format': fmt}
+            best = count
+        if best == len(sample):
+            break
+    if 'format' in parser:
+        parser['format'] = _day_month_order(pd.Series(values).dropna().astype(str), parser['format'])
+    return parser
+
+def _day_month_order(values, fmt):
+    #------------------------------------------------------------------------------------
+    # Function: _day_month_order
+    # Purpose:  Chooses the order of the day and the month of a format that starts with either of them (e.g. '%d/%m/%Y' or '%m/%d/%Y'),
+    #           from all the values of a time column, since the first values of a log may all have a day up to 12
+    #           The order that parses more values wins, and the month first order (the default of pandas) if both parse the same values
+    # Input:    values          ... a pandas series with the non-empty values of the time column, as text
+    #           fmt             ... the format chosen from a sample of the values
+    # Output:   fmt             ... the format with the day and the month in the chosen order (unchanged if the format does not start with them)
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    swapped = _day_month_swap(fmt)
+    if swapped is None:
+        return fmt
+    month_first, day_first = (swapped, fmt) if fmt.startswith('%d') else (fmt, swapped)
+    parsed_month_first = pd.to_datetime(values, format=month_first, errors='coerce').notna().sum()
+    parsed_day_first = pd.to_datetime(values, format=day_first, errors='coerce').notna().sum()
+    return day_first if parsed_day_first > parsed_month_first else month_first
+
+def _day_month_swap(fmt):
+    #------------------------------------------------------------------------------------
+    # Function: _day_month_swap
+    # Purpose:  Swaps the day and the month of a format that starts with either of them, e.g. '%d/%m/%Y' to '%m/%d/%Y'
+    # Input:    fmt             ... a format of pd.to_datetime
+    # Output:   swapped         ... the format with the day and the month swapped, or None if the order of the format is not ambiguous
+    #                               (year first formats and Phoenix - Format 1)
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    if (fmt[:2] not in ('%d', '%m')) or ('%d' not in fmt) or ('%m' not in fmt) or ('0%m' in fmt):
+        return None
+    return fmt.replace('%d', '%D').replace('%m', '%d').replace('%D', '%m')
+
+##################################################################################################################################################################################################
+###########################################################               Function 29                #############################################################################################
+##################################################################################################################################################################################################
+
+def parse_time_column(values, source=None, time_parsers=None):
+    #------------------------------------------------------------------------------------
+    # Function: parse_time_column
+    # Purpose:  Transforms a time column into pandas datetime with an explicit format or unit (see Function 28)
+    #           The parser is remembered per source (e.g. the folder of a rig and the name of its time column) in time_parsers, which the caller
+    #           keeps (e.g. per session of the app), so the sniffing is done once per source. If a remembered parser fails for any of the values, the column is sniffed again and the parser that fails
+    #           for fewer values is kept (e.g. the source changed its format, or a log with a day up to 12 so far was read month first)
+    #           Values that cannot be parsed become NaT and are counted
+    # Input:    values          ... a pandas series with the raw values of the time column
+    #           source          ... any hashable identifying the source of the data, or None to sniff every time
+    #           time_parsers    ... a dictionary of source: parser, the memory of the parsers, or None to sniff every time
+    # Output:   times           ... a pandas series of datetime type
+    #           coerced         ... the number of non-empty values that could not be parsed (and became NaT)
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, 0
+
+    def parse(parser):
+        if 'unit' in parser:
+            return pd.to_datetime(pd.to_numeric(values, errors='coerce'), errors='coerce', **parser)
+        return pd.to_datetime(values, errors='coerce', **parser)
+
+    remember = (source is not None) and (time_parsers is not None)
+    parser = time_parsers.get(source) if remember else None
+    remembered = parser is not None
+    if parser is None:
+        parser = infer_time_parser(values)
+    times = parse(parser)
+    coerced = int((times.isna() & values.notna()).sum())
+
+    if remembered & (coerced > 0):
+        sniffed = infer_time_parser(values)
+        if sniffed != parser:
+            sniffed_times = parse(sniffed)
+            sniffed_coerced = int((sniffed_times.isna() & values.notna()).sum())
+            if sniffed_coerced < coerced:
+                parser, times, coerced = sniffed, sniffed_times, sniffed_coerced
+    if remember:
+        time_parsers[source] = parser
+    return times, coerced
+
+def _parse_time_chunk(values, source, time_parsers):
+    #------------------------------------------------------------------------------------
+    # Function: _parse_time_chunk
+    # Purpose:  Parses one chunk of the time column of a file that is read chunk by chunk, with the parser remembered for the file
+    #           The first chunks of a log may all have a day up to 12 and be read month first. When a later chunk settles the order
+    #           of the day and the month the other way, the rows of the previous chunks must be swapped (see _swap_day_month)
+    # Input:    values          ... a pandas series with the raw values of the chunk
+    #           source          ... the key of the file in time_parsers
+    #           time_parsers    ... a dictionary of source: parser (see parse_time_column)
+    # Output:   times           ... a numpy array of datetime64 values
+    #           coerced         ... the number of non-empty values that could not be parsed
+    #           swapped         ... True if the day and the month of the parser were swapped by this chunk
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/parse_time_column
+    #           |_____________  SMPA_tools_v02.py/_day_month_swap
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    before = time_parsers.get(source, {})
+    times, coerced = parse_time_column(values, source, time_parsers)
+    after = time_parsers.get(source, {})
+    swapped = ('format' in before) and ('format' in after) and (_day_month_swap(before['format']) == after['format'])
+    return times.to_numpy(dtype='datetime64[ns]'), coerced, swapped
+
+def _swap_day_month(times):
+    #------------------------------------------------------------------------------------
+    # Function: _swap_day_month
+    # Purpose:  Swaps the day and the month of timestamps that were parsed with the wrong order of the day and the month
+    # Input:    times           ... a numpy array of datetime64 values
+    # Output:   times           ... a numpy array of datetime64 values (NaT where the swapped date does not exist)
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    times = pd.Series(times)
+    dates = pd.to_datetime(pd.DataFrame({'year': times.dt.year, 'month': times.dt.day, 'day': times.dt.month}), errors='coerce')
+    return (dates + (times - times.dt.normalize())).to_numpy(dtype='datetime64[ns]')
+
+##################################################################################################################################################################################################
+###########################################################               Function 30                #############################################################################################
+##################################################################################################################################################################################################
+
+FORMAT_READERS = {}                                     # The registered formats, in the order they are checked by detect_format
+
+def register_format_reader(name, detect, read, channels=()):
+    #------------------------------------------------------------------------------------
+    # Function: register_format_reader
+    # Purpose:  Registers the reader of a data format, so that read_all and the web application can recognize and read it
+    #           A new format (e.g. of a new rig) is supported by registering its reader, without changing any of the functions that read files
+    # Input:    name            ... the name of the format, e.g. 'Campbell Log_Data'
+    #           detect          ... a function detect(path, head) that returns True if the file is of this format
+    #                               head is a list with the first lines of the file, so that the detection does not need to read the file
+    #           read            ... a function read(path, source=None, time_parsers=None) that returns the normalized pandas dataframe of the file
+    #                               (with 'DateTime', 'TotalSeconds', 'TotalMinutes', 'TotalHours' and the renamed channels)
+    #           channels        ... the names of the channels that the reader always returns, e.g. ('lvdt1', 'lvdt2')
+    # Output:   -
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    FORMAT_READERS[name] = {'detect': detect, 'read': read, 'channels': tuple(channels)}
+
+##################################################################################################################################################################################################
+###########################################################               Function 31                #############################################################################################
+##################################################################################################################################################################################################
+
+def _head(path, lines=50):
+    #------------------------------------------------------------------------------------
+    # Function: _head
+    # Purpose:  Reads the first lines of a text file lazily (the rest of the file is never read)
+    # Input:    path            ... the full path of the file
+    #           lines           ... the number of lines
+    # Output:   head            ... a list of the lines, without their line breaks
+    # External packages:
+    #           |_____________  itertools
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    with open(path, errors='replace') as f:
+        return [line.rstrip('\r\n') for line in itertools.islice(f, lines)]
+
+def _find_line(path, prefix):
+    #------------------------------------------------------------------------------------
+    # Function: _find_line
+    # Purpose:  Finds the first line of a text file that starts with a prefix, reading the file line by line until it is found
+    # Input:    path            ... the full path of the file
+    #           prefix          ... the start of the line
+    # Output:   number          ... the number of the line (starting from 1), or None if there is no such line
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    with open(path, errors='replace') as f:
+        for number, line in enumerate(f, start=1):
+            if line.startswith(prefix):
+                return number
+    return None
+
+def detect_format(path, head_lines=50):
+    #------------------------------------------------------------------------------------
+    # Function: detect_format
+    # Purpose:  Recognizes the format of a data file from its first lines only, by asking every registered reader in turn (see Function 30)
+    # Input:    path            ... the full path of the file
+    #           head_lines      ... the number of lines read from the beginning of the file
+    # Output:   name            ... the name of the format, or None if no registered format recognizes the file
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    head = _head(path, head_lines)
+    for name, reader in FORMAT_READERS.items():
+        if reader['detect'](path, head):
+            return name
+    return None
+
+##################################################################################################################################################################################################
+###########################################################               Function 32                #############################################################################################
+##################################################################################################################################################################################################
+
+def read_format(path, name=None, source=None, time_parsers=None):
+    #------------------------------------------------------------------------------------
+    # Function: read_format
+    # Purpose:  Reads a data file with the reader of its format
+    # Input:    path            ... the full path of the file
+    #           name            ... the name of the format, or None to recognize it with detect_format
+    #           source          ... a hashable identifying the rig/source of the file, to remember its time format (the name of the format by default)
+    #           time_parsers    ... a dictionary of the time formats remembered per source (see Function 29), or None
+    # Output:   dataframe       ... the normalized pandas dataframe, with the name of the format in dataframe.attrs['format']
+    #                               Raises ValueError if the format is not recognized
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/detect_format
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    if name is None:
+        name = detect_format(path)
+    if name not in FORMAT_READERS:
+        raise ValueError('The format of ' + path + ' could not be recognized.')
+    dataframe = FORMAT_READERS[name]['read'](path, name if source is None else source, time_parsers)
+    dataframe.attrs['format'] = name
+    return dataframe
+
+# --- The formats of the SMPA laboratories ---
+
+# Uniaxial creep - Campbell Scientific loggers (TOA5): one line of station information, the header, and two lines of units/processing
+def _detect_campbell_log_data(path, head):
+    #------------------------------------------------------------------------------------
+    # Function: _detect_campbell_log_data
+    # Purpose:  Recognizes a Campbell Scientific (TOA5) Log_Data file of Uniaxial creep from its first lines
+    # Input:    path            ... the full path of the file
+    #           head            ... a list of the first lines of the file (see _head)
+    # Output:   recognized      ... True if the file is of this format
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    return (len(head) > 1) and (head[0].lstrip('"').startswith('TOA5')) and ('TIMESTAMP' in head[1])
+
+def _read_campbell_log_data(path, source=None, time_parsers=None):
+    #------------------------------------------------------------------------------------
+    # Function: _read_campbell_log_data
+    # Purpose:  Reads a Campbell Scientific (TOA5) Log_Data file of Uniaxial creep into the normalized dataframe of the app
+    # Input:    path            ... the full path of the file
+    #           source          ... a hashable identifying the rig/source of the file, to remember its time format
+    #           time_parsers    ... a dictionary of source: parser, the memory of the time formats (see parse_time_column)
+    # Output:   df              ... a pandas dataframe with DateTime, lvdt1, lvdt2 and the time columns
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/parse_time_column
+    #           |_____________  SMPA_tools_v02.py/time_calculations
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    df = pd.read_csv(path, skiprows=[0,2,3], na_values="NAN")
+    df.rename(columns=lambda x: x.strip(), inplace=True)                                                       
+    if "OrbitDP10(1)" not in df.columns:
+        df.rename(columns={'TIMESTAMP': 'DateTime', 'LVDT(1)': 'lvdt1', 'LVDT(2)': 'lvdt2'}, inplace=True)
+    else:
+        df.rename(columns={'TIMESTAMP': 'DateTime', 'OrbitDP10(1)': 'lvdt1', 'OrbitDP10(2)': 'lvdt2'}, inplace=True)
+    df['DateTime'], df.attrs['coerced_timestamps'] = parse_time_column(df['DateTime'], source, time_parsers)
+    time_calculations(df)
+    return df
+
+# Small punch creep - Old DAQ Software: tab separated text files with a free header that ends with the line of the column names ('index ...')
+def _detect_old_daq(path, head):
+    #------------------------------------------------------------------------------------
+    # Function: _detect_old_daq
+    # Purpose:  Recognizes an Old DAQ Software file of Small punch creep from its first lines (the tab separated line of the column names)
+    # Input:    path            ... the full path of the file
+    #           head            ... a list of the first lines of the file (see _head)
+    # Output:   recognized      ... True if the file is of this format
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    return any(line.startswith('index') and ('\t' in line) for line in head)
+
+def _read_old_daq(path, source=None, time_parsers=None):
+    #------------------------------------------------------------------------------------
+    # Function: _read_old_daq
+    # Purpose:  Reads an Old DAQ Software file of Small punch creep into the normalized dataframe of the app
+    # Input:    path            ... the full path of the file
+    #           source          ... not used, the time is always in seconds
+    #           time_parsers    ... not used
+    # Output:   df              ... a pandas dataframe with DateTime, Temperature, Force, u and the time columns
+    #                               Raises ValueError if the line of the column names is missing
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_find_line
+    #           |_____________  SMPA_tools_v02.py/time_calculations
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    header_rows = _find_line(path, 'index')
+    if header_rows is None:
+        raise ValueError('The line of the column names (index ...) of the Old DAQ Software file ' + path + ' could not be found.')
+    df = pd.read_csv(path, encoding='cp1252', sep='\t', skiprows=header_rows, names=['index', 'DateTime', 'Temperature', 'Force', 'u', 'lvdt_AUX', 'flag', 'trigger'])
+    df = df.iloc[:len(df)-1 , 1:].copy()                                                     # The last line is incomplete
+    df['DateTime'] = pd.to_datetime(df['DateTime'], unit='s')
+    df.attrs['coerced_timestamps'] = 0
+    time_calculations(df)
+    return df
+
+# Small punch creep - Phoenix (Format 1: time as '%d-0%m-%y %H:%M:%S.%f', Format 2: time in seconds) and FAST (as Phoenix - Format 1)
+def _phoenix_header(head):
+    #------------------------------------------------------------------------------------
+    # Function: _phoenix_header
+    # Purpose:  Checks if the first line of a file is the header of a Phoenix or FAST file (with the columns Time and LVDT_main)
+    # Input:    head            ... a list of the first lines of the file (see _head)
+    # Output:   recognized      ... True if the header is of Phoenix/FAST
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    return (len(head) > 1) and ({'Time', 'LVDT_main'} <= {name.strip() for name in head[0].split(',')})
+
+def _phoenix_time_is_number(head):
+    #------------------------------------------------------------------------------------
+    # Function: _phoenix_time_is_number
+    # Purpose:  Checks if the time of the first record of a Phoenix file is a number (Format 2, in seconds) or a date (Format 1)
+    # Input:    head            ... a list of the first lines of the file (see _head)
+    # Output:   is_number       ... True if the time is a number
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    try:
+        float(head[1].split(',')[[name.strip() for name in head[0].split(',')].index('Time')])
+        return True
+    except (ValueError, IndexError):
+        return False
+
+def _detect_phoenix_1(path, head):
+    #------------------------------------------------------------------------------------
+    # Function: _detect_phoenix_1
+    # Purpose:  Recognizes a Phoenix - Format 1 or FAST file of Small punch creep from its first lines
+    # Input:    path            ... the full path of the file
+    #           head            ... a list of the first lines of the file (see _head)
+    # Output:   recognized      ... True if the file is of this format
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_phoenix_header
+    #           |_____________  SMPA_tools_v02.py/_phoenix_time_is_number
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    return _phoenix_header(head) and not _phoenix_time_is_number(head)
+
+def _detect_phoenix_2(path, head):
+    #------------------------------------------------------------------------------------
+    # Function: _detect_phoenix_2
+    # Purpose:  Recognizes a Phoenix - Format 2 file of Small punch creep from its first lines
+    # Input:    path            ... the full path of the file
+    #           head            ... a list of the first lines of the file (see _head)
+    # Output:   recognized      ... True if the file is of this format
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_phoenix_header
+    #           |_____________  SMPA_tools_v02.py/_phoenix_time_is_number
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    return _phoenix_header(head) and _phoenix_time_is_number(head)
+
+def _read_phoenix(path, source=None, time_parsers=None):
+    #------------------------------------------------------------------------------------
+    # Function: _read_phoenix
+    # Purpose:  Reads a Phoenix (Format 1 or 2) or FAST file of Small punch creep into the normalized dataframe of the app
+    # Input:    path            ... the full path of the file
+    #           source          ... a hashable identifying the rig/source of the file, to remember its time format
+    #           time_parsers    ... a dictionary of source: parser, the memory of the time formats (see parse_time_column)
+    # Output:   df              ... a pandas dataframe with DateTime, u, the other columns of the file and the time columns
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/set_time_for_SPC_to_datetime
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    df = pd.read_csv(path)
+    df.rename(columns=lambda x: x.strip(), inplace=True)                                                      # It strips whitespaces from the columns' names
+    df.rename(columns={'Time': 'DateTime', 'LVDT_main': 'u'}, inplace=True)
+    set_time_for_SPC_to_datetime(df, source, time_parsers)                                                                  # It sets the DateTime to pandas datetime64 format
+    return df
+
+register_format_reader('Campbell Log_Data', _detect_campbell_log_data, _read_campbell_log_data, channels=('lvdt1', 'lvdt2'))
+register_format_reader('Old DAQ', _detect_old_daq, _read_old_daq, channels=('u', 'Force', 'Temperature'))
+register_format_reader('Phoenix 1 / FAST', _detect_phoenix_1, _read_phoenix, channels=('u',))
+register_format_reader('Phoenix 2', _detect_phoenix_2, _read_phoenix, channels=('u',))
+
+##################################################################################################################################################################################################
+###########################################################               Function 33                #############################################################################################
+##################################################################################################################################################################################################
+
+def stitch_segments(frames, time_col='DateTime'):
+    #------------------------------------------------------------------------------------
+    # Function: stitch_segments
+    # Purpose:  Stitches the segments (log files) of a long experiment into one dataframe, in the order they are given
+    #           The rows at the beginning of a segment that are not later than the end of the previous segment are overlapping or duplicated rows and they are dropped
+    #           A segment that starts at or before the start of the previous segment was logged with a restarted clock (e.g. time in seconds from the start of the file)
+    #           and it is shifted to continue the previous segment, one sampling interval after its end
+    #           The segments are copied once into preallocated arrays, and the time columns are calculated for the whole experiment,
+    #           hence the elapsed time is continuous and monotonic across the segments
+    # Input:    frames          ... a list of pandas dataframes, with the time in pandas datetime64 format in the time_col column
+    #                               Columns that are missing from some of the segments are filled with NaN/NaT
+    #           time_col        ... the name of the time column
+    # Output:   dataframe       ... the stitched pandas dataframe, with the number of segments and of dropped rows in dataframe.attrs['segments'] and dataframe.attrs['overlap_rows']
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/time_calculations
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    all_times = []
+    starts = []
+    previous = last = step = None
+    for frame in frames:
+        times = pd.to_datetime(frame[time_col]).to_numpy(dtype='datetime64[ns]')
+        valid = times[~np.isnat(times)]
+        start = 0
+        if (last is not None) and (len(valid) > 0):
+            if valid[0] <= previous:                                                # Restarted clock, e.g. Phoenix 2 segments that all count from 0 s
+                times = times + (last - valid[0] + step)
+                valid = times[~np.isnat(times)]
+            else:
+                later = times > last
+                start = int(np.argmax(later)) if later.any() else len(times)
+        if len(valid) > 0:
+            previous = valid[0]
+            last = max(last, valid[-1]) if last is not None else valid[-1]
+            step = np.median(np.diff(valid)) if len(valid) > 1 else np.timedelta64(0, 'ns')
+        all_times.append(times)
+        starts.append(start)
+
+    lengths = [len(times) - start for times, start in zip(all_times, starts)]
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+
+    data = {}
+    for column in columns:
+        if column == time_col:
+            values = np.empty(bounds[-1], dtype='datetime64[ns]')
+            for k, times in enumerate(all_times):
+                values[bounds[k]:bounds[k+1]] = times[starts[k]:]
+        else:
+            parts = [frame[column].to_numpy() if column in frame.columns else None for frame in frames]
+            dtype = np.result_type(*[part.dtype for part in parts if part is not None])
+            if any(part is None for part in parts):
+                if dtype.kind in 'iub':
+                    dtype = np.dtype('float64')
+                fill = np.datetime64('NaT') if dtype.kind in 'mM' else (np.nan if dtype.kind in 'fc' else None)
+                values = np.full(bounds[-1], fill, dtype=dtype)
+            else:
+                values = np.empty(bounds[-1], dtype=dtype)
+            for k, part in enumerate(parts):
+                if part is not None:
+                    values[bounds[k]:bounds[k+1]] = part[starts[k]:]
+        data[column] = values
+
+    dataframe = pd.DataFrame(data, columns=columns)
+    dataframe.attrs['coerced_timestamps'] = sum(frame.attrs.get('coerced_timestamps', 0) for frame in frames)
+    if len({frame.attrs.get('format') for frame in frames}) == 1 and ('format' in frames[0].attrs):
+        dataframe.attrs['format'] = frames[0].attrs['format']
+    dataframe.attrs['segments'] = len(frames)
+    dataframe.attrs['overlap_rows'] = int(sum(starts))
+    time_calculations(dataframe)
+    return dataframe
+
+##################################################################################################################################################################################################
+###########################################################               Function 34                #############################################################################################
+##################################################################################################################################################################################################
+
+def _float32_allowed(values):
+    #------------------------------------------------------------------------------------
+    # Function: _float32_allowed
+    # Purpose:  Checks if a channel can be kept in float32: its rounding error must be below half of the finest step between consecutive values
+    #           (the resolution of the logger), hence no logged level is lost
+    # Input:    values          ... a vector of the values of the channel
+    # Output:   allowed         ... True if float32 keeps all the logged levels
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    values = np.asarray(values, dtype='float64')
+    rounding = np.abs(values - values.astype('float32'))
+    steps = np.abs(np.diff(values))
+    steps = steps[steps > 0]
+    if len(steps) == 0:
+        return True
+    return np.nanmax(rounding, initial=0) <= steps.min()/2
+
+def compact_experiment(dataframe, channels):
+    #------------------------------------------------------------------------------------
+    # Function: compact_experiment
+    # Purpose:  Keeps the compact representation of an experiment that is needed for the analysis, to reduce the memory of many long experiments
+    #             DateTime       ... pandas datetime64
+    #             TotalSeconds   ... float64 (TotalMinutes and TotalHours are derived on demand, see Function 35)
+    #             the channels   ... float32, where the precision allows it (see _float32_allowed), otherwise float64
+    #           All the other columns of the original file are dropped
+    # Input:    dataframe       ... a pandas dataframe with 'DateTime', 'TotalSeconds' and the channels
+    #           channels        ... the names of the channels of the analysis, e.g. ('u', 'Force', 'Temperature')
+    # Output:   compact         ... the compact pandas dataframe, with its memory footprint in bytes in compact.attrs['memory_bytes']
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    data = {'DateTime': dataframe['DateTime'].to_numpy(), 'TotalSeconds': dataframe['TotalSeconds'].to_numpy(dtype='float64')}
+    for channel in channels:
+        values = pd.to_numeric(dataframe[channel], errors='coerce').to_numpy(dtype='float64')
+        data[channel] = values.astype('float32') if _float32_allowed(values) else values
+    compact = pd.DataFrame(data)
+    compact.attrs = dict(dataframe.attrs)
+    compact.attrs['memory_bytes'] = int(compact.memory_usage(index=True).sum())
+    return compact
+
+##################################################################################################################################################################################################
+###########################################################               Function 35                #############################################################################################
+##################################################################################################################################################################################################
+
+def elapsed_units(dataframe):
+    #------------------------------------------------------------------------------------
+    # Function: elapsed_units
+    # Purpose:  Derives the columns TotalMinutes and TotalHours from TotalSeconds, on demand (e.g. for the experiment under analysis only)
+    # Input:    dataframe     ... a pandas dataframe with a 'TotalSeconds' column
+    # Output:   dataframe     ... a copy of the dataframe appended with TotalMinutes and TotalHours
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    dataframe = dataframe.copy()
+    dataframe['TotalMinutes'] = dataframe['TotalSeconds']/60
+    dataframe['TotalHours'] = dataframe['TotalSeconds']/3600
+    return dataframe
+
+##################################################################################################################################################################################################
+###########################################################               Function 36                #############################################################################################
+##################################################################################################################################################################################################
+
+def calculate_local_rate(dataframe, variable, window, t0, tR, order=1, points=None):
+    #------------------------------------------------------------------------------------
+    # Function: calculate_local_rate
+    # Purpose:  Calculates the rate/first derivative of a curve as the slope of a local fit in a sliding time window centred on every point
+    #           (an alternative to the non-overlapping sections of calculate_rate_of_variable, that gives dense and less noisy rate curves)
+    #           order = 1: linear regression in the window. All the windows are calculated at once from the prefix sums of t, t², y and t·y, i.e. in O(n)
+    #           order > 1: Savitzky-Golay style local polynomial fit. The data are resampled to a uniform time step (the median sampling interval)
+    #                      and convolved with the derivative coefficients of the polynomial fit (by FFT for wide windows).
+    #                      The points closer than half a window to the ends of the data are left out
+    # Input:    dataframe        ... a pandas dataframe with 'TotalSeconds'
+    #           variable         ... a string indicating deflection or strain ('u', 'strain1', 'strain2', 'strain_avg')
+    #           window           ... the width of the sliding window in seconds (e.g. the length of a section of calculate_rate_of_variable)
+    #           t0               ... time in seconds when the experiment started
+    #           tR               ... time to rupture in seconds
+    #           order            ... the order of the local polynomial fit
+    #           points           ... None to calculate the rate at every record between t0 and tR, or the number of points of a uniform time grid between t0 and tR
+    # Output:   rate_points      ... a vector of the calculated rates (per hour)
+    #           t_points         ... a vector of the times (in hours) at the centre of each window
+    #           var_points       ... a vector of deflections/strains at the centre of each window
+    #                                (the points where the rate cannot be calculated, e.g. windows with less than two records, are left out)
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/trimmed_column                (the time of experiments trimmed with trim_experiment starts from zero)
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    seconds = trimmed_column(dataframe, 'TotalSeconds').astype('float64')
+    values = trimmed_column(dataframe, variable).astype('float64')
+    valid = np.isfinite(seconds) & np.isfinite(values)
+    seconds = seconds[valid]
+    values = values[valid]
+    if (np.diff(seconds) < 0).any():
+        sort = np.argsort(seconds, kind='stable')
+        seconds = seconds[sort]
+        values = values[sort]
+
+    if points is None:
+        centres = seconds[(seconds >= t0) & (seconds <= tR)]
+        var_centres = values[(seconds >= t0) & (seconds <= tR)]
+    else:
+        centres = np.linspace(t0, tR, int(points))
+        var_centres = np.interp(centres, seconds, values)
+    if (len(seconds) < 2) or (len(centres) == 0):
+        return [], [], []
+
+    if order <= 1:
+        rates = _local_linear_slopes(seconds, values, centres, window)
+    else:
+        rates = _local_polynomial_slopes(seconds, values, centres, window, order)
+
+    kept = np.isfinite(rates)
+    return list(rates[kept]), list(centres[kept]/3600), list(var_centres[kept])
+
+def _local_linear_slopes(seconds, values, centres, window):
+    #------------------------------------------------------------------------------------
+    # Function: _local_linear_slopes
+    # Purpose:  Calculates the slopes (per hour) of the linear regressions in the windows [centre - window/2, centre + window/2], from prefix sums
+    #           Time and values are centred on their means to limit the cancellation of the sums
+    # Input:    seconds         ... a sorted vector of the time of the records in seconds
+    #           values          ... a vector of the values of the records
+    #           centres         ... a vector of the centres of the windows in seconds
+    #           window          ... the width of the windows in seconds
+    # Output:   slopes          ... a vector of the slopes (NaN for windows with less than two distinct times)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    t = (seconds - seconds.mean())/3600
+    y = values - values.mean()
+    low = np.searchsorted(seconds, centres - window/2, side='left')
+    high = np.searchsorted(seconds, centres + window/2, side='right')
+
+    def window_sums(a):
+        prefix = np.concatenate(([0], np.cumsum(a)))
+        return prefix[high] - prefix[low]
+
+    s0 = (high - low).astype('float64')
+    st = window_sums(t)
+    stt = window_sums(t*t)
+    sy = window_sums(y)
+    sty = window_sums(t*y)
+    denominator = s0*stt - st*st
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = (s0*sty - st*sy)/denominator
+    slopes[~((s0 >= 2) & (denominator > 1e-12*s0*stt))] = np.nan
+    return slopes
+
+def _convolve_valid(x, kernel):
+    #------------------------------------------------------------------------------------
+    # Function: _convolve_valid
+    # Purpose:  Calculates np.convolve(x, kernel, 'valid'), by FFT for wide kernels
+    # Input:    x               ... a vector
+    #           kernel          ... a vector of the weights of the kernel
+    # Output:   convolution     ... the valid part of the convolution
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    if len(kernel) <= 64:
+        return np.convolve(x, kernel, mode='valid')
+    size = len(x) + len(kernel) - 1
+    n_fft = 1 << (size - 1).bit_length()
+    full = np.fft.irfft(np.fft.rfft(x, n_fft)*np.fft.rfft(kernel, n_fft), n_fft)[:size]
+    return full[len(kernel)-1:len(x)]
+
+def _local_polynomial_slopes(seconds, values, centres, window, order):
+    #------------------------------------------------------------------------------------
+    # Function: _local_polynomial_slopes
+    # Purpose:  Calculates the slopes (per hour) of the local polynomial fits of the given order (Savitzky-Golay) on the data resampled
+    #           to a uniform time step
+    # Input:    seconds         ... a sorted vector of the time of the records in seconds
+    #           values          ... a vector of the values of the records
+    #           centres         ... a vector of the centres of the windows in seconds
+    #           window          ... the width of the windows in seconds
+    #           order           ... the order of the polynomial
+    # Output:   slopes          ... a vector of the slopes (NaN outside the fitted part of the curve)
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_convolve_valid
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    span = seconds[-1] - seconds[0]
+    step = max(np.median(np.diff(seconds)), span/(4*len(seconds)))
+    if not step > 0:
+        return np.full(len(centres), np.nan)
+    grid = seconds[0] + step*np.arange(int(span/step) + 1)
+    resampled = np.interp(grid, seconds, values)
+    half = max(int(round(window/2/step)), order//2 + 1)
+    if 2*half + 1 > len(grid):
+        return np.full(len(centres), np.nan)
+
+    z = np.arange(-half, half + 1, dtype='float64')
+    coefficients = np.linalg.pinv(np.vander(z, order + 1, increasing=True))[1]/(step/3600)    # d/dt of the fit at the centre of the window
+    derivative = _convolve_valid(resampled, coefficients[::-1])
+    grid_centres = grid[half:len(grid)-half]
+    slopes = np.interp(centres, grid_centres, derivative)
+    slopes[(centres < grid_centres[0]) | (centres > grid_centres[-1])] = np.nan
+    return slopes
+
+##################################################################################################################################################################################################
+###########################################################               Function 37                #############################################################################################
+##################################################################################################################################################################################################
+
+SMOOTHING_KERNELS = ('moving average', 'centered moving average', 'exponential moving average', 'rolling median', 'gaussian')
+
+def smooth_values(values, window_size, kernel='moving average'):
+    #------------------------------------------------------------------------------------
+    # Function: smooth_values
+    # Purpose:  Smooths a vector with one of the following kernels, all vectorized (no loop over the points) and without any rounding
+    #             'moving average'              ... the mean of every full window of window_size points, assigned to the middle of the window
+    #                                               (calculated from cumulative sums; a window with a NaN is NaN)
+    #             'centered moving average'     ... the mean of the window centred on every point; the windows are truncated at the ends, so no point is lost
+    #             'exponential moving average'  ... a zero-phase exponential moving average (forward and backward), with span window_size
+    #             'rolling median'              ... the median of every full window of window_size points, assigned to the middle of the window (robust to spikes)
+    #             'gaussian'                    ... a Gaussian kernel over window_size points (standard deviation window_size/6), renormalized at the ends
+    # Input:    values          ... a vector of values, e.g. rates
+    #           window_size     ... the number of points of the window
+    #           kernel          ... one of SMOOTHING_KERNELS
+    # Output:   smoothed        ... a numpy array of the smoothed values
+    #           positions       ... a numpy array of the positions in values that the smoothed values correspond to (the middle of each window),
+    #                               to pick the matching times and deflections/strains
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    values = np.asarray(values, dtype='float64')
+    n = len(values)
+    window_size = int(window_size)
+    if kernel not in SMOOTHING_KERNELS:
+        raise ValueError('The smoothing kernel should be one of ' + ', '.join(SMOOTHING_KERNELS))
+
+    if kernel in ('moving average', 'rolling median'):
+        if n < window_size:
+            return np.empty(0), np.empty(0, dtype='int64')
+        positions = np.arange(n - window_size + 1) + window_size//2
+        if kernel == 'moving average':
+            prefix = np.concatenate(([0], np.cumsum(values)))
+            smoothed = (prefix[window_size:] - prefix[:-window_size])/window_size
+        else:
+            smoothed = np.median(np.lib.stride_tricks.sliding_window_view(values, window_size), axis=1)
+        return smoothed, positions
+
+    positions = np.arange(n)
+    if n == 0:
+        return np.empty(0), positions
+    finite = np.isfinite(values)
+    filled = np.where(finite, values, 0)
+    if kernel == 'centered moving average':
+        half = window_size//2
+        low = np.clip(positions - half, 0, n)
+        high = np.clip(positions + half + 1, 0, n)
+        sums = np.concatenate(([0], np.cumsum(filled)))
+        counts = np.concatenate(([0], np.cumsum(finite)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (sums[high] - sums[low])/(counts[high] - counts[low]), positions
+    if kernel == 'gaussian':
+        half = window_size//2
+        weights = np.exp(-0.5*(np.arange(-half, half + 1)/(window_size/6))**2)
+        weighted = np.convolve(filled, weights, mode='same')
+        normalization = np.convolve(finite.astype('float64'), weights, mode='same')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return weighted/normalization, positions
+    # Exponential moving average, as a convolution with its (truncated) exponential impulse response, forward and backward
+    alpha = 2/(window_size + 1)
+    length = min(int(np.ceil(np.log(1e-12)/np.log(1 - alpha))) + 1, 4*n) if alpha < 1 else 1
+    response = alpha*(1 - alpha)**np.arange(length)
+    response = response/response.sum()
+    filled = np.where(finite, values, np.interp(positions, positions[finite], values[finite]) if finite.any() else 0)
+    forward = _convolve_valid(np.pad(filled, (length - 1, 0), mode='edge'), response)
+    backward = _convolve_valid(np.pad(forward[::-1], (length - 1, 0), mode='edge'), response)[::-1]
+    return backward, positions
+
+##################################################################################################################################################################################################
+###########################################################               Function 38                #############################################################################################
+##################################################################################################################################################################################################
+
+def find_minimum_rate_window(rate_points, t_points, min_points=10, sizes=16, max_starts=2000):
+    #------------------------------------------------------------------------------------
+    # Function: find_minimum_rate_window
+    # Purpose:  Finds automatically the part of the rate curve where the minimum (secondary creep) rate is located, instead of selecting its bounds by hand
+    #           A second degree polynomial is fitted to every candidate window of the curve at once: the least-squares fits are calculated from the prefix sums
+    #           of t, t², t³, t⁴, r, r·t, r·t² and r² (with t scaled to [-1, 1]), so the whole search is close to linear in the number of rate points
+    #           A window is valid if its fit is convex and the vertex of the fit lies in the middle half of the window
+    #           The valid windows are scored by the adjusted R² of their fit, and the best one is returned (the widest one in case of equal scores)
+    # Input:    rate_points      ... a vector of deflection or strain rates
+    #           t_points         ... a vector of time (in hours), increasing
+    #           min_points       ... the minimum number of points of a window
+    #           sizes            ... the number of window sizes checked, between min_points and all the points (geometrically spaced)
+    #           max_starts       ... the maximum number of starting points checked for each size (every point, for curves up to max_starts points)
+    # Output:   result           ... a dictionary with the following keys, or None if no valid window exists
+    #                                   'time'       ... the time of the minimum rate (the vertex of the fit)
+    #                                   'rate'       ... the minimum rate
+    #                                   'low'        ... the time of the first point of the window
+    #                                   'high'       ... the time of the last point of the window
+    #                                   'score'      ... the adjusted R² of the fit
+    #                                   'polynomial' ... the fitted polynomial (numpy poly1d of time)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rates = np.asarray(rate_points, dtype='float64')
+    times = np.asarray(t_points, dtype='float64')
+    valid = np.isfinite(rates) & np.isfinite(times)
+    rates = rates[valid]
+    times = times[valid]
+    n = len(rates)
+    if n < max(min_points, 4):
+        return None
+
+    # Scaled time and rates, for well-conditioned sums
+    centre = (times[0] + times[-1])/2
+    half_span = (times[-1] - times[0])/2
+    if not half_span > 0:
+        return None
+    z = (times - centre)/half_span
+    r_mean = rates.mean()
+    r_scale = rates.std() if rates.std() > 0 else 1.0
+    y = (rates - r_mean)/r_scale
+
+    def prefix(a):
+        return np.concatenate(([0], np.cumsum(a)))
+    sums_z = [prefix(z**k) for k in range(5)]
+    sums_yz = [prefix(y*z**k) for k in range(3)]
+    sums_yy = prefix(y*y)
+
+    # Candidate windows [first, last)
+    lengths = np.unique(np.geomspace(max(min_points, 4), n, int(sizes)).astype('int64'))
+    first = []
+    last = []
+    for length in lengths:
+        starts = np.arange(0, n - length + 1, max(1, (n - length + 1)//int(max_starts)))
+        first.append(starts)
+        last.append(starts + length)
+    first = np.concatenate(first)
+    last = np.concatenate(last)
+
+    s = [sums_z[k][last] - sums_z[k][first] for k in range(5)]
+    b = np.stack([sums_yz[k][last] - sums_yz[k][first] for k in range(3)], axis=1)
+    a = np.stack([np.stack([s[0], s[1], s[2]], axis=1),
+                  np.stack([s[1], s[2], s[3]], axis=1),
+                  np.stack([s[2], s[3], s[4]], axis=1)], axis=1)
+    well_posed = np.abs(np.linalg.det(a)) > 1e-12*np.abs(s[0]*s[2]*s[4])
+    if not well_posed.any():
+        return None
+    first, last, a, b = first[well_posed], last[well_posed], a[well_posed], b[well_posed]
+    coefficients = np.linalg.solve(a, b[:, :, None])[:, :, 0]                          # c0 + c1*z + c2*z²
+
+    # Goodness of the fits
+    m = (last - first).astype('float64')
+    syy = sums_yy[last] - sums_yy[first]
+    sse = np.maximum(syy - np.einsum('ij,ij->i', coefficients, b), 0)
+    sst = syy - b[:, 0]**2/m
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = 1 - (sse/sst)*(m - 1)/(m - 3)
+
+    # Convex fits with their vertex in the middle half of the window
+    c0, c1, c2 = coefficients[:, 0], coefficients[:, 1], coefficients[:, 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertex = -c1/(2*c2)
+    z_low = z[first]
+    z_high = z[last - 1]
+    quarter = (z_high - z_low)/4
+    accepted = (c2 > 0) & (vertex >= z_low + quarter) & (vertex <= z_high - quarter) & np.isfinite(score) & (sst > 0)
+    if not accepted.any():
+        return None
+    candidates = np.flatnonzero(accepted)
+    best = candidates[np.lexsort((-m[candidates], -score[candidates]))[0]]
+
+    # Back to the units of time and rate
+    fitted = np.poly1d([c2[best], c1[best], c0[best]])(np.poly1d([1/half_span, -centre/half_span]))*r_scale + r_mean
+    time = centre + vertex[best]*half_span
+    return {'time': time, 'rate': fitted(time), 'low': times[first[best]], 'high': times[last[best] - 1],
+            'score': score[best], 'polynomial': fitted}
+
+##################################################################################################################################################################################################
+###########################################################               Function 39                #############################################################################################
+##################################################################################################################################################################################################
+
+def _sparse_table(values, function):
+    #------------------------------------------------------------------------------------
+    # Function: _sparse_table
+    # Purpose:  Builds the sparse table of a vector: level j holds the function (np.minimum or np.maximum) over the 2**j values starting at every position
+    # Input:    values          ... a vector
+    #           function        ... np.minimum or np.maximum
+    # Output:   table           ... a list of the levels
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    table = [values]
+    width = 1
+    while 2*width <= len(values):
+        table.append(function(table[-1][:-width], table[-1][width:]))
+        width *= 2
+    return table
+
+def _range_query(table, function, low, high):
+    #------------------------------------------------------------------------------------
+    # Function: _range_query
+    # Purpose:  Calculates the function (np.minimum or np.maximum) over values[low:high+1] for vectors of bounds, in O(1) per query
+    # Input:    table           ... the sparse table of the values (see _sparse_table)
+    #           function        ... the function of the table
+    #           low, high       ... vectors of the bounds (both included)
+    # Output:   result          ... a vector of the function over every range
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    level = np.frexp(high - low + 1)[1] - 1                                   # floor(log2(length))
+    result = np.empty(len(low))
+    for j in np.unique(level):
+        at = level == j
+        result[at] = function(table[j][low[at]], table[j][high[at] - (1 << j) + 1])
+    return result
+
+def _nearest_lower(minima, values, positions, direction):
+    #------------------------------------------------------------------------------------
+    # Function: _nearest_lower
+    # Purpose:  Finds the position of the nearest value strictly lower than values[positions], to the left or to the right,
+    #           by binary lifting over the sparse table of minima
+    # Input:    minima          ... the sparse table of minima of the values (see _sparse_table)
+    #           values          ... a vector
+    #           positions       ... a vector of positions
+    #           direction       ... -1 for the left, +1 for the right
+    # Output:   nearest         ... a vector of the positions found (-1 or len(values) if there is none)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    n = len(values)
+    target = values[positions]
+    cursor = positions.copy() if direction < 0 else positions + 1
+    for j in range(len(minima) - 1, -1, -1):
+        width = 1 << j
+        if direction < 0:
+            start = cursor - width
+            possible = start >= 0
+            skip = np.zeros(len(positions), dtype=bool)
+            skip[possible] = minima[j][start[possible]] >= target[possible]
+            cursor[skip] -= width
+        else:
+            possible = cursor + width <= n
+            skip = np.zeros(len(positions), dtype=bool)
+            skip[possible] = minima[j][cursor[possible]] >= target[possible]
+            cursor[skip] += width
+    return cursor - 1 if direction < 0 else cursor
+
+def find_rate_minima(rate_points, t_points, k=2, prominence=None, spacing=None):
+    #------------------------------------------------------------------------------------
+    # Function: find_rate_minima
+    # Purpose:  Finds the k most prominent local minima of a rate curve (e.g. the double minimum that may indicate cracking), in one vectorized pass:
+    #             - the valleys of the curve are all the points lower than their left neighbour and not higher than their right neighbour
+    #             - the prominence of a valley is its depth below the lower of the highest points on each side, up to the nearest lower point of the curve
+    #               (as for the peaks of scipy.signal.find_peaks), calculated with sparse tables of the range minima and maxima
+    #             - the valleys less prominent than the given prominence are dropped, and the most prominent ones are kept, at least spacing apart
+    #           Each minimum is then refined by a second degree polynomial fitted locally (between its bases, at most spacing/2 on each side, see Function 40)
+    # Input:    rate_points      ... a vector of deflection or strain rates
+    #           t_points         ... a vector of time (in hours), increasing
+    #           k                ... the (maximum) number of minima
+    #           prominence       ... the minimum prominence of a minimum (by default 3 times the noise of the curve, estimated from the median absolute deviation of its differences)
+    #           spacing          ... the minimum time between two minima (by default 5% of the duration of the curve)
+    # Output:   minima           ... a list of dictionaries (one for each minimum, in order of time) with the following keys
+    #                                   'time'       ... the time of the minimum
+    #                                   'rate'       ... the minimum rate
+    #                                   'low'        ... the lower bound of the part of the curve fitted around the minimum
+    #                                   'high'       ... the upper bound of the part of the curve fitted around the minimum
+    #                                   'prominence' ... the prominence of the minimum
+    #                                   'polynomial' ... the fitted polynomial, or None if the fit did not present a minimum (the point of the curve is kept then)
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/fit_local_minimum
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rates = np.asarray(rate_points, dtype='float64')
+    times = np.asarray(t_points, dtype='float64')
+    valid = np.isfinite(rates) & np.isfinite(times)
+    rates = rates[valid]
+    times = times[valid]
+    n = len(rates)
+    if n < 3:
+        return []
+    if prominence is None:
+        differences = np.diff(rates)
+        prominence = 3*1.4826*np.median(np.abs(differences - np.median(differences)))/np.sqrt(2)
+    if spacing is None:
+        spacing = 0.05*(times[-1] - times[0])
+
+    # Valleys (the first point of flat valleys)
+    valleys = np.flatnonzero((rates[1:-1] < rates[:-2]) & (rates[1:-1] <= rates[2:])) + 1
+    if len(valleys) == 0:
+        return []
+
+    # Prominences
+    minima_table = _sparse_table(rates, np.minimum)
+    maxima_table = _sparse_table(rates, np.maximum)
+    left = _nearest_lower(minima_table, rates, valleys, -1)
+    right = _nearest_lower(minima_table, rates, valleys, +1)
+    left_base = np.maximum(left, 0)
+    right_base = np.minimum(right, n - 1)
+    left_height = _range_query(maxima_table, np.maximum, left_base, valleys)
+    right_height = _range_query(maxima_table, np.maximum, valleys, right_base)
+    prominences = np.minimum(left_height, right_height) - rates[valleys]
+
+    # The most prominent valleys, at least spacing apart
+    available = prominences >= prominence
+    chosen = []
+    while (len(chosen) < k) and available.any():
+        best = np.argmax(np.where(available, prominences, -np.inf))
+        chosen.append(best)
+        available &= np.abs(times[valleys] - times[valleys[best]]) >= spacing
+    chosen = sorted(chosen, key=lambda c: valleys[c])
+
+    minima = []
+    for c in chosen:
+        i = valleys[c]
+        low = max(times[left_base[c]], times[i] - spacing/2)
+        high = min(times[right_base[c]], times[i] + spacing/2)
+        minimum = {'time': times[i], 'rate': rates[i], 'low': low, 'high': high, 'prominence': prominences[c], 'polynomial': None}
+        if ((times >= low) & (times <= high)).sum() >= 3:
+            middle_part, tt_middle, polynomial, x_min, y_min = fit_local_minimum(rates, times, low, high)
+            inside = (x_min >= low) & (x_min <= high)
+            if inside.any():
+                minimum.update({'time': x_min[inside][0], 'rate': y_min[inside][0], 'polynomial': polynomial})
+        minima.append(minimum)
+    return minima
+
+##################################################################################################################################################################################################
+###########################################################               Function 40                #############################################################################################
+##################################################################################################################################################################################################
+
+def fit_local_minimum(rate_points, t_points, low, high):
+    #------------------------------------------------------------------------------------
+    # Function: fit_local_minimum
+    # Purpose:  Isolates the part of the rate curve between two times, fits a polynomial of second degree to it and finds the minimum of the polynomial
+    # Input:    rate_points      ... a vector of deflection or strain rates
+    #           t_points         ... a vector of time
+    #           low              ... the lower bound (time) of the part of the curve
+    #           high             ... the upper bound (time) of the part of the curve
+    # Output:   middle_part      ... a vector of the rates of the part of the curve
+    #           tt_middle        ... a vector of the times of the part of the curve
+    #           poly             ... the fitted polynomial
+    #           x_min            ... a numpy array with the time of the minimum of the polynomial (empty if the polynomial has no minimum)
+    #           y_min            ... a numpy array with the minimum rate
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/calc_polynomial
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rates = np.asarray(rate_points, dtype='float64')
+    times = np.asarray(t_points, dtype='float64')
+    inside = (times >= low) & (times <= high)
+    middle_part = rates[inside]
+    tt_middle = times[inside]
+
+    poly = calc_polynomial(middle_part, tt_middle)
+    crit = poly.deriv().r
+    r_crit = crit[crit.imag==0].real
+    test = poly.deriv(2)(r_crit)
+    x_min = r_crit[test>0]
+    y_min = poly(x_min)
+    return list(middle_part), list(tt_middle), poly, x_min, y_min
+
+##################################################################################################################################################################################################
+###########################################################               Function 41                #############################################################################################
+##################################################################################################################################################################################################
+
+def flag_multiple_minima(curves, k=2, prominence=None, spacing=None):
+    #------------------------------------------------------------------------------------
+    # Function: flag_multiple_minima
+    # Purpose:  Finds the minima of the rate curves of a batch of experiments and flags the experiments with more than one minimum,
+    #           which may be an indication of cracking during the experiment
+    # Input:    curves           ... a dictionary of experiment name: (rate_points, t_points)
+    #           k, prominence, spacing ... as in find_rate_minima
+    # Output:   table            ... a pandas dataframe with one row for each experiment, with the number of minima, their times and rates and the flag
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/find_rate_minima
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rows = []
+    for name, (rate_points, t_points) in curves.items():
+        minima = find_rate_minima(rate_points, t_points, k, prominence, spacing)
+        rows.append([name, len(minima),
+                     ', '.join(f"{minimum['time']:.1f}" for minimum in minima),
+                     ', '.join(f"{minimum['rate']:.4g}" for minimum in minima),
+                     'Yes' if len(minima) > 1 else 'No'])
+    return pd.DataFrame(rows, columns=['Experiment', 'Minima', 'Times of the minima [h]', 'Minimum rates', 'Possible cracking'])
+
+##################################################################################################################################################################################################
+###########################################################               Function 42                #############################################################################################
+##################################################################################################################################################################################################
+
+def detect_trim_bounds(dataframe, variable, load_factor=6, rupture_factor=20, gap=10):
+    #------------------------------------------------------------------------------------
+    # Function: detect_trim_bounds
+    # Purpose:  Suggests the bounds of the valid part of an experiment: the end of the load application and the moment of rupture
+    #           The noise of the differences of the variable is estimated robustly (median absolute deviation), so that the thresholds
+    #           adapt to every experiment, and the jumps are the differences that deviate from the median difference by more than
+    #           a multiple of the noise. All the differences are checked at once with boolean masks
+    #           The load application is the first group of jumps (jumps less than gap records apart) in the first half of the data,
+    #           and the experiment starts at the record after its last jump. The rupture is the first jump bigger than rupture_factor times
+    #           the noise after the start (and after the first fifth of the data), and the experiment ends at the record before it
+    #           If no load application or rupture is found, the first or last record is suggested
+    # Input:    dataframe        ... a pandas dataframe with the variable and the TotalSeconds
+    #           variable         ... the deflection 'u' or the strain 'strain1', 'strain2', 'strain_avg'
+    #           load_factor      ... the multiple of the noise above which a difference is a jump of the load application
+    #           rupture_factor   ... the multiple of the noise above which a difference is a jump of the rupture
+    #           gap              ... the maximum number of records between two jumps of the same load application
+    # Output:   bounds           ... a dictionary with the positions (start, end) of the first and last valid record, their times in hours
+    #                                (start_hours, end_hours), their values (start_value, end_value) and the estimated noise of the differences (noise)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    values = dataframe[variable].to_numpy(dtype='float64')
+    positions = np.flatnonzero(np.isfinite(values))
+    if len(positions) < 3:
+        return None
+    values = values[positions]
+    n = len(values)
+
+    differences = np.diff(values)
+    deviations = np.abs(differences - np.median(differences))
+    noise = 1.4826*np.median(deviations)
+    if noise == 0:                                                                  # Quantized signals: most of the differences are equal
+        noise = deviations[deviations > 0].min() if (deviations > 0).any() else 1.0
+
+    # Load application: the first group of jumps in the first half of the data
+    start = 0
+    jumps = np.flatnonzero(deviations[:int(n/2)] > load_factor*noise)
+    if len(jumps) > 0:
+        breaks = np.flatnonzero(np.diff(jumps) > gap)
+        start = int(jumps[breaks[0]] if len(breaks) > 0 else jumps[-1]) + 1
+
+    # Rupture: the first big jump after the start of the experiment
+    end = n - 1
+    jumps = np.flatnonzero(deviations[max(start, int(n/5)):] > rupture_factor*noise)
+    if len(jumps) > 0:
+        end = max(start, int(n/5)) + int(jumps[0])
+
+    seconds = dataframe.TotalSeconds.to_numpy(dtype='float64')[positions]
+    return {'start': int(positions[start]), 'end': int(positions[end]),
+            'start_hours': float(seconds[start]/3600), 'end_hours': float(seconds[end]/3600),
+            'start_value': float(values[start]), 'end_value': float(values[end]), 'noise': float(noise)}
+
+##################################################################################################################################################################################################
+###########################################################               Function 43                #############################################################################################
+##################################################################################################################################################################################################
+
+CREEP_STAGE_CRITERIA = ('change point', 'rate doubling', 'offset')
+CHANGE_POINT_BLOCK = 2**22                              # The number of pairs of change points evaluated at once (about 32 MB per array of costs)
+
+def segment_creep_stages(rate_points, t_points, var_points=None, criterion='rate doubling', offset=1.0, min_points=5):
+    #------------------------------------------------------------------------------------
+    # Function: segment_creep_stages
+    # Purpose:  Splits a rate curve into the primary, secondary and tertiary creep stages
+    #           The curve (its logarithm, if all the rates are positive) is segmented into three parts with the least total squared error of a linear
+    #           fit in every part, with the squared errors of the parts calculated from prefix sums in constant time (see _segment_costs)
+    #           The two change points are searched exactly, over all the O(n^2) pairs of positions for n points of the curve, vectorized in blocks
+    #           of first change points (see _best_change_points), instead of with a loop of dynamic programming
+    #           The first change point is the end of the primary creep. The onset of the tertiary creep is found with the selected criterion:
+    #               'change point'  ... the second change point
+    #               'rate doubling' ... the rate exceeds (and stays above) twice the minimum rate, the median rate of the secondary part
+    #               'offset'        ... the variable deviates by more than offset from the line of the secondary creep (needs var_points)
+    # Input:    rate_points      ... a vector of the rates
+    #           t_points         ... a vector of the times of the rates in hours
+    #           var_points       ... a vector of the deflections/strains at the same times (only for the 'offset' criterion)
+    #           criterion        ... one of CREEP_STAGE_CRITERIA
+    #           offset           ... the deviation from the secondary creep line for the 'offset' criterion, in the units of the variable (e.g. 1 % strain)
+    #           min_points       ... the minimum number of points of every stage
+    # Output:   stages           ... a dictionary with the intervals (start time, end time) of the 'primary', 'secondary' and 'tertiary' stages,
+    #                                the 'minimum_rate' and the times of the two 'change_points', or None if the curve is too short
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_moments
+    #           |_____________  SMPA_tools_v02.py/_segment_costs
+    #           |_____________  SMPA_tools_v02.py/_best_change_points
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rates = np.asarray(rate_points, dtype='float64')
+    times = np.asarray(t_points, dtype='float64')
+    valid = np.isfinite(rates) & np.isfinite(times)
+    if var_points is not None:
+        values = np.asarray(var_points, dtype='float64')
+        valid &= np.isfinite(values)
+        values = values[valid]
+    rates, times = rates[valid], times[valid]
+    n = len(rates)
+    if n < 3*min_points:
+        return None
+
+    # Squared errors of the linear fit of every part [i, j) of the curve, from the prefix sums of the centred data
+    # Positive rates are segmented in logarithmic scale, so that the high rates at the start of the primary creep do not dominate the errors
+    fitted = np.log(rates) if (rates > 0).all() else rates
+    sums = [np.concatenate(([0], np.cumsum(array))) for array in _moments(times - times.mean(), fitted - fitted.mean())]
+
+    # The best pair of change points, with at most about CHANGE_POINT_BLOCK pairs evaluated at once (ties go to the earliest pair)
+    candidates = np.arange(min_points, n - min_points + 1)
+    block = max(1, CHANGE_POINT_BLOCK//len(candidates))
+    _, first, second = min(_best_change_points(sums, n, candidates[k:k+block], candidates, min_points) for k in range(0, len(candidates), block))
+
+    minimum_rate = float(np.median(rates[first:second]))
+    if criterion == 'change point':
+        onset = second
+    elif criterion == 'rate doubling':
+        below = np.flatnonzero(rates[first:] < 2*minimum_rate)
+        onset = first + int(below[-1]) + 1 if len(below) > 0 else first
+    elif criterion == 'offset':
+        if var_points is None:
+            raise ValueError("The 'offset' criterion needs the deflections/strains of the curve")
+        line = np.polyfit(times[first:second], values[first:second], 1)
+        beyond = np.flatnonzero(values[second:] - np.polyval(line, times[second:]) > offset)
+        onset = second + int(beyond[0]) if len(beyond) > 0 else n
+    else:
+        raise ValueError("Unknown criterion for the onset of the tertiary creep: " + str(criterion))
+    onset = min(max(onset, first + 1), n)
+
+    last = times[n-1]
+    return {'primary': (float(times[0]), float(times[first])),
+            'secondary': (float(times[first]), float(times[onset]) if onset < n else float(last)),
+            'tertiary': (float(times[onset]), float(last)) if onset < n else None,
+            'minimum_rate': minimum_rate,
+            'change_points': (float(times[first]), float(times[second]))}
+
+def _moments(x, y):
+    #------------------------------------------------------------------------------------
+    # Function: _moments
+    # Purpose:  Calculates the terms of the sums of the linear least squares: n, x, y, xx, xy, yy, for the prefix sums of segment_creep_stages
+    # Input:    x, y            ... vectors of the coordinates of the curve
+    # Output:   moments         ... a tuple of the vectors of the terms
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    return np.ones(len(x)), x, y, x*x, x*y, y*y
+
+def _segment_costs(sums, first, last):
+    #------------------------------------------------------------------------------------
+    # Function: _segment_costs
+    # Purpose:  Calculates the squared errors of the least-squares lines of the parts [first, last) of a curve, from the prefix sums of _moments
+    # Input:    sums            ... the prefix sums of the _moments of the curve
+    #           first, last     ... arrays of the first and the (excluded) last point of the parts
+    # Output:   errors          ... an array of the squared errors (0 for empty parts)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    count, sx, sy, sxx, sxy, syy = (array[last] - array[first] for array in sums)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sxx_centred = sxx - sx*sx/count
+        sxy_centred = sxy - sx*sy/count
+        syy_centred = syy - sy*sy/count
+        errors = syy_centred - np.where(sxx_centred > 0, sxy_centred*sxy_centred/sxx_centred, 0)
+    return np.where(count > 0, np.maximum(errors, 0), 0)
+
+def _best_change_points(sums, n, firsts, seconds, min_points):
+    #------------------------------------------------------------------------------------
+    # Function: _best_change_points
+    # Purpose:  Finds the pair of change points with the least total squared error of the three parts [0, first), [first, second) and [second, n)
+    #           of a curve, with at least min_points points in the middle part. All the pairs of candidates are evaluated at once
+    # Input:    sums             ... the prefix sums of the _moments of the curve
+    #           n                ... the number of points of the curve
+    #           firsts, seconds  ... vectors of the candidate positions of the first and the second change point
+    #           min_points       ... the minimum number of points of the middle part
+    # Output:   total            ... the least total squared error (inf if no pair has min_points points in the middle part)
+    #           first, second    ... the positions of the two change points
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/_segment_costs
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    first = firsts[:, None]
+    second = seconds[None, :]
+    totals = _segment_costs(sums, np.zeros_like(first), first) + _segment_costs(sums, first, second) + _segment_costs(sums, second, np.full_like(second, n))
+    totals = np.where(second - first >= min_points, totals, np.inf)
+    i, j = np.unravel_index(np.argmin(totals), totals.shape)
+    return float(totals[i, j]), int(firsts[i]), int(seconds[j])
+
+##################################################################################################################################################################################################
+###########################################################               Function 44                #############################################################################################
+##################################################################################################################################################################################################
+
+def creep_stage_table(curves, criterion='rate doubling', offset=1.0, min_points=5, stages=None):
+    #------------------------------------------------------------------------------------
+    # Function: creep_stage_table
+    # Purpose:  Segments the rate curves of a batch of experiments into creep stages
+    # Input:    curves           ... a dictionary of experiment name: (rate_points, t_points, var_points)
+    #           criterion, offset, min_points ... as in segment_creep_stages
+    #           stages           ... a dictionary of experiment name: the output of segment_creep_stages, for the experiments that are already segmented
+    #                                (e.g. kept from a previous run), or None
+    # Output:   table            ... a pandas dataframe with one row for each experiment, with the end of the primary creep, the onset of the tertiary creep,
+    #                                the duration of the secondary creep and the minimum rate
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/segment_creep_stages
+    # External packages:
+    #           |_____________  pandas
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    rows = []
+    stages = {} if stages is None else stages
+    for name, (rate_points, t_points, var_points) in curves.items():
+        result = stages[name] if name in stages else segment_creep_stages(rate_points, t_points, var_points, criterion, offset, min_points)
+        if result is None:
+            rows.append([name, np.nan, np.nan, np.nan, np.nan])
+        else:
+            rows.append([name, result['primary'][1], result['tertiary'][0] if result['tertiary'] is not None else np.nan,
+                         result['secondary'][1] - result['secondary'][0], result['minimum_rate']])
+    return pd.DataFrame(rows, columns=['Experiment', 'End of primary creep [h]', 'Onset of tertiary creep [h]', 'Duration of secondary creep [h]', 'Minimum rate'])
+
+##################################################################################################################################################################################################
+###########################################################               Function 45                #############################################################################################
+##################################################################################################################################################################################################
+
+TIME_COLUMNS = {'TotalSeconds': 1, 'TotalMinutes': 60, 'TotalHours': 3600}
+
+def trim_experiment(dataframe, channel, low=None, high=None, zero=()):
+    #------------------------------------------------------------------------------------
+    # Function: trim_experiment
+    # Purpose:  Trims an experiment to the records between the first one where the channel reaches low and the last one before it exceeds high
+    #           The bounds are found with a binary search: directly on the time channels, which are monotonic, and on the running maximum of any
+    #           other channel (e.g. the deflection). The trimmed experiment is a slice (a view) of the input dataframe, nothing is copied or recalculated:
+    #           the elapsed time since the first record and the zeroed channels are kept as offsets in the attrs of the slice ('offsets'),
+    #           which are subtracted when a column is read with trimmed_column
+    #           A trimmed experiment can be trimmed again, the bounds then refer to its offset values (the columns zeroed before keep their offsets)
+    # Input:    dataframe        ... a pandas dataframe with the TotalSeconds (and optionally TotalMinutes, TotalHours)
+    #           channel          ... the column of the bounds, e.g. 'TotalHours' or 'u'
+    #           low, high        ... the bounds in the units of the channel (None for no bound)
+    #           zero             ... the columns that start from zero in the trimmed experiment, besides the time
+    # Output:   trimmed          ... the slice of the dataframe, with the offsets of the time columns and the zeroed columns in its attrs
+    # Internal functions:
+    #           |_____________  SMPA_tools_v02.py/trimmed_column
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    offsets = dataframe.attrs.get('offsets', {})
+    values = dataframe[channel].to_numpy(dtype='float64')
+    if channel not in TIME_COLUMNS:
+        values = np.fmax.accumulate(values)                                             # The running maximum is monotonic, NaN records are skipped
+    shift = offsets.get(channel, 0)
+    start = 0 if low is None else int(np.searchsorted(values, low + shift, side='left'))
+    end = len(values) if high is None else int(np.searchsorted(values, high + shift, side='right'))
+
+    trimmed = dataframe.iloc[start:max(start, end)]
+    trimmed.attrs = dict(dataframe.attrs)
+    if len(trimmed) > 0:
+        seconds = trimmed['TotalSeconds'].iloc[0]
+        trimmed.attrs['offsets'] = {**offsets,
+                                    **{column: float(seconds/scale) for column, scale in TIME_COLUMNS.items() if column in trimmed},
+                                    **{column: float(trimmed[column].iloc[0]) for column in zero}}
+    return trimmed
+
+##################################################################################################################################################################################################
+###########################################################               Function 46                #############################################################################################
+##################################################################################################################################################################################################
+
+def trimmed_column(dataframe, column, position=None):
+    #------------------------------------------------------------------------------------
+    # Function: trimmed_column
+    # Purpose:  Reads a column of an experiment trimmed with trim_experiment, with its offset subtracted (e.g. the time since the start of the trimmed experiment)
+    #           For experiments that have not been trimmed, the column is read as is
+    # Input:    dataframe        ... a pandas dataframe
+    #           column           ... the name of the column
+    #           position         ... the position of a single record to read (e.g. -1 for the last record), or None for the whole column
+    # Output:   values           ... a numpy vector (or a single value) of the column minus its offset
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    offset = dataframe.attrs.get('offsets', {}).get(column, 0)
+    if position is not None:
+        return dataframe[column].iloc[position] - offset
+    values = dataframe[column].to_numpy()
+    return values - offset if offset != 0 else values
+
+##################################################################################################################################################################################################
+###########################################################               Function 47                #############################################################################################
+##################################################################################################################################################################################################
+
+DOWNSAMPLING_METHODS = ('minmax', 'lttb')
+
+def downsample_indices(x, y, max_points=4000, method='minmax'):
+    #------------------------------------------------------------------------------------
+    # Function: downsample_indices
+    # Purpose:  Selects at most max_points records of a curve for plotting, keeping its visual shape and its extremes
+    #               'minmax' ... the records are split into max_points/2 buckets of consecutive records and the minimum and the maximum of every bucket
+    #                            are kept (one bucket per pixel column of the plot), calculated for all the buckets at once
+    #               'lttb'   ... largest triangle three buckets: from every bucket the record that forms the largest triangle with the record
+    #                            kept from the previous bucket and the average of the next bucket is kept
+    #           The first and the last record are always kept, records with NaN values are left out
+    # Input:    x, y             ... vectors of the coordinates of the records
+    #           max_points       ... the maximum number of records to keep
+    #           method           ... one of DOWNSAMPLING_METHODS
+    # Output:   index            ... a sorted vector of the positions of the records to keep (all the valid records, if they are less than max_points)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(valid) <= max_points:
+        return valid
+    if method == 'lttb':
+        return valid[_lttb_indices(x[valid], y[valid], max_points)]
+    if method == 'minmax':
+        return valid[_minmax_indices(y[valid], max(1, max_points//2 - 1))]
+    raise ValueError("Unknown downsampling method: " + str(method))
+
+def _minmax_indices(y, buckets):
+    #------------------------------------------------------------------------------------
+    # Function: _minmax_indices
+    # Purpose:  Selects the first and last record and the positions of the minimum and the maximum of buckets of consecutive records of equal size
+    #           (the last one may be shorter)
+    # Input:    y               ... a vector of the y coordinates of the records
+    #           buckets         ... the number of buckets
+    # Output:   index           ... a sorted vector of the positions of the selected records
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    n = len(y)
+    size = -(-n//buckets)
+    rows = -(-n//size)
+    lows = np.full(rows*size, np.inf)
+    highs = np.full(rows*size, -np.inf)
+    lows[:n] = y
+    highs[:n] = y
+    offsets = np.arange(rows)*size
+    index = np.concatenate(([0, n - 1], offsets + lows.reshape(rows, size).argmin(axis=1), offsets + highs.reshape(rows, size).argmax(axis=1)))
+    return np.unique(index)
+
+def _lttb_indices(x, y, threshold):
+    #------------------------------------------------------------------------------------
+    # Function: _lttb_indices
+    # Purpose:  Selects records by the Largest Triangle Three Buckets: the first and last record and one record of each of threshold - 2 buckets
+    #           of the records in between, the one with the largest triangle with the previous selected record and the average of the next bucket
+    # Input:    x, y            ... vectors of the coordinates of the records
+    #           threshold       ... the number of records to select
+    # Output:   index           ... a sorted vector of the positions of the selected records
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    n = len(x)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    sums_x = np.add.reduceat(x[1:n-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    average_x = np.append(sums_x/counts, x[n-1])                                   # The average of every bucket, the last record after the last bucket
+    average_y = np.append(sums_y/counts, y[n-1])
+    index = np.empty(threshold, dtype=int)
+    index[0] = 0
+    index[threshold-1] = n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket+1]
+        area = np.abs((x[a] - average_x[bucket+1])*(y[low:high] - y[a]) - (x[a] - x[low:high])*(average_y[bucket+1] - y[a]))
+        a = low + int(area.argmax())
+        index[bucket+1] = a
+    return index
+
+##################################################################################################################################################################################################
+###########################################################               Function 48                #############################################################################################
+##################################################################################################################################################################################################
+
+def build_minmax_pyramid(x, y):
+    #------------------------------------------------------------------------------------
+    # Function: build_minmax_pyramid
+    # Purpose:  Builds a multi-resolution min/max pyramid of a curve, once, so that any range of the curve can be read at screen resolution (see query_pyramid)
+    #           Level k splits the records into buckets of 2^k consecutive records and keeps the positions of the minimum and the maximum of every bucket.
+    #           Every level is built from the previous one by comparing pairs of buckets, hence the whole pyramid is built in O(n)
+    # Input:    x                ... a vector of the (monotonic) x coordinates of the records, e.g. the time
+    #           y                ... a vector of the y coordinates of the records
+    # Output:   pyramid          ... a dictionary with the coordinates ('x', 'y') and the levels ('levels', a list of (bucket size, positions of the minima, positions of the maxima))
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    lows = np.where(np.isnan(y), np.inf, y)                                        # NaN records are never the minimum or the maximum of a bucket
+    highs = np.where(np.isnan(y), -np.inf, y)
+    dtype = 'int32' if len(y) < 2**31 else 'int64'
+    minima = np.arange(len(y), dtype=dtype)
+    maxima = minima
+    levels = []
+    size = 1
+    while len(minima) > 1:
+        if len(minima) % 2 == 1:                                                    # The last bucket is paired with itself
+            minima = np.append(minima, minima[-1])
+            maxima = np.append(maxima, maxima[-1])
+        left, right = minima[0::2], minima[1::2]
+        minima = np.where(lows[right] < lows[left], right, left)
+        left, right = maxima[0::2], maxima[1::2]
+        maxima = np.where(highs[right] > highs[left], right, left)
+        size *= 2
+        levels.append((size, minima, maxima))
+    return {'x': x, 'y': y, 'levels': levels}
+
+##################################################################################################################################################################################################
+###########################################################               Function 49                #############################################################################################
+##################################################################################################################################################################################################
+
+def query_pyramid(pyramid, low=None, high=None, max_points=4000):
+    #------------------------------------------------------------------------------------
+    # Function: query_pyramid
+    # Purpose:  Reads the records of a curve with x between low and high at screen resolution from its min/max pyramid
+    #           If the range contains up to max_points records, all of them are returned (the raw resolution), otherwise the finest level
+    #           with at most max_points/2 buckets in the range is used and the minimum and maximum of each bucket are returned
+    #           Only the records of the range are read, the cost does not depend on the length of the curve
+    # Input:    pyramid          ... the output of build_minmax_pyramid
+    #           low, high        ... the range of x (None for the start/end of the curve)
+    #           max_points       ... the maximum number of records to return
+    # Output:   index            ... a sorted vector of the positions of the records to plot
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    x = pyramid['x']
+    first = 0 if low is None else int(np.searchsorted(x, low, side='left'))
+    last = len(x) if high is None else int(np.searchsorted(x, high, side='right'))
+    if last - first <= max_points:
+        return np.arange(first, last)
+    for size, minima, maxima in pyramid['levels']:
+        if (last - 1)//size - first//size + 1 <= max_points//2:
+            break
+
+    # The buckets inside the range, and the extremes of the parts of the range in the buckets at its ends
+    inner = slice(-(-first//size), last//size)
+    index = [[first, last - 1], minima[inner], maxima[inner]]
+    if first % size != 0:
+        index.append(_pyramid_extremes(pyramid, first, min(-(-first//size)*size, last)))
+    if (last % size != 0) and (last//size*size > first):
+        index.append(_pyramid_extremes(pyramid, last//size*size, last))
+    return np.unique(np.concatenate(index))
+
+def _pyramid_extremes(pyramid, first, last):
+    #------------------------------------------------------------------------------------
+    # Function: _pyramid_extremes
+    # Purpose:  Finds the positions of the minimum and the maximum of the records [first, last), from the largest aligned buckets of the pyramid
+    #           that cover the range
+    # Input:    pyramid         ... the output of build_minmax_pyramid
+    #           first, last     ... the first and the (excluded) last record of the range
+    # Output:   index           ... the positions of the minimum and the maximum (only the first record if all the values are NaN)
+    # External packages:
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    levels = [(1, None, None)] + pyramid['levels']
+    candidates = []
+    while first < last:
+        k = 0
+        while (k + 1 < len(levels)) and (first % levels[k+1][0] == 0) and (first + levels[k+1][0] <= last):
+            k += 1
+        size, minima, maxima = levels[k]
+        candidates += [first] if k == 0 else [minima[first//size], maxima[first//size]]
+        first += size
+    candidates = np.asarray(candidates)
+    values = pyramid['y'][candidates]
+    if np.isnan(values).all():
+        return candidates[:1]
+    return candidates[[np.nanargmin(values), np.nanargmax(values)]]
+
+##################################################################################################################################################################################################
+###########################################################               Function 50                #############################################################################################
+##################################################################################################################################################################################################
+
+def column_summary(dataframe, time_col='TotalSeconds'):
+    #------------------------------------------------------------------------------------
+    # Function: column_summary
+    # Purpose:  Summarizes every column of an experiment: the number of valid and missing values, the minimum and maximum value
+    #           and the statistics of the sampling interval of the column, i.e. the time between its consecutive valid values
+    #           (channels that are logged at a lower rate than the others, or that drop out, have larger intervals)
+    # Input:    dataframe        ... the dataframe of the experiment
+    #           time_col         ... the column with the elapsed time in seconds (see time_calculations)
+    # Output:   summary          ... a dataframe with one row per column of the experiment and the columns Column, Count, NaN count, Minimum, Maximum,
+    #                                Minimum interval [s], Median interval [s], Maximum interval [s]
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    time = dataframe[time_col].to_numpy(dtype='float64') if time_col in dataframe.columns else None
+    rows = []
+    for column in dataframe.columns:
+        values = dataframe[column]
+        valid = values.notna().to_numpy()
+        count = int(valid.sum())
+        row = {'Column': column,
+               'Count': count,
+               'NaN count': len(values) - count,
+               'Minimum': values.min() if count > 0 else None,
+               'Maximum': values.max() if count > 0 else None,
+               'Minimum interval [s]': np.nan,
+               'Median interval [s]': np.nan,
+               'Maximum interval [s]': np.nan}
+        if (time is not None) and (count > 1):
+            intervals = np.diff(time[valid])
+            intervals = intervals[~np.isnan(intervals)]
+            if len(intervals) > 0:
+                row['Minimum interval [s]'] = intervals.min()
+                row['Median interval [s]'] = np.median(intervals)
+                row['Maximum interval [s]'] = intervals.max()
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+##################################################################################################################################################################################################
+###########################################################               Function 51                #############################################################################################
+##################################################################################################################################################################################################
+
+def stitch_live_segments(frames, channels, state=None, time_col='DateTime'):
+    #------------------------------------------------------------------------------------
+    # Function: stitch_live_segments
+    # Purpose:  Stitches the segments of an experiment in progress (see Function 33) incrementally, for the segments that are followed with follow_csv
+    #           The state returned by one call remembers how many rows of every segment were already stitched, and the shift of the clock
+    #           of every segment, so that the next call appends only the new rows of the segments, in the dtypes of the stitched arrays
+    #           If a segment was truncated, or a segment other than the last one that has rows grew, everything is stitched again from the start
+    # Input:    frames          ... a list of the compact dataframes of the segments (see follow_csv), in their order, with 'DateTime', 'TotalSeconds' and the channels
+    #           channels        ... the names of the channels, e.g. ('u', 'Force', 'Temperature')
+    #           state           ... the state returned by the previous call for the same segments, or None for the first call
+    #           time_col        ... the name of the time column
+    # Output:   dataframe       ... the stitched compact pandas dataframe, whose columns are read-only views of the arrays of the state,
+    #                               with the number of segments, of dropped rows and the memory footprint in bytes in dataframe.attrs['segments'],
+    #                               dataframe.attrs['overlap_rows'] and dataframe.attrs['memory_bytes']
+    #           state           ... the state to pass to the next call
+    # External packages:
+    #           |_____________  pandas
+    #           |_____________  numpy
+    #------------------------------------------------------------------------------------
+
+    # --- Start function ---
+    lengths = [len(frame) for frame in frames]
+    if state is not None:
+        active = max([k for k, consumed in enumerate(state['consumed']) if consumed > 0], default=0)
+        if (state['segments'] != len(frames)) or any(length < consumed for length, consumed in zip(lengths, state['consumed'])) \
+                or any(length > consumed for length, consumed in zip(lengths[:active], state['consumed'][:active])):
+            state = None
+    if state is None:
+        state = {'segments': len(frames), 'consumed': [0]*len(frames), 'shift': [None]*len(frames), 'bound': [None]*len(frames),
+                 'rows': 0, 't0': None, 'last': None, 'previous': None, 'previous_segment': None, 'overlap': 0,
+                 'times': np.empty(0, dtype='datetime64[ns]'), 'seconds': np.empty(0, dtype='float64'),
+                 'values': {channel: np.empty(0, dtype=frames[0][channel].dtype) for channel in channels}}
+
+    for k, frame in enumerate(frames):
+        consumed = state['consumed'][k]
+        if lengths[k] == consumed:
+            continue
+        times = frame[time_col].to_numpy(dtype='datetime64[ns]')[consumed:]
+        valid = times[~np.isnat(times)]
+
+        # The shift of the clock of the segment is decided with its first valid timestamp, as in stitch_segments
+        if (state['shift'][k] is None) and (len(valid) > 0):
+            state['shift'][k] = np.timedelta64(0, 'ns')
+            if state['last'] is not None:
+                if valid[0] <= state['previous']:                                           # Restarted clock
+                    before = frames[state['previous_segment']][time_col].to_numpy(dtype='datetime64[ns]')
+                    before = before[~np.isnat(before)]
+                    step = np.median(np.diff(before)) if len(before) > 1 else np.timedelta64(0, 'ns')
+                    state['shift'][k] = state['last'] - valid[0] + step
+                else:
+                    state['bound'][k] = state['last']
+            state['previous'] = valid[0] + state['shift'][k]
+            state['previous_segment'] = k
+        if state['shift'][k] is not None:
+            times = times + state['shift'][k]
+
+        start = 0
+        if state['bound'][k] is not None:                                                   # The rows that overlap the previous segments are dropped
+            later = times > state['bound'][k]
+            start = int(np.argmax(later)) if later.any() else len(times)
+            if later.any():
+                state['bound'][k] = None
+        state['overlap'] += start
+        state['consumed'][k] = lengths[k]
+        times = times[start:]
+        if len(times) == 0:
+            continue
+
+        rows, n = state['rows'], len(times)
+        state['times'] = _grow(state['times'], rows + n)
+        state['seconds'] = _grow(state['seconds'], rows + n)
+        state['times'][rows:rows+n] = times
+        for channel in channels:
+            values = frame[channel].to_numpy()[consumed + start:]
+            array = state['values'][channel]
+            if np.result_type(array.dtype, values.dtype) != array.dtype:                   # A segment with a finer resolution
+                array = array.astype(np.result_type(array.dtype, values.dtype))
+            array = _grow(array, rows + n)
+            array[rows:rows+n] = values
+            state['values'][channel] = array
+        valid = times[~np.isnat(times)]
+        if len(valid) > 0:
+            if state['t0'] is None:
+                state['t0'] = valid[0]
+            state['last'] = max(state['last'], valid.max()) if state['last'] is not None else valid.max()
+        state['seconds'][rows:rows+n] = _elapsed_seconds(times, state['t0']) if state['t0'] is not None else np.nan
+        state['rows'] = rows + n
+
+    rows = state['rows']
+    arrays = {time_col: state['times'][:rows], 'TotalSeconds': state['seconds'][:rows]}
+    arrays.update({channel: state['values'][channel][:rows] for channel in channels})
+    for array in arrays.values():
+        array.flags.writeable = False                                                        # The arrays belong to the state
+    dataframe = pd.DataFrame(arrays, copy=False)
+    dataframe.attrs['coerced_timestamps'] = sum(frame.attrs.get('coerced_timestamps', 0) for frame in frames)
+    dataframe.attrs['segments'] = len(frames)
+    dataframe.attrs['overlap_rows'] = state['overlap']
+    dataframe.attrs['memory_bytes'] = int(sum(array.nbytes for array in arrays.values()))
+    return dataframe, state
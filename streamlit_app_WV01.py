@@ -12,6 +12,17 @@ from plotly.subplots import make_subplots
 import warnings
 warnings.filterwarnings("ignore")
 
+# The loader threads are attached to the script run context of the session, so that the cached loaders and the session state work in them.
+# These functions are not part of the public API of streamlit (they are found in streamlit.runtime.scriptrunner up to at least 1.32.2, the pinned version);
+# if they move, the threads run without the context (streamlit then only warns that the context is missing)
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    def add_script_run_ctx(thread=None, ctx=None):
+        return thread
+    def get_script_run_ctx():
+        return None
+
 from Tools.SMPA_tools_WV01 import *
 
 st.set_page_config(
@@ -28,6 +39,221 @@ def local_css(file_name):
 
 local_css("style.css")
 
+# Keep the parsed experiments in memory across reruns, so that moving a widget does not re-read the files from disk.
+# The file signature and the column mapping are part of the cache key, hence the cache is invalidated as soon as
+# a file changes on disk or the column names are revised.
+# On a cold start the normalized data are read from a columnar sidecar of the file, if a valid one exists,
+# otherwise the csv is parsed and the sidecar is written for the next time.
+# In streaming mode only the mapped columns are read, chunk by chunk, to keep the memory bounded for very large files
+# The time format of every rig (folder) is sniffed once and remembered for its next files, in the session (it is passed to the loader threads)
+# Files of a known DAQ format (e.g. Campbell Log_Data, Old DAQ) are recognized from their header and read by the reader of their format,
+# if the reader returns all the channels the analysis needs; the column names given in the data entry are then not used for them
+# Only the compact representation of every experiment is kept (time and analysis channels, float32 where the precision allows it)
+EXPERIMENT_CHANNELS = {"Small punch creep": ('u', 'Force', 'Temperature'), "Uniaxial creep": ('lvdt1', 'lvdt2')}
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_experiment(row_path, signature, type_of_exp, columns, streaming=False, _time_parsers=None):
+    df = read_sidecar(row_path, signature, (type_of_exp, columns, streaming))
+    if df is None:
+        source = (os.path.dirname(row_path), columns[0])
+        data_format = detect_format(row_path)
+        if (data_format != None) and (set(EXPERIMENT_CHANNELS[type_of_exp]) <= set(FORMAT_READERS[data_format]['channels'])):
+            df = read_format(row_path, data_format, source=(os.path.dirname(row_path), data_format), time_parsers=_time_parsers)
+        elif streaming == True:
+            df = read_csv_columns(row_path, columns[0], columns[1:], source=source, time_parsers=_time_parsers)
+        else:
+            df = pd.read_csv(row_path)
+        if 'format' not in df.attrs:
+            if type_of_exp == "Small punch creep":
+                df = df_spc_for_app(df, *columns, source=source, time_parsers=_time_parsers)
+            else:
+                df = df_uc_for_app(df, *columns, source=source, time_parsers=_time_parsers)
+        df = compact_experiment(df, EXPERIMENT_CHANNELS[type_of_exp])
+        write_sidecar(df, row_path, signature, (type_of_exp, columns, streaming))
+    return df
+
+# In live mode the files of experiments still in progress are followed: only the lines appended since the previous rerun are parsed.
+# The state of every file (byte offset, rows and arrays read so far) is kept in the session, in the compact representation of the experiment,
+# whose dtypes are decided once per file
+def follow_experiment(row_path, type_of_exp, columns, live_states, time_parsers=None):
+    if type_of_exp == "Small punch creep":
+        names = ['DateTime', 'u', 'Force', 'Temperature']
+    else:
+        names = ['DateTime', 'lvdt1', 'lvdt2']
+    df, live_states[(row_path, columns)] = follow_csv(row_path, columns, names, live_states.get((row_path, columns)), source=(os.path.dirname(row_path), columns[0]), compact=True, time_parsers=time_parsers)
+    return df
+
+# Long experiments are split into several log files: they are entered in one row of the path table, separated by ';', and they are
+# stitched into one experiment with continuous elapsed time. Every segment is read (and cached) on its own
+def segment_paths(cell):
+    return [path.strip().replace('\\', '/') for path in cell.split(';') if path.strip() != ""] or [""]      # An empty cell is an (invalid) empty path
+
+def load_segments(row_paths, signatures, type_of_exp, columns, streaming=False, time_parsers=None):
+    frames = [load_experiment(row_path, signature, type_of_exp, columns, streaming, time_parsers) for row_path, signature in zip(row_paths, signatures)]
+    if len(frames) == 1:
+        return frames[0]
+    return compact_experiment(stitch_segments(frames), EXPERIMENT_CHANNELS[type_of_exp])
+
+# In live mode the new rows of the segments are appended to the stitched experiment, kept in the session (see stitch_live_segments)
+def follow_segments(row_paths, type_of_exp, columns, live_states, time_parsers=None):
+    frames = [follow_experiment(row_path, type_of_exp, columns, live_states, time_parsers) for row_path in row_paths]
+    if len(frames) == 1:
+        return frames[0]
+    key = (tuple(row_paths), columns)
+    df, live_states[key] = stitch_live_segments(frames, EXPERIMENT_CHANNELS[type_of_exp], live_states.get(key))
+    return df
+
+# Bounds of the part of the rate curve where the minimum rate is located, found automatically (see find_minimum_rate_window)
+# instead of the slider. If no part of the curve presents a clear minimum, the whole curve is used
+def automatic_bounds(container, rates, times):
+    result = find_minimum_rate_window(rates, times)
+    if result is None:
+        container.markdown(":orange[**Note:**] No part of the curve presents a clear minimum, the whole curve is used.")
+        return (times[0], times[len(times)-1])
+    container.markdown("Automatically selected part of the curve: " + f"{result['low']:.1f} - {result['high']:.1f} h" + " (adjusted R² of the fit: " + f"{result['score']:.3f})")
+    return (result['low'], result['high'])
+
+# Bounds of the valid part (after the load application, before the rupture) suggested for all the loaded experiments at once (see detect_trim_bounds).
+# The suggestion of the experiment under analysis is applied to the inputs of the trimming with a button
+def trim_suggestions(dfs, variables):
+    return {name: detect_trim_bounds(dataframe, variables[name]) for name, dataframe in dfs.items()}
+
+def apply_trim_bounds(stop_start, stop_end):
+    st.session_state.stop_start = stop_start
+    st.session_state.stop_end = stop_end
+
+# The traces of the full experiments are downsampled before the figures are built (see downsample_indices), to at most PLOT_POINTS points per trace
+# that keep the shape and the extremes of the curve. All the computations use the raw data
+PLOT_POINTS = 4000
+
+def thin_trace(x, y):
+    x = np.asarray(x)
+    y = np.asarray(y)
+    index = downsample_indices(x, y, PLOT_POINTS)
+    return x[index], y[index]
+
+# A cheap identifier of the data of an experiment, that changes when the experiment is reloaded with other data (e.g. new records in live mode)
+def data_version(dataframe):
+    if len(dataframe) == 0:
+        return (0,)
+    return (len(dataframe), float(dataframe['TotalSeconds'].iloc[0]), float(dataframe['TotalSeconds'].iloc[-1]))
+
+# The min/max pyramid of a curve is built once per data version of the experiment and kept in the session (see build_minmax_pyramid),
+# so that a zoomed range of the curve is read at raw resolution, or at screen resolution if it has more than PLOT_POINTS records (see query_pyramid).
+# Streamlit does not pass the zoom/pan events of plotly charts to the script, hence the range is selected with a slider above the graph
+def zoomed_trace(name, dataframe, x_col, y_col, zoom):
+    pyramids = st.session_state.setdefault('pyramids', {})
+    key = (name, x_col, y_col)
+    version = data_version(dataframe)
+    if (key not in pyramids) or (pyramids[key][0] != version):
+        pyramids[key] = (version, build_minmax_pyramid(dataframe[x_col], dataframe[y_col]))
+    pyramid = pyramids[key][1]
+    index = query_pyramid(pyramid, zoom[0], zoom[1], PLOT_POINTS)
+    return pyramid['x'][index], pyramid['y'][index]
+
+# Graphs with more than WEBGL_POINTS points in total are rendered with WebGL (go.Scattergl) instead of SVG, which the browsers cannot draw fast
+# beyond about 100k points, unless another rendering is selected in the Data entry. The traces keep their style, axes (also the secondary ones) and legend
+WEBGL_POINTS = 100000
+
+def rendered(figure):
+    mode = st.session_state.get("render_mode", "Automatic")
+    points = sum(len(trace.x) for trace in figure.data if (trace.type == 'scatter') and (trace.x is not None))
+    if (mode == "SVG") or ((mode == "Automatic") and (points <= WEBGL_POINTS)):
+        return figure
+    content = figure.to_dict()
+    for trace in content['data']:
+        if trace.get('type') == 'scatter':
+            trace['type'] = 'scattergl'
+    return go.Figure(content)
+
+# The figures of the Data entry pages are built only when their page is shown and kept in the session, keyed by the data versions of the plotted
+# experiments, the plotted columns and the rendering, so that switching pages or moving unrelated widgets reuses them instead of rebuilding them
+FIGURE_CACHE_SIZE = 16
+
+def series_key(series, dfs):
+    return tuple((name, data_version(dfs[name]), x_col, x_scale, y_col) for name, x_col, x_scale, y_col in series)
+
+def cached_figure(key, build):
+    figures = st.session_state.setdefault("figures", {})
+    key = key + (st.session_state.get("render_mode", "Automatic"), PLOT_POINTS)
+    if key not in figures:
+        if len(figures) >= FIGURE_CACHE_SIZE:
+            figures.pop(next(iter(figures)))                                       # The oldest figure is dropped
+        figures[key] = rendered(build())
+    return figures[key]
+
+def overview_figure(series, dfs, title, xaxis_title, yaxis_title, subplots=False):
+    figure = make_subplots() if subplots == True else go.Figure()
+    for name, x_col, x_scale, y_col in series:
+        x_plot, y_plot = thin_trace(dfs[name][x_col]/x_scale, dfs[name][y_col])
+        figure.add_trace(go.Scatter(
+                            x=x_plot,
+                            y=y_plot,
+                            mode='lines+markers',
+                            name=name,
+                        ))
+    figure.update_layout(title=dict(text=title),
+                         xaxis_title=xaxis_title,
+                         yaxis_title=yaxis_title,
+                         showlegend=True)
+    return figure
+
+# The outputs computed for every loaded experiment (e.g. the rate curves and creep stages of the batch tables) are kept in the session, keyed by the
+# data version of the experiment and the settings they were computed with, so that they are computed again only when one of them changes
+def cached_output(kind, name, dataframe, settings, compute):
+    outputs = st.session_state.setdefault("experiment_outputs", {})
+    key = (kind, name)
+    version = (data_version(dataframe),) + tuple(settings)
+    if (key not in outputs) or (outputs[key][0] != version):
+        outputs[key] = (version, compute())
+    return outputs[key][1]
+
+# The experiment under analysis, with its minutes and hours (see elapsed_units) and without the records where any of the channels is NaN (a mask
+# of the valid records selects them in one step), is derived once per data version of the experiment and kept in the session, instead of on every rerun
+def analysed_experiment(name, dataframe, channels=()):
+    def derive():
+        valid = dataframe[list(channels)].notna().to_numpy().all(axis=1)
+        return elapsed_units(dataframe if valid.all() else dataframe[valid].reset_index(drop=True))
+    return cached_output("analysed experiment", name, dataframe, channels, derive)
+
+# The Preview data pages send to the browser only the first and last PREVIEW_ROWS records of every experiment and, on demand, one page of
+# PAGE_ROWS records of the selected experiment, instead of whole experiments. The column summaries are computed once per data version of
+# the experiment and kept in the session (see column_summary)
+PREVIEW_ROWS = 5
+PAGE_ROWS = 100
+
+def cached_summary(name, dataframe):
+    summaries = st.session_state.setdefault("summaries", {})
+    version = data_version(dataframe)
+    if (name not in summaries) or (summaries[name][0] != version):
+        summaries[name] = (version, column_summary(dataframe))
+    return summaries[name][1]
+
+def preview_data(dfs, key):
+    for name, dataframe in dfs.items():
+        st.write("#### Experiment: " + name)
+        st.write(f"{len(dataframe)} records, the first and last {PREVIEW_ROWS} are shown")
+        summary = cached_summary(name, dataframe)
+        st.dataframe(summary.astype({'Minimum': str, 'Maximum': str}), hide_index=True)   # Text, since the minima/maxima of the date and of the numbers share a column
+        if len(dataframe) > 2*PREVIEW_ROWS:
+            st.dataframe(pd.concat([dataframe.head(PREVIEW_ROWS), dataframe.tail(PREVIEW_ROWS)]))
+        else:
+            st.dataframe(dataframe)
+
+    if st.checkbox("Browse the records of an experiment", key=key + "_browse"):
+        name = st.selectbox("Experiment", list(dfs.keys()), key=key + "_browse_exp")
+        pages = max(1, -(-len(dfs[name])//PAGE_ROWS))
+        page = st.number_input(f"Page (1 to {pages}, {PAGE_ROWS} records each)", min_value=1, max_value=pages, value=1, step=1, key=key + "_browse_page")
+        first = (int(page) - 1)*PAGE_ROWS
+        st.dataframe(dfs[name].iloc[first:first + PAGE_ROWS])
+
+# Returns the output of a job of load_in_parallel or raises its error, so that it is reported where the job is consumed
+def job_output(result):
+    output, error, seconds = result
+    if error != None:
+        raise error
+    return output
+
 st.markdown("""
         <style>
         .small-font {
@@ -75,7 +301,7 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
     
     if (st.session_state.type_of_exp == "Uniaxial creep"):
         st.markdown('<p class="small-font">In the table below enter:</p>', unsafe_allow_html=True)
-        st.markdown('<p class="small-font">a. The full path of as many experiments as you want to visualize/analyze in the following sections.</p>', unsafe_allow_html=True)
+        st.markdown('<p class="small-font">a. The full path of as many experiments as you want to visualize/analyze in the following sections. If an experiment was logged in several files, enter their paths in the same row, separated by ";".</p>', unsafe_allow_html=True)
         st.markdown('<p class="small-font">b. The gauge length of each specimen in mm.</p>', unsafe_allow_html=True)
         st.markdown('<p class="small-font">c. Your preferred LVDT for plotting in each experiment from the dropdown options.</p>', unsafe_allow_html=True)
 
@@ -87,7 +313,7 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
         }, hide_index=True, num_rows= 'dynamic', use_container_width=True, key="file_upload_df")
         
     else:
-        st.markdown('<p class="small-font">In the table below enter the full path of as many experiments as you want to visualize/analyze in the following sections.</p>', unsafe_allow_html=True)
+        st.markdown('<p class="small-font">In the table below enter the full path of as many experiments as you want to visualize/analyze in the following sections. If an experiment was logged in several files, enter their paths in the same row, separated by ";".</p>', unsafe_allow_html=True)
 
         table_file_input = pd.DataFrame(columns=['Path'])
         edit_table_file_input = st.data_editor(table_file_input, hide_index=True, num_rows= 'dynamic', use_container_width=True, key="file_upload_df")
@@ -104,9 +330,18 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
         force_col = col3.text_input("Type below the name of the column that represents **Force** in your data:", placeholder="e.g. Force", key="select_force_col")
         temp_col = col4.text_input("Type below the name of the column that represents **Temperature** in your data:", placeholder="e.g. Temperature", key="select_temp_col")    
 
+    col1, col2, col3 = st.columns(3)
+    parallel_loading = col1.checkbox("Load the experiments in parallel", value=True, key="parallel_loading")
+    streaming_loading = col2.checkbox("Low-memory reading (only the columns above are kept, for very large files)", value=False, key="streaming_loading")
+    live_loading = col3.checkbox("Live mode (for experiments in progress, only the newly logged data are read on every refresh)", value=False, key="live_loading")
+    if live_loading == True:
+        col3.button("Refresh the live data", key="refresh_live")
+    st.radio("Rendering of the graphs (automatically WebGL for graphs with more than " + f"{WEBGL_POINTS:,}" + " points, SVG otherwise)", ["Automatic", "SVG", "WebGL"], horizontal=True, key="render_mode")
+
     all_dfs = {}
     all_gauges = {}
     all_lvdts_for_plot = {}
+    # The series of the plots of the Data entry pages (experiment, x column, x scale, y column), their traces are built only when a page is shown
     trace_spc_1 = []
     trace_spc_2 = []
     trace_uc = []
@@ -132,20 +367,52 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
         #         force_col = col3.text_input("Type the name of the column that represents **force** in your data", key="select_force_col")
         #         temp_col = col4.text_input("Type the name of the column that represents **temperature** in your data", key="select_temp_col")       
 
+        # Read all the valid paths of the table at once (concurrently, if selected). The results are consumed below in the order of the table,
+        # so that the errors are reported for each row as before
+        if st.session_state.type_of_exp == "Small punch creep":
+            exp_columns = (st.session_state.select_spc_time_col, st.session_state.select_u_col, st.session_state.select_force_col, st.session_state.select_temp_col)
+        else:
+            exp_columns = (st.session_state.select_uc_time_col, st.session_state.select_lvdt1_col, st.session_state.select_lvdt2_col)
+
+        # The signatures of the files are taken once per rerun, for the cache keys of the loaders and for the path checks below
+        load_rows = []
+        load_jobs = []
+        row_signatures = {}
+        live_states = st.session_state.setdefault("live_states", {})
+        time_parsers = st.session_state.setdefault("time_parsers", {})
+        for i in range(0, len(edit_table_file_input)):
+            if edit_table_file_input.loc[i, "Path"] != None:
+                row_paths = segment_paths(edit_table_file_input.loc[i, "Path"])
+                try:
+                    row_signatures[i] = tuple(file_signature(row_path) for row_path in row_paths)
+                except FileNotFoundError:
+                    continue                # It is reported below
+                if ("" not in exp_columns) & (len(set(exp_columns)) == len(exp_columns)):
+                    if live_loading == True:
+                        load_jobs.append((row_paths, st.session_state.type_of_exp, exp_columns, live_states, time_parsers))
+                    else:
+                        load_jobs.append((row_paths, row_signatures[i], st.session_state.type_of_exp, exp_columns, streaming_loading, time_parsers))
+                    load_rows.append(i)
+
+        script_ctx = get_script_run_ctx()
+        load_start = time.perf_counter()
+        load_function = follow_segments if live_loading == True else load_segments
+        load_results = dict(zip(load_rows, load_in_parallel(load_function, load_jobs, parallel=parallel_loading, initializer=lambda: add_script_run_ctx(ctx=script_ctx))))
+        load_wall_time = time.perf_counter() - load_start
+        load_times = {}
+
         for i in range(0, len(edit_table_file_input)):
             if edit_table_file_input.loc[i, "Path"] != None:
                 st.session_state.df_added = "not_valid"
-                row_path = edit_table_file_input.loc[i, "Path"].strip()#.encode('ascii', errors='replace').rstrip()
-                row_path = row_path.replace('\\', '/')
+                row_paths = segment_paths(edit_table_file_input.loc[i, "Path"])#.encode('ascii', errors='replace').rstrip()
                 #st.write(st.session_state) 
-                try: 
-                    df = pd.read_csv(row_path)
+                if i in row_signatures:
                     st.session_state.df_added = "valid"   
-                except FileNotFoundError:
+                else:
                     catch_path_error = True
                     st.markdown(":red[**Attention!!**] You have provided an invalid path. Make sure to add the full path to your csv files.")
                 
-                file_with_ext = row_path.split('/')[-1]
+                file_with_ext = row_paths[0].split('/')[-1]
                 folder_name = file_with_ext.removesuffix('.csv')
                 #st.write(type(file_with_ext))
 
@@ -165,24 +432,16 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
                         if (st.session_state.select_spc_time_col != "") & (st.session_state.select_u_col != "") & (st.session_state.select_force_col != "") & (st.session_state.select_temp_col != ""):
                             if (st.session_state.select_spc_time_col != st.session_state.select_u_col) & (st.session_state.select_spc_time_col != st.session_state.select_force_col) & (st.session_state.select_spc_time_col != st.session_state.select_temp_col) & (st.session_state.select_u_col != st.session_state.select_force_col) & (st.session_state.select_u_col != st.session_state.select_temp_col) & (st.session_state.select_force_col != st.session_state.select_temp_col):
                                 try:
-                                    df_new = df_spc_for_app(df, st.session_state.select_spc_time_col, st.session_state.select_u_col, st.session_state.select_force_col, st.session_state.select_temp_col)
+                                    df_new = job_output(load_results[i])
+                                    load_times[folder_name + (" (" + df_new.attrs['format'] + ")" if 'format' in df_new.attrs else "")] = load_results[i][2]
+                                    if df_new.attrs.get('coerced_timestamps', 0) > 0:
+                                        st.markdown(":orange[**Note:**] " + str(df_new.attrs['coerced_timestamps']) + " timestamp(s) of " + folder_name + " could not be read and were left out of the time calculations.")
+                                    if df_new.attrs.get('overlap_rows', 0) > 0:
+                                        st.markdown(":orange[**Note:**] " + str(df_new.attrs['overlap_rows']) + " overlapping or duplicated row(s) at the joins of the " + str(df_new.attrs['segments']) + " segments of " + folder_name + " were dropped.")
                                     all_dfs[folder_name] = df_new
 
-                                    trace_cd = go.Scatter(
-                                        x=df_new["TotalHours"],
-                                        y=df_new["u"],
-                                        mode='lines+markers',
-                                        name=folder_name,
-                                    )
-                                    trace_spc_1.append(trace_cd)
-
-                                    trace_fd = go.Scatter(
-                                        x=df_new["u"],
-                                        y=df_new["Force"],
-                                        mode='lines+markers',
-                                        name=folder_name,
-                                    )
-                                    trace_spc_2.append(trace_fd)
+                                    trace_spc_1.append((folder_name, "TotalSeconds", 3600, "u"))
+                                    trace_spc_2.append((folder_name, "u", 1, "Force"))
                                 except KeyError:
                                     catch_col_spel_error = True
                                     st.markdown(":red[**Attention!!**] Check again the spelling of the column names.")
@@ -207,7 +466,12 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
                         if (st.session_state.select_uc_time_col != "") & (st.session_state.select_lvdt1_col != "") & (st.session_state.select_lvdt2_col != ""):
                             if (st.session_state.select_uc_time_col != st.session_state.select_lvdt1_col) & (st.session_state.select_uc_time_col != st.session_state.select_lvdt2_col) & (st.session_state.select_lvdt1_col != st.session_state.select_lvdt2_col):
                                 try:
-                                    df_new = df_uc_for_app(df, st.session_state.select_uc_time_col, st.session_state.select_lvdt1_col, st.session_state.select_lvdt2_col)
+                                    df_new = job_output(load_results[i])
+                                    load_times[folder_name + (" (" + df_new.attrs['format'] + ")" if 'format' in df_new.attrs else "")] = load_results[i][2]
+                                    if df_new.attrs.get('coerced_timestamps', 0) > 0:
+                                        st.markdown(":orange[**Note:**] " + str(df_new.attrs['coerced_timestamps']) + " timestamp(s) of " + folder_name + " could not be read and were left out of the time calculations.")
+                                    if df_new.attrs.get('overlap_rows', 0) > 0:
+                                        st.markdown(":orange[**Note:**] " + str(df_new.attrs['overlap_rows']) + " overlapping or duplicated row(s) at the joins of the " + str(df_new.attrs['segments']) + " segments of " + folder_name + " were dropped.")
 
                                     row_gauge = edit_table_file_input.loc[i, "Gauge length [mm]"]
                                     selected_lvdt = edit_table_file_input.loc[i, "Preferred LVDT for plotting"]
@@ -222,29 +486,11 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
                                             all_lvdts_for_plot[folder_name] = selected_lvdt
 
                                             if selected_lvdt == "LVDT 1":
-                                                trace_s = go.Scatter(
-                                                    x=df_new2["TotalHours"],
-                                                    y=df_new2["strain1"],
-                                                    mode='lines+markers',
-                                                    name=folder_name,
-                                                )
-                                                trace_uc.append(trace_s)
+                                                trace_uc.append((folder_name, "TotalSeconds", 3600, "strain1"))
                                             elif selected_lvdt == "LVDT 2":
-                                                trace_s = go.Scatter(
-                                                    x=df_new2["TotalHours"],
-                                                    y=df_new2["strain2"],
-                                                    mode='lines+markers',
-                                                    name=folder_name,
-                                                )
-                                                trace_uc.append(trace_s)
+                                                trace_uc.append((folder_name, "TotalSeconds", 3600, "strain2"))
                                             else:
-                                                trace_s = go.Scatter(
-                                                    x=df_new2["TotalHours"],
-                                                    y=df_new2["strain_avg"],
-                                                    mode='lines+markers',
-                                                    name=folder_name,
-                                                )
-                                                trace_uc.append(trace_s)
+                                                trace_uc.append((folder_name, "TotalSeconds", 3600, "strain_avg"))
                                         else:
                                             catch_lvdt_for_plot_empty_error = True
                                             st.markdown(":red[**Attention!!**] You have not selected your preferred LVDT for plotting. Please revise your entries above in order to continue.")
@@ -261,6 +507,10 @@ with st.expander(" :arrow_heading_up: Data entry", expanded=True):
                             catch_col_empty_error = True
                             st.markdown(":red[**Attention!!**] One or more of the requested column names have been left empty. Revise your entries above in order to continue.")
 
+        if len(load_times) > 0:
+            st.caption("Loaded " + str(len(load_times)) + " experiment(s) in " + f"{load_wall_time:.2f} s" + " | " + ", ".join(f"{name}: {seconds:.2f} s" for name, seconds in load_times.items())
+                       + " | Memory: " + f"{sum(df.memory_usage(index=True).sum() for df in all_dfs.values())/2**20:.1f} MB")
+
 with st.expander(" :arrow_right: Visualization", expanded=False):
     st.markdown('''                
         :point_down: :blue[In this section you can visualize one or multiple experiments and compare them]
@@ -276,28 +526,16 @@ with st.expander(" :arrow_right: Visualization", expanded=False):
                     if (st.session_state.select_spc_time_col != st.session_state.select_u_col) & (st.session_state.select_spc_time_col != st.session_state.select_force_col) & (st.session_state.select_spc_time_col != st.session_state.select_temp_col) & (st.session_state.select_u_col != st.session_state.select_force_col) & (st.session_state.select_u_col != st.session_state.select_temp_col) & (st.session_state.select_force_col != st.session_state.select_temp_col):
                         if (edit_table_file_input.empty != True):
                             def page_df():
-                                for item in all_dfs.keys():
-                                    st.write("#### Experiment: " + item)
-                                    st.dataframe(all_dfs[item])
+                                preview_data(all_dfs, "preview_spc")
 
                             def page_creep_deflection_plot():
-                                fig_cd = go.Figure()#make_subplots()
-                                for tr in trace_spc_1:
-                                    fig_cd.add_trace(tr)
-                                    fig_cd.update_layout(title=dict(text="Creep deflection curve"),
-                                                        xaxis_title="Time [h]", 
-                                                        yaxis_title="Deflection [µm]",
-                                                        showlegend=True)
+                                fig_cd = cached_figure(("Creep deflection curve",) + series_key(trace_spc_1, all_dfs),
+                                                       lambda: overview_figure(trace_spc_1, all_dfs, "Creep deflection curve", "Time [h]", "Deflection [µm]"))
                                 st.plotly_chart(fig_cd, use_container_width=True)
                                 
                             def page_force_deflection_plot():
-                                fig_fd = go.Figure()#make_subplots()
-                                for tra in trace_spc_2:
-                                    fig_fd.add_trace(tra)
-                                    fig_fd.update_layout(title=dict(text="Force-deflection curve"),
-                                                        xaxis_title="Deflection [µm]", 
-                                                        yaxis_title="Force [N]",
-                                                        showlegend=True)
+                                fig_fd = cached_figure(("Force-deflection curve",) + series_key(trace_spc_2, all_dfs),
+                                                       lambda: overview_figure(trace_spc_2, all_dfs, "Force-deflection curve", "Deflection [µm]", "Force [N]"))
                                 st.plotly_chart(fig_fd, use_container_width=True)        
 
                             pages={
@@ -326,18 +564,11 @@ with st.expander(" :arrow_right: Visualization", expanded=False):
                     if (st.session_state.select_uc_time_col != st.session_state.select_lvdt1_col) & (st.session_state.select_uc_time_col != st.session_state.select_lvdt2_col) & (st.session_state.select_lvdt1_col != st.session_state.select_lvdt2_col):
                         if (edit_table_file_input.empty != True):
                             def page_df():
-                                for item in all_dfs.keys():
-                                    st.write("#### Experiment: " + item)
-                                    st.dataframe(all_dfs[item])
+                                preview_data(all_dfs, "preview_uc")
 
                             def page_creep_strain_plot():
-                                fig_strain = make_subplots()
-                                for tro in trace_uc:
-                                    fig_strain.add_trace(tro)
-                                    fig_strain.update_layout(title=dict(text="Creep strain curve"),
-                                                        xaxis_title="Time [h]", 
-                                                        yaxis_title="Strain [%]",
-                                                        showlegend=True)
+                                fig_strain = cached_figure(("Creep strain curve",) + series_key(trace_uc, all_dfs),
+                                                           lambda: overview_figure(trace_uc, all_dfs, "Creep strain curve", "Time [h]", "Strain [%]", subplots=True))
                                 st.plotly_chart(fig_strain, use_container_width=True)
 
                             pages={
@@ -405,7 +636,7 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                                 key='selected_exp'
                             )
                             #if selected_exp != None:
-                            df = all_dfs[selected_exp]
+                            df = analysed_experiment(selected_exp, all_dfs[selected_exp])       # The minutes and hours are derived for the experiment under analysis only
                             col1, col2 = st.columns(2)
                             force = col1.number_input("Type in the **Force** in N under which your experiment was performed", format="%0.1f")
                             temp = col2.number_input("Type in the **Temperature** in °C under which your experiment was performed", format="%0.1f")
@@ -440,9 +671,12 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                                 If this is the case, use the interactive tools of the graph on the right to zoom and hover over the datapoints and identify the point of the start of the experiment and the time to rupture.
                             ''')
                             fig_toclean = go.Figure()#make_subplots()
+                            duration = max(float(df.TotalHours.iloc[-1]), 0.01)
+                            zoom = col2.slider("Zoom into a time range [h] (all the records of the range are shown, up to the screen resolution)", 0.0, duration, (0.0, duration), key='zoom_' + selected_exp)
+                            x_plot, y_plot = zoomed_trace(selected_exp, df, 'TotalHours', 'u', zoom)
                             fig_toclean.add_trace(go.Scatter(
-                                                    x=df.TotalHours,
-                                                    y=df.u,
+                                                    x=x_plot,
+                                                    y=y_plot,
                                                     mode='lines+markers',
                                                     name="deflection uncleaned")
                                         )
@@ -451,39 +685,37 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                                                 xaxis_title="Time [h]", 
                                                 yaxis_title="Deflection [µm]",
                                                 showlegend=True)
-                            col2.plotly_chart(fig_toclean, use_container_width=True)
+                            col2.plotly_chart(rendered(fig_toclean), use_container_width=True)
+
+                            if col1.checkbox("Suggest the bounds of all the experiments automatically", key="suggest_bounds"):
+                                bounds = trim_suggestions(all_dfs, dict.fromkeys(all_dfs, 'u'))
+                                col1.dataframe(pd.DataFrame([[name, b['start_hours'], b['end_hours'], b['start_value'], b['end_value']] for name, b in bounds.items() if b is not None],
+                                                            columns=['Experiment', 'Start [h]', 'Rupture [h]', 'Initial deflection [µm]', 'Deflection at rupture [µm]']), hide_index=True)
+                                if bounds[selected_exp] is not None:
+                                    col1.button("Apply the suggested bounds of " + selected_exp, on_click=apply_trim_bounds,
+                                                args=(math.floor(bounds[selected_exp]['start_value']), math.ceil(bounds[selected_exp]['end_value'])))
 
                             stop_start = col1.number_input("Type the value of the identified (from the graph) initial deflection.", step=50, key='stop_start')
                             stop_end = col1.number_input("Type the value of the identified (from the graph) deflection at rupture.", step=50, key='stop_end')
                             #st.write(st.session_state)
 
+                            # The trimmed experiment is a slice of the experiment, the time and the deflection start from zero (see trim_experiment)
                             if (stop_start != 0): 
                                 if (stop_end > stop_start):
-                                    df_lim = df[(df.u >= stop_start) & (df.u <= stop_end)]
-                                    df_lim.reset_index(inplace=True)
-                                    #df_lim = df.drop(columns=['index'])
-                                    df_lim.u = df_lim.u - df_lim.u[0]
-
-                                    df_lim['TotalSeconds'] = df_lim['DateTime'].diff().dt.total_seconds().cumsum()       # Calculate the total amount of seconds since the start of the experimet
-                                    df_lim.loc[0, 'TotalSeconds'] = 0
-                                    df_lim['TotalSeconds'] = df_lim['TotalSeconds'].astype(int, errors='ignore')
-                                    df_lim['TotalMinutes'] = df_lim['TotalSeconds']/60
-                                    df_lim['TotalHours'] = df_lim['TotalSeconds']/3600
-
-                                    tR = df_lim.TotalSeconds[len(df_lim)-1]
+                                    df_lim = trim_experiment(df, 'u', stop_start, stop_end, zero=['u'])
                                 else:
                                     st.markdown("The deflection at rupture cannot precede the initial deflection. You have entered the values wrong.")
+                                    df_lim = df
                             else:
                                 if (stop_end != 0):
-                                    df_lim = df[:stop_end]
-                                    df_lim.reset_index(inplace=True)
-                                    df_lim = df.drop(columns=['index'])
-
-                                    tR = df_lim.TotalSeconds[len(df_lim)-1]
+                                    df_lim = trim_experiment(df, 'u', None, stop_end)
                                 else:
                                     st.markdown("**No cleaning was performed.** The algorithm will proceed with the input data as is.")
-                                    df_lim = df.copy()
-                                    tR = df_lim.TotalSeconds[len(df_lim)-1]
+                                    df_lim = df
+                            if len(df_lim) < 2:
+                                st.markdown(":red[**Attention!!**] There are no data between the entered deflections. The algorithm will proceed with the input data as is.")
+                                df_lim = df
+                            tR = trimmed_column(df_lim, 'TotalSeconds', -1)
 
                             t0 = 0
                             
@@ -501,13 +733,23 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                                         of all the data points that fall into each section.
                                         ''')  
                             col1.markdown(''' <span style="text-decoration:underline"> Hint: </span> The suggested number of sections is **between 100 and 400**.''', unsafe_allow_html=True)
+                            col1.markdown(''' 
+                                        Alternatively, the sliding window estimator calculates the deflection rate as the slope of a local fit 
+                                        in a window (as wide as a section) centred on every point, which gives a denser and less noisy curve.
+                                        ''')
 
+                            rate_estimator = col1.radio("Choose the rate estimator", ["Sections", "Sliding window"], horizontal=True, key="rate_estimator")
                             sections_num = col1.number_input("Type the number of sections", min_value=50, max_value=500, step=10, key="sections_to_split")
 
                             interval_points = (tR - t0)/int(sections_num)
                             col1.markdown("Each of the " + str(sections_num) + " sections contains " + str(math.floor(interval_points)) + " data points (corresponding to " + str(math.floor(interval_points)) + " seconds.)")
 
-                            dudt, t_points, u_points = calculate_rate_of_variable(df_lim, 'u', interval_points, t0, tR)
+                            if rate_estimator == "Sections":
+                                rate_method = col1.selectbox("Select the regression of each section (the robust ones limit the pull of spikes and glitches)", RATE_METHODS, key="rate_method")
+                                dudt, t_points, u_points = calculate_rate_of_variable(df_lim, 'u', interval_points, t0, tR, rate_method)
+                            else:
+                                fit_order = col1.select_slider("Select the order of the local fit (1: linear regression, 2-3: Savitzky-Golay)", [1, 2, 3], key="fit_order")
+                                dudt, t_points, u_points = calculate_local_rate(df_lim, 'u', interval_points, t0, tR, order=fit_order, points=4*int(sections_num))
 
                             fig1 = make_subplots(specs=[[{"secondary_y": True}]])
                             fig1.add_trace(go.Scatter(
@@ -537,7 +779,7 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                             fig1.update_yaxes(title_text="Deflection [µm]", secondary_y=False)
                             fig1.update_yaxes(title_text="Deflection rate [µm/h]", secondary_y=True)
 
-                            col2.plotly_chart(fig1, use_container_width=True)
+                            col2.plotly_chart(rendered(fig1), use_container_width=True)
 
                             st.markdown(''' **<p class="big-font"> :blue[STEP 3:] Smoothening of the deflection rate curve (optional) </p>** ''', unsafe_allow_html=True)
 
@@ -547,8 +789,9 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                                 col1, col2 = st.columns([1,2])
                                 col1.text("")
                                 col1.text("")
+                                smoothing_kernel = col1.selectbox("Select the smoothing kernel", SMOOTHING_KERNELS, key="smoothing_kernel")
                                 window_size = col1.select_slider("Select a window size", [x for x in range(7, 51)])
-                                moving_averages, tt, uu_list= smoothen_curve(dudt, t_points, u_points, window_size)
+                                moving_averages, tt, uu_list= smoothen_curve(dudt, t_points, u_points, window_size, smoothing_kernel)
 
                                 fig2 = go.Figure()
                                 fig2.add_trace(go.Scatter(
@@ -566,20 +809,8 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
 
                                 fig2.update_yaxes(title_text="Deflection rate [µm/h]")
 
-                                st.plotly_chart(fig2, use_container_width=True)
-
-                            def secondary_deflection(defl_rate, time, low, high):
-                                lower_limit = low
-                                upper_limit = high
-                                tt_middle = []
-                                middle_part = []
-                                for i in range(len(time)):
-                                    if (time[i]>=lower_limit) & (time[i]<=upper_limit):
-                                        tt_middle.append(time[i])
-                                        middle_part.append(defl_rate[i])
+                                st.plotly_chart(rendered(fig2), use_container_width=True)
 
-                                return middle_part, tt_middle
-                            
                             st.markdown(''' **<p class="big-font"> :blue[STEP 4:] Calculation of the minimum deflection rate </p>** ''', unsafe_allow_html=True)
 
                             col1, col2 = st.columns([1,2])
@@ -600,356 +831,180 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                                         In some cases, it has been noticed that the deflection rate curve presents two minima instead of one.  
                                         There is no clear answer to why this happens, but it could be an indication of cracking at some point during the experiment.  
                                         It is suggested that before making any conclusions, you first make sure that the temperature profile didn't deviate considerably from the target.   
-                                        By checking the box below, both minima will be identified by the algorithm.  
+                                        By checking the box below, all the minima (two or more) will be identified by the algorithm.  
                                         ''')
-                            double_min = col1.checkbox("Double minimum", key='double_min')
+                            double_min = col1.checkbox("Multiple minima", key='double_min')
+                            if double_min == True:
+                                minima_num = col1.number_input("Type the number of minima", min_value=2, max_value=5, value=2, step=1, key='minima_num')
+                            auto_min = col1.checkbox("Find the part(s) of the minimum(a) automatically", key='auto_min')
                             col1.markdown('''
                                         3. Move the sides of the slider(s) so that they match the bounds (in terms of time) of the previously isolated part(s) of the minimum(a).
                                         4. The graph depicts the identified minimum deflection rate(s).  
                                             ''')
-                            if sm == True:                    
-                                if double_min == True:
-                                    col2.text("")
-                                    col2.text("")
-                                    col2.markdown('''Select the bounds of those parts of the curve where there is a local minimum''')
-                                    sel_limits1 = col2.slider("First part", int(tt[0]+1), int(tt[len(tt)-1]+1), value=(int(tt[0]+1), int(tt[len(tt)-1]+1)))
-                                    sel_limits2 = col2.slider("Second part", int(tt[0]+1), int(tt[len(tt)-1]+1), value=(int(tt[0]+1), int(tt[len(tt)-1]+1)))
-
-                                    # Isolate the parts of the curve with a local minimum
-                                    middle_part1, tt_middle1 = secondary_deflection(moving_averages, tt, sel_limits1[0], sel_limits1[1])
-                                    middle_part2, tt_middle2 = secondary_deflection(moving_averages, tt, sel_limits2[0], sel_limits2[1])
-
-                                    # Calculate a fitted curve
-                                    polynomial1 = calc_polynomial(middle_part1, tt_middle1)
-                                    polynomial2 = calc_polynomial(middle_part2, tt_middle2)
-
-                                    # Find the local minimum
-                                    crit1 = polynomial1.deriv().r
-                                    r_crit1 = crit1[crit1.imag==0].real
-                                    test1 = polynomial1.deriv(2)(r_crit1)
-
-                                    crit2 = polynomial2.deriv().r
-                                    r_crit2 = crit2[crit2.imag==0].real
-                                    test2 = polynomial2.deriv(2)(r_crit2)
-
-                                    # Compute the local minima excluding range boundaries
-                                    x_min1 = r_crit1[test1>0]
-                                    y_min1 = polynomial1(x_min1)
-
-                                    x_min2 = r_crit2[test2>0]
-                                    y_min2 = polynomial2(x_min2)
-
-                                    fig3 = go.Figure()
-                                    fig3.add_trace(go.Scatter(
-                                                        x=tt,
-                                                        y=moving_averages,
-                                                        mode='lines+markers',
-                                                        name="deflection rate",
-                                                        showlegend=True)
-                                            )
-
-                                    fig3.add_trace(go.Scatter(
-                                                        x=x_min1,
-                                                        y=y_min1,
-                                                        mode='markers',
-                                                        name="local minimum 1",
-                                                        marker=dict(
-                                                                    color='MediumPurple',
-                                                                    size=12#,
-                                                                    # line=dict(
-                                                                    #     color='MediumPurple',
-                                                                    #     width=12
-                                                                    # )
-                                                                ),
-                                                                showlegend=True
-                                                            )
-                                                        )
-                                    
-                                    fig3.add_trace(go.Scatter(
-                                                        x=x_min2,
-                                                        y=y_min2,
-                                                        mode='markers',
-                                                        name="local minimum 2",
-                                                        marker=dict(
-                                                                    color='mediumvioletred',
-                                                                    size=12#,
-                                                                    # line=dict(
-                                                                    #     color='MediumPurple',
-                                                                    #     width=12
-                                                                    # )
-                                                                ),
-                                                                showlegend=True
-                                                            )
-                                                        )
-                                    
-                                    # Add figure title
-                                    fig3.update_layout(title_text="Minimum deflection rate")
+                            batch_minima = col1.checkbox("Check all the experiments for multiple minima (possible cracking)", key='batch_minima')
+                            col1.markdown('''
+                                        The curve is also split into the primary, secondary and tertiary creep stages. The end of the primary creep is found by change-point segmentation, 
+                                        the onset of the tertiary creep with the selected criterion.
+                                        ''')
+                            stage_criterion = col1.selectbox("Select the criterion for the onset of the tertiary creep", CREEP_STAGE_CRITERIA, index=1, key='stage_criterion')
+                            stage_offset = 0
+                            if stage_criterion == 'offset':
+                                stage_offset = col1.number_input("Type the offset from the line of the secondary creep [µm]", min_value=0.0, value=50.0, key='stage_offset')
+                            batch_stages = col1.checkbox("Segment the creep stages of all the experiments", key='batch_stages')
+
+                            # The deflection rate curve of STEP 2, or of STEP 3 if it was smoothened
+                            if sm == True:
+                                curve_t, curve_rate, curve_u = tt, moving_averages, uu_list
+                            else:
+                                curve_t, curve_rate, curve_u = t_points, dudt, u_points
+                            curve_bounds = (int(curve_t[0]+1), int(curve_t[len(curve_t)-1]+1))
 
-                                    # Set axes titles
-                                    fig3.update_xaxes(title_text="Time [h]")
-                                    fig3.update_yaxes(title_text="Deflection rate [µm/h]")
+                            col2.text("")
+                            col2.text("")
+                            if double_min == True:
+                                if auto_min == True:
+                                    minima = find_rate_minima(curve_rate, curve_t, int(minima_num))
+                                    parts = [(minimum['low'], minimum['high']) for minimum in minima]
+                                    col2.markdown(str(len(minima)) + " minimum(a) identified automatically, at " + ", ".join(f"{minimum['time']:.1f} h" for minimum in minima) + ".")
                                 else:
-                                    col2.text("")
-                                    col2.text("")
-                                    sel_limits = col2.slider("Select the bounds of the curve where the minimum is located", int(tt[0]+1), int(tt[len(tt)-1]+1), value=(int(tt[0]+1), int(tt[len(tt)-1]+1)))
-                                    # Isolate the middle part of the curve
-                                    middle_part, tt_middle = secondary_deflection(moving_averages, tt, sel_limits[0], sel_limits[1])
-
-                                    # Calculate a fitted curve
-                                    polynomial = calc_polynomial(middle_part, tt_middle)
-
-                                    # Find the local minimum
-                                    crit = polynomial.deriv().r
-                                    r_crit = crit[crit.imag==0].real
-                                    test = polynomial.deriv(2)(r_crit)
-
-                                    # Compute the local minimum excluding range boundaries
-                                    x_min1 = r_crit[test>0]
-                                    y_min1 = polynomial(x_min1)
-
-                                    # Compute a curve based on the fitted poly
-                                    xc = np.arange(int(tt_middle[0]), int(tt_middle[len(tt_middle)-1]+1), 0.02)
-                                    yc = polynomial(xc)
-
-                                    fig3 = go.Figure()
-                                    fig3.add_trace(go.Scatter(
-                                                        x=tt_middle,
-                                                        y=middle_part,
-                                                        mode='lines+markers',
-                                                        name="deflection rate",
-                                                        showlegend=True)
-                                            )
-                                    
-                                    fig3.add_trace(go.Scatter(
-                                                        x=xc,
-                                                        y=yc,
-                                                        mode='lines',
-                                                        name="fitted curve",
-                                                        line=dict(
-                                                            color='mediumvioletred'
-                                                        ),
-                                                        showlegend=True)
-                                            )
-
-                                    fig3.add_trace(go.Scatter(
-                                                        x=x_min1,
-                                                        y=y_min1,
-                                                        mode='markers',
-                                                        name="global minimum",
-                                                        marker=dict(
-                                                                    color='MediumPurple',
-                                                                    size=12#,
-                                                                    # line=dict(
-                                                                    #     color='MediumPurple',
-                                                                    #     width=12
-                                                                    # )
-                                                                ),
-                                                                showlegend=True
-                                                            )
-                                                        )
-
-                                    # Add figure title
-                                    fig3.update_layout(title_text="Minimum deflection rate")
-
-                                    # Set axes titles
-                                    fig3.update_xaxes(title_text="Time [h]")
-                                    fig3.update_yaxes(title_text="Deflection rate [µm/h]")
-                            else:
-                                if double_min == True:
-                                    col2.text("")
-                                    col2.text("")
                                     col2.markdown('''Select the bounds of those parts of the curve where there is a local minimum''')
-                                    sel_limits1 = col2.slider("First part", int(t_points[0]+1), int(t_points[len(t_points)-1]+1), value=(int(t_points[0]+1), int(t_points[len(t_points)-1]+1)))
-                                    sel_limits2 = col2.slider("Second part", int(t_points[0]+1), int(t_points[len(t_points)-1]+1), value=(int(t_points[0]+1), int(t_points[len(t_points)-1]+1)))
-
-                                    # Isolate the parts of the curve with a local minimum
-                                    middle_part1, tt_middle1 = secondary_deflection(dudt, t_points, sel_limits1[0], sel_limits1[1])
-                                    middle_part2, tt_middle2 = secondary_deflection(dudt, t_points, sel_limits2[0], sel_limits2[1])
-
-                                    # Calculate a fitted curve
-                                    polynomial1 = calc_polynomial(middle_part1, tt_middle1)
-                                    polynomial2 = calc_polynomial(middle_part2, tt_middle2)
-
-                                    # Find the local minimum
-                                    crit1 = polynomial1.deriv().r
-                                    r_crit1 = crit1[crit1.imag==0].real
-                                    test1 = polynomial1.deriv(2)(r_crit1)
+                                    parts = [col2.slider("Part " + str(j+1), curve_bounds[0], curve_bounds[1], value=curve_bounds, key='minimum_part_' + str(j+1)) for j in range(int(minima_num))]
+                            else:
+                                if auto_min == True:
+                                    parts = [automatic_bounds(col2, curve_rate, curve_t)]
+                                else:
+                                    parts = [col2.slider("Select the bounds of the curve where the minimum is located", curve_bounds[0], curve_bounds[1], value=curve_bounds)]
 
-                                    crit2 = polynomial2.deriv().r
-                                    r_crit2 = crit2[crit2.imag==0].real
-                                    test2 = polynomial2.deriv(2)(r_crit2)
+                            # Fit a polynomial to every part of the curve and find its minimum
+                            fits = [fit_local_minimum(curve_rate, curve_t, low, high) for low, high in parts]
 
-                                    # Compute the local minima excluding range boundaries
-                                    x_min1 = r_crit1[test1>0]
-                                    y_min1 = polynomial1(x_min1)
+                            fig3 = go.Figure()
+                            if len(fits) == 1:
+                                middle_part, tt_middle, polynomial, x_min1, y_min1 = fits[0]
 
-                                    x_min2 = r_crit2[test2>0]
-                                    y_min2 = polynomial2(x_min2)
+                                # Compute a curve based on the fitted poly
+                                xc = np.arange(int(tt_middle[0]), int(tt_middle[len(tt_middle)-1]+1), 0.02)
+                                yc = polynomial(xc)
+                                xc, yc = thin_trace(xc, yc)
 
-                                    fig3 = go.Figure()
-                                    fig3.add_trace(go.Scatter(
-                                                        x=t_points,
-                                                        y=dudt,
-                                                        mode='lines+markers',
-                                                        name="deflection rate",
-                                                        showlegend=True)
-                                            )
+                                fig3.add_trace(go.Scatter(
+                                                    x=tt_middle,
+                                                    y=middle_part,
+                                                    mode='lines+markers',
+                                                    name="deflection rate",
+                                                    showlegend=True)
+                                        )
+                                
+                                fig3.add_trace(go.Scatter(
+                                                    x=xc,
+                                                    y=yc,
+                                                    mode='lines',
+                                                    name="fitted curve",
+                                                    line=dict(
+                                                        color='mediumvioletred'
+                                                    ),
+                                                    showlegend=True)
+                                        )
 
-                                    fig3.add_trace(go.Scatter(
-                                                        x=x_min1,
-                                                        y=y_min1,
-                                                        mode='markers',
-                                                        name="local minimum 1",
-                                                        marker=dict(
-                                                                    color='MediumPurple',
-                                                                    size=12#,
-                                                                    # line=dict(
-                                                                    #     color='MediumPurple',
-                                                                    #     width=12
-                                                                    # )
-                                                                ),
-                                                                showlegend=True
-                                                            )
+                                fig3.add_trace(go.Scatter(
+                                                    x=x_min1,
+                                                    y=y_min1,
+                                                    mode='markers',
+                                                    name="global minimum",
+                                                    marker=dict(
+                                                                color='MediumPurple',
+                                                                size=12
+                                                            ),
+                                                            showlegend=True
                                                         )
-                                    
+                                                    )
+                            else:
+                                fig3.add_trace(go.Scatter(
+                                                    x=curve_t,
+                                                    y=curve_rate,
+                                                    mode='lines+markers',
+                                                    name="deflection rate",
+                                                    showlegend=True)
+                                        )
+                                minima_colors = ['MediumPurple', 'mediumvioletred', 'darkorange', 'seagreen', 'steelblue']
+                                for j, (middle_part, tt_middle, polynomial, x_min, y_min) in enumerate(fits):
                                     fig3.add_trace(go.Scatter(
-                                                        x=x_min2,
-                                                        y=y_min2,
+                                                        x=x_min,
+                                                        y=y_min,
                                                         mode='markers',
-                                                        name="local minimum 2",
+                                                        name="local minimum " + str(j+1),
                                                         marker=dict(
-                                                                    color='mediumvioletred',
-                                                                    size=12#,
-                                                                    # line=dict(
-                                                                    #     color='MediumPurple',
-                                                                    #     width=12
-                                                                    # )
+                                                                    color=minima_colors[j % len(minima_colors)],
+                                                                    size=12
                                                                 ),
                                                                 showlegend=True
                                                             )
                                                         )
-                                    
-                                    # Add figure title
-                                    fig3.update_layout(title_text="Minimum deflection rate")
-
-                                    # Set axes titles
-                                    fig3.update_xaxes(title_text="Time [h]")
-                                    fig3.update_yaxes(title_text="Deflection rate [µm/h]")
-                                else:
-                                    col2.text("")
-                                    col2.text("")
-                                    sel_limits = col2.slider("Select the bounds of the curve where the minimum is located", int(t_points[0]+1), int(t_points[len(t_points)-1]+1), value=(int(t_points[0]+1), int(t_points[len(t_points)-1]+1)))
-                                    # Isolate the middle part of the curve
-                                    middle_part, tt_middle = secondary_deflection(dudt, t_points, sel_limits[0], sel_limits[1])
 
-                                    # Calculate a fitted curve
-                                    polynomial = calc_polynomial(middle_part, tt_middle)
-
-                                    # Find the local minimum
-                                    crit = polynomial.deriv().r
-                                    r_crit = crit[crit.imag==0].real
-                                    test = polynomial.deriv(2)(r_crit)
-
-                                    # Compute the local minimum excluding range boundaries
-                                    x_min1 = r_crit[test>0]
-                                    y_min1 = polynomial(x_min1)
-
-                                    # Compute a curve based on the fitted poly
-                                    xc = np.arange(int(tt_middle[0]), int(tt_middle[len(tt_middle)-1]+1), 0.02)
-                                    yc = polynomial(xc)
-
-                                    fig3 = go.Figure()
-                                    fig3.add_trace(go.Scatter(
-                                                        x=tt_middle,
-                                                        y=middle_part,
-                                                        mode='lines+markers',
-                                                        name="deflection rate",
-                                                        showlegend=True)
-                                            )
-                                    
-                                    fig3.add_trace(go.Scatter(
-                                                        x=xc,
-                                                        y=yc,
-                                                        mode='lines',
-                                                        name="fitted curve",
-                                                        line=dict(
-                                                            color='mediumvioletred'
-                                                        ),
-                                                        showlegend=True)
-                                            )
-
-                                    fig3.add_trace(go.Scatter(
-                                                        x=x_min1,
-                                                        y=y_min1,
-                                                        mode='markers',
-                                                        name="global minimum",
-                                                        marker=dict(
-                                                                    color='MediumPurple',
-                                                                    size=12#,
-                                                                    # line=dict(
-                                                                    #     color='MediumPurple',
-                                                                    #     width=12
-                                                                    # )
-                                                                ),
-                                                                showlegend=True
-                                                            )
-                                                        )
+                            # Add figure title
+                            fig3.update_layout(title_text="Minimum deflection rate")
 
-                                    # Add figure title
-                                    fig3.update_layout(title_text="Minimum deflection rate")
+                            # Set axes titles
+                            fig3.update_xaxes(title_text="Time [h]")
+                            fig3.update_yaxes(title_text="Deflection rate [µm/h]")
 
-                                    # Set axes titles
-                                    fig3.update_xaxes(title_text="Time [h]")
-                                    fig3.update_yaxes(title_text="Deflection rate [µm/h]")
+                            col2.plotly_chart(rendered(fig3), use_container_width=True)
 
-                                col2.plotly_chart(fig3, use_container_width=True)
+                            stages = segment_creep_stages(curve_rate, curve_t, curve_u, stage_criterion, stage_offset)
+                            if stages is None:
+                                col2.markdown(":orange[**Note:**] The curve is too short to be split into creep stages.")
+                            else:
+                                col2.markdown("Creep stages: primary " + "{:.1f} - {:.1f} h".format(*stages['primary']) + ", secondary " + "{:.1f} - {:.1f} h".format(*stages['secondary'])
+                                              + (", tertiary " + "{:.1f} - {:.1f} h".format(*stages['tertiary']) if stages['tertiary'] is not None else ", no tertiary creep") + ".")
+
+                            # The rate curves of all the experiments (untrimmed, with the settings of STEP 2 and STEP 3), checked for multiple minima and segmented into creep stages
+                            if (batch_minima == True) or (batch_stages == True):
+                                curve_settings = (rate_estimator, int(sections_num), rate_method if rate_estimator == "Sections" else fit_order) + ((window_size, smoothing_kernel) if sm == True else ())
+                                def batch_curve(df_exp):
+                                    df_exp = elapsed_units(df_exp)
+                                    tR_exp = df_exp.TotalSeconds[len(df_exp)-1]
+                                    if rate_estimator == "Sections":
+                                        rate_exp = calculate_rate_of_variable(df_exp, 'u', tR_exp/int(sections_num), 0, tR_exp, rate_method)
+                                    else:
+                                        rate_exp = calculate_local_rate(df_exp, 'u', tR_exp/int(sections_num), 0, tR_exp, order=fit_order, points=4*int(sections_num))
+                                    if sm == True:
+                                        rate_exp = smoothen_curve(*rate_exp, window_size, smoothing_kernel)
+                                    return rate_exp
+                                curves = {name: cached_output("deflection rate curve", name, df_exp, curve_settings, lambda df_exp=df_exp: batch_curve(df_exp)) for name, df_exp in all_dfs.items()}
+                            if batch_minima == True:
+                                st.markdown("Minima of the deflection rate curves of all the experiments (the curves are not cleaned, check the flagged experiments in STEP 1 - STEP 4)")
+                                st.table(flag_multiple_minima({name: curve[:2] for name, curve in curves.items()}, k=int(minima_num) if double_min == True else 2))
+                            if batch_stages == True:
+                                st.markdown("Creep stages of all the experiments (the curves are not cleaned)")
+                                batch_stage_results = {name: cached_output("deflection creep stages", name, all_dfs[name], curve_settings + (stage_criterion, stage_offset),
+                                                                           lambda curve=curve: segment_creep_stages(*curve, stage_criterion, stage_offset)) for name, curve in curves.items()}
+                                st.table(creep_stage_table(curves, stage_criterion, stage_offset, stages=batch_stage_results))
 
                             st.markdown(''' **<p class="big-font"> :blue[STEP 5:] Results </p>** ''', unsafe_allow_html=True)
-                            
-                            time1 = x_min1[0].copy()
-                            u_rate_min1 = y_min1[0].copy()
-                            u_at_u_rate_min1 = df_lim.u[(df_lim.TotalHours>=time1)].values[0]/1000  # in mm 
-                            equiv_stress1 = (int(force)/(1.916*(u_at_u_rate_min1**0.6579)))  # in mpa 
-                            equiv_strain1 = 0.3922*((u_rate_min1/1000)**1.191)    # u_rate_min1 in mm/h
 
-                            if double_min == True:
-                                try:
-                                    time2 = x_min2[0].copy()
-                                    u_rate_min2 = y_min2[0].copy()
-                                    u_at_u_rate_min2 = df_lim.u[(df_lim.TotalHours<=time2)].values[-1]/1000  # in mm
-                                    equiv_stress2 = (int(force)/(1.916*(u_at_u_rate_min2**0.6579)))  # in mpa
-                                    equiv_strain2 =  0.3922*((u_rate_min2/1000)**1.191)    # u_rate_min2 in mm/h
-
-                                    cols = ['Experiment', 'Temperature [°C]', 'Force [N]', 'Time to rupture [h]', 'Minimum delfection rate 1 [µm/h]', 'Time at minimum delfection rate 1 [h]', 'Deflection at minimum delfection rate 1 [mm]', 'Equivalent stress 1 [MPa]', 'Equivalent strain rate 1 [1/h]', 'Minimum delfection rate 2 [µm/h]', 'Time at minimum delfection rate 2 [h]', 'Deflection at minimum delfection rate 2 [mm]', 'Equivalent stress 2 [MPa]', 'Equivalent strain rate 2 [1/h]']
-                                    spc_matrix = pd.DataFrame(columns = cols)
-                                    spc_matrix.loc[len(spc_matrix)] = [selected_exp, temp, force, tR, u_rate_min1, time1, u_at_u_rate_min1, equiv_stress1, equiv_strain1, u_rate_min2, time2, u_at_u_rate_min2, equiv_stress2, equiv_strain2]
-                                    csv = spc_matrix.to_csv().encode('utf-8')
-                                    #st.markdown(''' <span style="text-decoration:underline"> Summary: </span> ''', unsafe_allow_html=True)
-
-                                    if 'final_table' not in st.session_state:
-                                        st.session_state.final_table = False
-
-                                    def show_table():
-                                        st.session_state.final_table = not st.session_state.final_table
-
-                                    st.button('Show/Hide table', on_click=show_table)
-                                    if st.session_state.final_table:
-                                    #if st.button("Show table", key='show_final_table'):
-                                        st.table(spc_matrix)
-                                        st.text("")
-
-                                        if st.download_button(
-                                                            label="Download",
-                                                            data=csv,
-                                                            file_name=f'streamlit_output.csv',
-                                                            mime='text/csv'):
-                                            st.balloons()
-                                except IndexError:
-                                    st.markdown(":red[**Attention!!**] It was not possible to identify a second minimum. Try to further adjust the bounds.")
+                            cols = ['Experiment', 'Temperature [°C]', 'Force [N]', 'Time to rupture [h]', 'End of primary creep [h]', 'Onset of tertiary creep [h]']
+                            results = [selected_exp, temp, force, tR] + ([stages['primary'][1], stages['tertiary'][0] if stages['tertiary'] is not None else np.nan] if stages is not None else [np.nan, np.nan])
+                            missing = [j+1 for j, fit in enumerate(fits) if len(fit[3]) == 0]
+                            if (len(fits) == 0) or (len(missing) > 0):
+                                if len(fits) <= 1:
+                                    st.markdown(":red[**Attention!!**] It was not possible to identify a minimum. Try to further adjust the bounds.")
+                                else:
+                                    st.markdown(":red[**Attention!!**] It was not possible to identify the minimum " + ", ".join(str(j) for j in missing) + ". Try to further adjust the bounds.")
                             else:
-                                cols = ['Experiment', 'Temperature [°C]', 'Force [N]', 'Time to rupture [h]', 'Minimum delfection rate [µm/h]', 'Time at minimum delfection rate [h]', 'Deflection at minimum delfection rate [mm]', 'Equivalent stress [MPa]', 'Equivalent strain rate [1/h]']
+                                hours = trimmed_column(df_lim, 'TotalHours')
+                                deflections = trimmed_column(df_lim, 'u')
+                                for j, (middle_part, tt_middle, polynomial, x_min, y_min) in enumerate(fits):
+                                    number = "" if len(fits) == 1 else " " + str(j+1)
+                                    time_min = x_min[0].copy()
+                                    u_rate_min = y_min[0].copy()
+                                    u_at_u_rate_min = deflections[min(np.searchsorted(hours, time_min), len(hours)-1)]/1000  # in mm
+                                    equiv_stress = (int(force)/(1.916*(u_at_u_rate_min**0.6579)))  # in mpa
+                                    equiv_strain = 0.3922*((u_rate_min/1000)**1.191)    # u_rate_min in mm/h
+                                    cols = cols + ['Minimum delfection rate' + number + ' [µm/h]', 'Time at minimum delfection rate' + number + ' [h]', 'Deflection at minimum delfection rate' + number + ' [mm]', 'Equivalent stress' + number + ' [MPa]', 'Equivalent strain rate' + number + ' [1/h]']
+                                    results = results + [u_rate_min, time_min, u_at_u_rate_min, equiv_stress, equiv_strain]
+
                                 spc_matrix = pd.DataFrame(columns = cols)
-                                spc_matrix.loc[len(spc_matrix)] = [selected_exp, temp, force, tR, u_rate_min1, time1, u_at_u_rate_min1, equiv_stress1, equiv_strain1]
+                                spc_matrix.loc[len(spc_matrix)] = results
                                 csv = spc_matrix.to_csv().encode('utf-8')
                                 #st.markdown(''' <span style="text-decoration:underline"> Summary: </span> ''', unsafe_allow_html=True)
 
@@ -987,7 +1042,7 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     key='selected_exp'
                 )
 
-                df = all_dfs[selected_exp]
+                df = analysed_experiment(selected_exp, all_dfs[selected_exp], ('lvdt1', 'lvdt2'))    # The minutes and hours are derived for the experiment under analysis only, without the NaN values of the LVDTs
                 col1, col2 = st.columns(2)
                 stress = col1.number_input("Type in the **Stress** in MPa under which your experiment was performed", format="%0.1f")
                 temp = col2.number_input("Type in the **Temperature** in °C under which your experiment was performed", format="%0.1f")
@@ -1004,16 +1059,6 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     If this is the case, use the interactive tools of the graph on the right to zoom and hover over the datapoints and identify the time when the experiment started and the time to rupture.
                 ''')
 
-                # Remove NaN values from the selected LVDT
-                if df.lvdt1.isna().sum() > 0:
-                    df = df.dropna(subset=['lvdt1'])
-                    df.reset_index(inplace=True)
-                    df = df.drop(columns=['index'])
-                if df.lvdt2.isna().sum() > 0:
-                    df = df.dropna(subset=['lvdt2'])
-                    df.reset_index(inplace=True)
-                    df = df.drop(columns=['index'])                                
-
                 #st.write(all_lvdts_for_plot[selected_exp])
                 if all_lvdts_for_plot[selected_exp] == 'LVDT 1':
                     var = 'strain1'
@@ -1023,9 +1068,12 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     var = 'strain_avg' 
 
                 fig_toclean = go.Figure()
+                duration = max(float(df.TotalHours.iloc[-1]), 0.01)
+                zoom = col2.slider("Zoom into a time range [h] (all the records of the range are shown, up to the screen resolution)", 0.0, duration, (0.0, duration), key='zoom_' + selected_exp)
+                x_plot, y_plot = zoomed_trace(selected_exp, df, 'TotalHours', var, zoom)
                 fig_toclean.add_trace(go.Scatter(
-                                        x=df.TotalHours,
-                                        y=df[var],
+                                        x=x_plot,
+                                        y=y_plot,
                                         mode='lines+markers',
                                         name="strain uncleaned")
                             )
@@ -1034,7 +1082,16 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                                     xaxis_title="Time [h]", 
                                     yaxis_title="Strain [%]",
                                     showlegend=True)
-                col2.plotly_chart(fig_toclean, use_container_width=True)
+                col2.plotly_chart(rendered(fig_toclean), use_container_width=True)
+
+                if col1.checkbox("Suggest the bounds of all the experiments automatically", key="suggest_bounds"):
+                    plotted = {'LVDT 1': 'strain1', 'LVDT 2': 'strain2'}
+                    bounds = trim_suggestions(all_dfs, {name: plotted.get(all_lvdts_for_plot.get(name), 'strain_avg') for name in all_dfs})
+                    col1.dataframe(pd.DataFrame([[name, b['start_hours'], b['end_hours'], b['start_value'], b['end_value']] for name, b in bounds.items() if b is not None],
+                                                columns=['Experiment', 'Start [h]', 'Rupture [h]', 'Initial strain [%]', 'Strain at rupture [%]']), hide_index=True)
+                    if bounds[selected_exp] is not None:
+                        col1.button("Apply the suggested bounds of " + selected_exp, on_click=apply_trim_bounds,
+                                    args=(bounds[selected_exp]['start_hours'], bounds[selected_exp]['end_hours']))
 
                 stop_start = col1.number_input("Type the value of the identified (from the graph) time [in hours] of initial strain (when the full load started being applied).",  key='stop_start')
                 stop_end = col1.number_input("Type the value of the identified (from the graph) time [in hours] to rupture.", key='stop_end')
@@ -1045,31 +1102,24 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     if stop_end == 0:
                         catch_tR_error = True
                     if (stop_end > stop_start):
-                        df_lim = df[(df.TotalHours >= stop_start) & (df.TotalHours <= stop_end)]
-                        df_lim.reset_index(inplace=True)
-                        df_lim = df_lim.drop(columns=['index'])
-                        df_lim[var] = df_lim[var] - df_lim.loc[0, var]
-
-                        df_lim['TotalSeconds'] = df_lim['DateTime'].diff().dt.total_seconds().cumsum()       # Calculate the total amount of seconds since the start of the experimet
-                        df_lim.loc[0, 'TotalSeconds'] = 0
-                        df_lim['TotalSeconds'] = df_lim['TotalSeconds'].astype(int, errors='ignore')
-                        df_lim['TotalMinutes'] = df_lim['TotalSeconds']/60
-                        df_lim['TotalHours'] = df_lim['TotalSeconds']/3600
-
-                        tR = df_lim.TotalHours[len(df_lim)-1]
+                        df_lim = trim_experiment(df, 'TotalHours', stop_start, stop_end, zero=[var])
+                        if len(df_lim) < 2:
+                            st.markdown(" :red[**Attention!!**] There are no data between the entered times. The algorithm will proceed with the input data as is.")
+                            df_lim = df
+                        tR = trimmed_column(df_lim, 'TotalHours', -1)
                     else: 
                         st.markdown(" :red[**Attention!!**] The time to rupture **cannot** precede the time of initial strain. You haven't entered the values correctly.")
                 else:
                     if (stop_end != 0):
-                        df_lim = df[:int(stop_end)]
-                        df_lim.reset_index(inplace=True)
-                        df_lim = df_lim.drop(columns=['index'])
-
-                        tR = df_lim.TotalHours[len(df_lim)-1]
+                        df_lim = trim_experiment(df, 'TotalHours', None, stop_end)
+                        if len(df_lim) < 2:
+                            st.markdown(" :red[**Attention!!**] There are no data between the entered times. The algorithm will proceed with the input data as is.")
+                            df_lim = df
+                        tR = trimmed_column(df_lim, 'TotalHours', -1)
                     else:
                         st.markdown(" :red[**Attention!!**] **No cleaning was performed.** If the initial timestep and the time to rupture will not be specified, the algorithm will proceed with the input data as is.")
-                        df_lim = df.copy()
-                        tR = df_lim.TotalHours[len(df_lim)-1]
+                        df_lim = df
+                        tR = trimmed_column(df_lim, 'TotalHours', -1)
 
                 t0 = 0                                
 
@@ -1086,8 +1136,17 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                             of all the data points that fall into each section.
                             ''')  
                 col1.markdown(''' <span style="text-decoration:underline"> **:green[Hint:]** </span> The suggested number of sections is **between 100 and 400**.''', unsafe_allow_html=True)
+                col1.markdown(''' 
+                            Alternatively, the sliding window estimator calculates the strain rate as the slope of a local fit 
+                            in a window (as wide as a section) centred on every point, which gives a denser and less noisy curve.
+                            ''')
 
+                rate_estimator = col1.radio("Choose the rate estimator", ["Sections", "Sliding window"], horizontal=True, key="rate_estimator")
                 sections_num = col1.number_input("Type the number of sections", min_value=50, max_value=500, step=10, key="sections_to_split")
+                if rate_estimator == "Sections":
+                    rate_method = col1.selectbox("Select the regression of each section (the robust ones limit the pull of spikes and glitches)", RATE_METHODS, key="rate_method")
+                else:
+                    fit_order = col1.select_slider("Select the order of the local fit (1: linear regression, 2-3: Savitzky-Golay)", [1, 2, 3], key="fit_order")
 
                 if catch_tR_error == True:
                     st.markdown(":red[**Attention!!**] You need to enter a valid time to rupture.")
@@ -1096,7 +1155,11 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
 
                     col1.markdown("Each of the " + str(sections_num) + " sections contains " + str(math.floor(interval_points)) + " data points.")
 
-                    dvardt, t_points, var_points = calculate_rate_of_variable(df_lim, var, interval_points, t0, tR)
+                    # t0, tR and the interval are in hours here, the rate estimators take seconds
+                    if rate_estimator == "Sections":
+                        dvardt, t_points, var_points = calculate_rate_of_variable(df_lim, var, interval_points*3600, t0*3600, tR*3600, rate_method)
+                    else:
+                        dvardt, t_points, var_points = calculate_local_rate(df_lim, var, interval_points*3600, t0*3600, tR*3600, order=fit_order, points=4*int(sections_num))
 
                     fig1 = make_subplots(specs=[[{"secondary_y": True}]])
                     fig1.add_trace(go.Scatter(
@@ -1126,7 +1189,7 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     fig1.update_yaxes(title_text="Strain [%]", secondary_y=False)
                     fig1.update_yaxes(title_text="Strain rate [1/h]", secondary_y=True)
 
-                    col2.plotly_chart(fig1, use_container_width=True)
+                    col2.plotly_chart(rendered(fig1), use_container_width=True)
 
                     def secondary_strain(str_rate, time, lower_limit, upper_limit):
                         tt_middle = []
@@ -1159,8 +1222,17 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     col2.text("")
 
                     st.write(stop_start, stop_end, t0, tR, t_points)#[0], t_points[len(t_points)-1], len(t_points))
-                    sel_limits = col2.slider("Select the bounds of the curve where the minimum is located", int(t_points[0].min())+1, int(t_points[len(t_points)-1].max()), value=(int(t_points[0].min())+1, int(t_points[len(t_points)-1].max())))#int(stop_start), int(stop_end), value=(int(stop_start), int(stop_end)))
+                    auto_min = col1.checkbox("Find the part of the minimum automatically", key='auto_min')
+                    if auto_min == True:
+                        sel_limits = automatic_bounds(col2, dvardt, t_points)
+                    else:
+                        sel_limits = col2.slider("Select the bounds of the curve where the minimum is located", int(t_points[0].min())+1, int(t_points[len(t_points)-1].max()), value=(int(t_points[0].min())+1, int(t_points[len(t_points)-1].max())))#int(stop_start), int(stop_end), value=(int(stop_start), int(stop_end)))
                     st.write(sel_limits)    
+                    stage_criterion = col1.selectbox("Select the criterion for the onset of the tertiary creep", CREEP_STAGE_CRITERIA, index=1, key='stage_criterion')
+                    stage_offset = 0
+                    if stage_criterion == 'offset':
+                        stage_offset = col1.number_input("Type the offset from the line of the secondary creep [%]", min_value=0.0, value=1.0, key='stage_offset')
+                    batch_stages = col1.checkbox("Segment the creep stages of all the experiments", key='batch_stages')
 
                     # Isolate the middle part of the curve
                     middle_part, tt_middle = secondary_strain(dvardt, t_points, sel_limits[0], sel_limits[1])
@@ -1180,6 +1252,7 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     # Compute a curve based on the fitted poly
                     xc = np.arange(int(tt_middle[0]), int(tt_middle[len(tt_middle)-1]+1), 0.02)
                     yc = polynomial(xc)
+                    xc, yc = thin_trace(xc, yc)
 
                     fig3 = go.Figure()
                     fig3.add_trace(go.Scatter(
@@ -1225,17 +1298,46 @@ with st.expander(" :arrow_right: Analysis", expanded=False):
                     fig3.update_xaxes(title_text="Time [h]")
                     fig3.update_yaxes(title_text="Strain rate [1/h]")
 
-                    col2.plotly_chart(fig3, use_container_width=True)
+                    col2.plotly_chart(rendered(fig3), use_container_width=True)
+
+                    stages = segment_creep_stages(dvardt, t_points, var_points, stage_criterion, stage_offset)
+                    if stages is None:
+                        col2.markdown(":orange[**Note:**] The curve is too short to be split into creep stages.")
+                    else:
+                        col2.markdown("Creep stages: primary " + "{:.1f} - {:.1f} h".format(*stages['primary']) + ", secondary " + "{:.1f} - {:.1f} h".format(*stages['secondary'])
+                                      + (", tertiary " + "{:.1f} - {:.1f} h".format(*stages['tertiary']) if stages['tertiary'] is not None else ", no tertiary creep") + ".")
+
+                    # The strain rate curves of all the experiments (untrimmed, with the settings of STEP 2), segmented into creep stages
+                    if batch_stages == True:
+                        plotted = {'LVDT 1': 'strain1', 'LVDT 2': 'strain2'}
+                        curve_settings = (rate_estimator, int(sections_num), rate_method if rate_estimator == "Sections" else fit_order)
+                        def batch_curve(df_exp, var_exp):
+                            df_exp = elapsed_units(df_exp)
+                            tR_exp = df_exp.TotalSeconds[len(df_exp)-1]
+                            if rate_estimator == "Sections":
+                                return calculate_rate_of_variable(df_exp, var_exp, tR_exp/int(sections_num), 0, tR_exp, rate_method)
+                            return calculate_local_rate(df_exp, var_exp, tR_exp/int(sections_num), 0, tR_exp, order=fit_order, points=4*int(sections_num))
+                        curves = {}
+                        batch_stage_results = {}
+                        for name, df_exp in all_dfs.items():
+                            var_exp = plotted.get(all_lvdts_for_plot.get(name), 'strain_avg')
+                            curves[name] = cached_output("strain rate curve", name, df_exp, curve_settings + (var_exp,), lambda: batch_curve(df_exp, var_exp))
+                            batch_stage_results[name] = cached_output("strain creep stages", name, df_exp, curve_settings + (var_exp, stage_criterion, stage_offset),
+                                                                      lambda: segment_creep_stages(*curves[name], stage_criterion, stage_offset))
+                        st.markdown("Creep stages of all the experiments (the curves are not cleaned)")
+                        st.table(creep_stage_table(curves, stage_criterion, stage_offset, stages=batch_stage_results))
 
                     st.markdown(''' **<p class="big-font"> :blue[STEP 4:] Results </p>** ''', unsafe_allow_html=True)
                     
                     time1 = x_min1[0].copy()
                     str_rate_min1 = y_min1[0].copy()
-                    str_at_u_rate_min1 = df_lim[var][(df_lim.TotalHours>=time1)].values[0]/1000  # in mm 
+                    hours = trimmed_column(df_lim, 'TotalHours')
+                    str_at_u_rate_min1 = trimmed_column(df_lim, var)[min(np.searchsorted(hours, time1), len(hours)-1)]/1000  # in mm 
 
-                    cols = ['Experiment', 'Temperature [°C]', 'Stress [N]', 'Time to rupture [h]', 'Minimum strain rate [1/h]', 'Time at minimum strain rate [h]', 'Strain at minimum strain rate [%]']
+                    cols = ['Experiment', 'Temperature [°C]', 'Stress [N]', 'Time to rupture [h]', 'End of primary creep [h]', 'Onset of tertiary creep [h]', 'Minimum strain rate [1/h]', 'Time at minimum strain rate [h]', 'Strain at minimum strain rate [%]']
+                    stage_times = [stages['primary'][1], stages['tertiary'][0] if stages['tertiary'] is not None else np.nan] if stages is not None else [np.nan, np.nan]
                     uc_matrix = pd.DataFrame(columns = cols)
-                    uc_matrix.loc[len(uc_matrix)] = [selected_exp, temp, stress, tR, str_rate_min1, time1, str_at_u_rate_min1]
+                    uc_matrix.loc[len(uc_matrix)] = [selected_exp, temp, stress, tR] + stage_times + [str_rate_min1, time1, str_at_u_rate_min1]
                     csv = uc_matrix.to_csv().encode('utf-8')
 
                     if 'final_table' not in st.session_state:
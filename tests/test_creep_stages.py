@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from Tools.SMPA_tools_WV01 import creep_stage_table, segment_creep_stages
+
+
+def rate_curve(n, seed):
+    # A rate curve with a decreasing primary, a flat secondary and an increasing tertiary part, with noise
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(0, 1000, n))
+    rates = np.exp(-times/60) + 0.05 + np.where(times > 750, (times - 750)*0.004, 0)
+    return rates*np.exp(rng.normal(0, 0.05, n)), times
+
+
+def exhaustive_change_points(rates, times, min_points=5):
+    # The squared errors of the line fitted to every part [first, last) of the log rates, then the best of all the pairs of change points
+    n = len(rates)
+    y = np.log(rates)
+    costs = np.zeros((n + 1, n + 1))
+    for first in range(n):
+        x = times[first:] - times[first]
+        v = y[first:] - y[first]
+        count = np.arange(1, n - first + 1)
+        sx, sy, sxx, sxy, syy = (np.cumsum(a) for a in (x, v, x*x, x*v, v*v))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sxx_centred = sxx - sx*sx/count
+            errors = syy - sy*sy/count - np.where(sxx_centred > 0, (sxy - sx*sy/count)**2/sxx_centred, 0)
+        costs[first, first + 1:] = np.maximum(errors, 0)
+    best = (np.inf, None, None)
+    for first in range(min_points, n - 2*min_points + 1):
+        for second in range(first + min_points, n - min_points + 1):
+            total = costs[0, first] + costs[first, second] + costs[second, n]
+            if total < best[0]:
+                best = (total, first, second)
+    return best
+
+
+@pytest.mark.parametrize('n, seed', [(60, 0), (200, 1), (700, 2)])
+def test_change_points_are_the_best_of_all_the_pairs(n, seed):
+    rates, times = rate_curve(n, seed)
+    stages = segment_creep_stages(rates, times, criterion='change point')
+    total, first, second = exhaustive_change_points(rates, times)
+    assert stages['change_points'] == (times[first], times[second])
+    assert stages['primary'] == (times[0], times[first])
+    assert stages['tertiary'] == (times[second], times[-1])
+
+
+def test_short_curves_are_not_segmented():
+    rates, times = rate_curve(14, 0)
+    assert segment_creep_stages(rates, times) is None
+
+
+def test_the_table_reuses_the_segmented_experiments():
+    curves = {name: rate_curve(100, seed) + (None,) for seed, name in enumerate(['a', 'b'])}
+    stages = {'a': segment_creep_stages(*curves['a'][:2], criterion='change point')}
+    table = creep_stage_table(curves, 'change point', stages=stages)
+    assert list(table['Experiment']) == ['a', 'b']
+    assert table.loc[0, 'End of primary creep [h]'] == stages['a']['primary'][1]
+    assert table.loc[1, 'End of primary creep [h]'] == segment_creep_stages(*curves['b'][:2], criterion='change point')['primary'][1]
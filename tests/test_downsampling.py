@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from Tools.SMPA_tools_WV01 import downsample_indices
+
+
+def noisy_curve(n=20011, seed=6):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = np.sin(x/500) + rng.normal(0, 0.1, n)
+    y[rng.integers(0, n, 20)] += 5
+    return x, y
+
+
+def loop_minmax(y, max_points):
+    # The first and last record and the minimum and maximum of every bucket of consecutive records, bucket by bucket
+    n = len(y)
+    size = -(-n//max(1, max_points//2 - 1))
+    index = {0, n - 1}
+    for start in range(0, n, size):
+        index.add(start + int(np.argmin(y[start:start+size])))
+        index.add(start + int(np.argmax(y[start:start+size])))
+    return np.array(sorted(index))
+
+
+def loop_lttb(x, y, threshold):
+    # The reference Largest Triangle Three Buckets algorithm, point by point
+    n = len(x)
+    every = (n - 2)/(threshold - 2)
+    index = [0]
+    a = 0
+    for bucket in range(threshold - 2):
+        low = int(np.floor(bucket*every)) + 1
+        high = int(np.floor((bucket + 1)*every)) + 1
+        next_low = high
+        next_high = min(int(np.floor((bucket + 2)*every)) + 1, n - 1)
+        if bucket == threshold - 3:
+            average_x, average_y = x[n-1], y[n-1]
+        else:
+            average_x, average_y = x[next_low:next_high].mean(), y[next_low:next_high].mean()
+        best, best_area = low, -1.0
+        for k in range(low, high):
+            area = abs((x[a] - average_x)*(y[k] - y[a]) - (x[a] - x[k])*(average_y - y[a]))
+            if area > best_area:
+                best, best_area = k, area
+        index.append(best)
+        a = best
+    index.append(n - 1)
+    return np.array(index)
+
+
+@pytest.mark.parametrize('max_points', [10, 1000, 4000])
+def test_minmax_matches_the_extremes_of_every_bucket(max_points):
+    x, y = noisy_curve()
+    index = downsample_indices(x, y, max_points, 'minmax')
+    np.testing.assert_array_equal(index, loop_minmax(y, max_points))
+    assert len(index) <= max_points
+
+
+@pytest.mark.parametrize('max_points', [10, 1000, 4000])
+def test_lttb_matches_the_point_by_point_algorithm(max_points):
+    x, y = noisy_curve()
+    index = downsample_indices(x, y, max_points, 'lttb')
+    np.testing.assert_array_equal(index, loop_lttb(x, y, max_points))
+
+
+def test_nan_records_are_left_out_and_short_curves_are_kept():
+    x, y = noisy_curve(100)
+    y[[3, 50]] = np.nan
+    np.testing.assert_array_equal(downsample_indices(x, y, 4000), np.delete(np.arange(100), [3, 50]))
+    index = downsample_indices(x, y, 20, 'minmax')
+    assert not np.isin([3, 50], index).any()
+    assert (index[0], index[-1]) == (0, 99)
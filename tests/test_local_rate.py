@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from Tools.SMPA_tools_WV01 import _convolve_valid, calculate_local_rate
+
+
+def noisy_curve(n=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    seconds = np.cumsum(rng.uniform(30, 90, n))
+    hours = seconds/3600
+    u = 40*(1 - np.exp(-hours/4)) + 1.5*hours + rng.normal(0, 0.3, n)
+    return pd.DataFrame({'TotalSeconds': seconds, 'TotalHours': hours, 'u': u})
+
+
+def brute_force_rates(dataframe, window, centres):
+    seconds = dataframe.TotalSeconds.to_numpy()
+    rates = []
+    for centre in centres:
+        inside = np.abs(seconds - centre) <= window/2
+        rates.append(np.polyfit(seconds[inside]/3600, dataframe.u.to_numpy()[inside], 1)[0])
+    return np.asarray(rates)
+
+
+def test_linear_windows_at_every_record_match_a_fit_per_window():
+    dataframe = noisy_curve()
+    t0, tR = dataframe.TotalSeconds.iloc[0], dataframe.TotalSeconds.iloc[-1]
+    window = 2*3600
+    rates, times, values = calculate_local_rate(dataframe, 'u', window, t0, tR)
+    centres = dataframe.TotalSeconds.to_numpy()
+    np.testing.assert_allclose(times, centres/3600)
+    np.testing.assert_allclose(rates, brute_force_rates(dataframe, window, centres), rtol=1e-6, atol=1e-9)
+    np.testing.assert_array_equal(values, dataframe.u.to_numpy())
+
+
+def test_linear_windows_on_a_grid_match_a_fit_per_window():
+    dataframe = noisy_curve()
+    t0, tR = dataframe.TotalSeconds.iloc[0], dataframe.TotalSeconds.iloc[-1]
+    window = 3*3600
+    rates, times, values = calculate_local_rate(dataframe, 'u', window, t0, tR, points=300)
+    centres = np.asarray(times)*3600
+    assert len(centres) == 300
+    np.testing.assert_allclose(rates, brute_force_rates(dataframe, window, centres), rtol=1e-6, atol=1e-9)
+
+
+def test_polynomial_windows_give_the_derivative_of_a_quadratic():
+    seconds = np.arange(0, 200*3600, 300.0)
+    hours = seconds/3600
+    dataframe = pd.DataFrame({'TotalSeconds': seconds, 'TotalHours': hours, 'u': 0.01*hours**2 + 2*hours + 5})
+    rates, times, values = calculate_local_rate(dataframe, 'u', 10*3600, 0, seconds[-1], order=2)
+    assert len(rates) > 0
+    np.testing.assert_allclose(rates, 0.02*np.asarray(times) + 2, rtol=1e-6)
+
+
+def test_wide_kernels_are_convolved_as_numpy_does():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=5000)
+    for width in (5, 64, 65, 801):
+        kernel = rng.normal(size=width)
+        np.testing.assert_allclose(_convolve_valid(x, kernel), np.convolve(x, kernel, mode='valid'), atol=1e-9)
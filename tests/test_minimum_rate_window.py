@@ -0,0 +1,54 @@
+import numpy as np
+
+from Tools.SMPA_tools_WV01 import find_minimum_rate_window
+
+
+def rate_curve(n=300, seed=3):
+    # A bathtub shaped rate curve: decreasing primary rate, a minimum and an accelerating tertiary rate
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(0, 500, n))
+    rates = 5*np.exp(-times/40) + 0.2 + 0.002*np.exp(times/70) + rng.normal(0, 0.02, n)
+    return rates, times
+
+
+def brute_force_scores(rates, times, min_points=10, sizes=16):
+    # The adjusted R² of a second degree polynomial fitted to every candidate window on its own, for the windows with a convex fit
+    # and its vertex in the middle half of the window (every start is a candidate, the curve is shorter than max_starts)
+    n = len(rates)
+    centre = (times[0] + times[-1])/2
+    half_span = (times[-1] - times[0])/2
+    z = (times - centre)/half_span
+    scores = {}
+    for length in np.unique(np.geomspace(max(min_points, 4), n, sizes).astype('int64')):
+        for first in range(0, n - length + 1):
+            last = first + length
+            c2, c1, c0 = np.polyfit(z[first:last], rates[first:last], 2)
+            residuals = rates[first:last] - np.polyval([c2, c1, c0], z[first:last])
+            sst = ((rates[first:last] - rates[first:last].mean())**2).sum()
+            score = 1 - ((residuals**2).sum()/sst)*(length - 1)/(length - 3)
+            vertex = -c1/(2*c2)
+            quarter = (z[last - 1] - z[first])/4
+            if (c2 > 0) and (z[first] + quarter <= vertex <= z[last - 1] - quarter):
+                scores[(first, last)] = score
+    return scores, centre, half_span
+
+
+def test_the_best_window_is_the_best_of_all_the_windows():
+    rates, times = rate_curve()
+    result = find_minimum_rate_window(rates, times)
+    scores, centre, half_span = brute_force_scores(rates, times)
+    best = max(scores.values())
+    np.testing.assert_allclose(result['score'], best, rtol=1e-6)
+
+    first = int(np.searchsorted(times, result['low']))
+    last = int(np.searchsorted(times, result['high'])) + 1
+    np.testing.assert_allclose(scores[(first, last)], best, rtol=1e-6)
+
+    c2, c1, c0 = np.polyfit(times[first:last], rates[first:last], 2)
+    np.testing.assert_allclose(result['time'], -c1/(2*c2), rtol=1e-6)
+    np.testing.assert_allclose(result['rate'], np.polyval([c2, c1, c0], -c1/(2*c2)), rtol=1e-6)
+
+
+def test_no_window_on_a_concave_curve():
+    times = np.linspace(0, 100, 200)
+    assert find_minimum_rate_window(1 - (times/100)**2, times) is None
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from Tools.SMPA_tools_WV01 import build_minmax_pyramid, query_pyramid
+
+
+def brute_force_query(x, y, low, high, max_points):
+    # The records of the range, or the first and last record of the range and the minimum and maximum of the part of every bucket
+    # (of the finest size with at most max_points/2 buckets in the range) that lies in the range
+    first = int(np.searchsorted(x, low, side='left'))
+    last = int(np.searchsorted(x, high, side='right'))
+    if last - first <= max_points:
+        return np.arange(first, last)
+    size = 2
+    while (last - 1)//size - first//size + 1 > max_points//2:
+        size *= 2
+    index = {first, last - 1}
+    for bucket in range(first//size, (last - 1)//size + 1):
+        start, end = max(first, bucket*size), min(last, (bucket + 1)*size)
+        if np.isnan(y[start:end]).all():
+            index.add(start)
+            continue
+        index.add(start + int(np.nanargmin(y[start:end])))
+        index.add(start + int(np.nanargmax(y[start:end])))
+    return np.array(sorted(index))
+
+
+@pytest.fixture
+def curve():
+    rng = np.random.default_rng(7)
+    n = 100003
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = np.cumsum(rng.normal(0, 1, n))
+    y[rng.integers(0, n, 500)] = np.nan
+    return x, y
+
+
+def test_queries_match_the_extremes_of_every_bucket(curve):
+    x, y = curve
+    pyramid = build_minmax_pyramid(x, y)
+    rng = np.random.default_rng(8)
+    for query in range(50):
+        low, high = np.sort(rng.uniform(x[0] - 10, x[-1] + 10, 2))
+        max_points = int(rng.choice([100, 1000, 4000]))
+        index = query_pyramid(pyramid, low, high, max_points)
+        np.testing.assert_array_equal(index, brute_force_query(x, y, low, high, max_points))
+        assert len(index) <= max_points + 2
+
+
+def test_the_whole_curve_and_short_ranges(curve):
+    x, y = curve
+    pyramid = build_minmax_pyramid(x, y)
+    np.testing.assert_array_equal(query_pyramid(pyramid, None, None, 4000), brute_force_query(x, y, x[0], x[-1], 4000))
+    np.testing.assert_array_equal(query_pyramid(pyramid, x[10], x[200], 4000), np.arange(10, 201))
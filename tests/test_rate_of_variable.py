@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Tools.SMPA_tools_WV01 import _rate_of_variable_loop, calculate_rate_of_variable
+
+
+def creep_curve(n=3000, seed=0):
+    # An irregularly sampled creep curve: fast primary creep, constant secondary rate and accelerating tertiary creep, with noise
+    rng = np.random.default_rng(seed)
+    seconds = np.cumsum(rng.uniform(30, 90, n))
+    seconds -= seconds[0]
+    hours = seconds/3600
+    u = 50*(1 - np.exp(-hours/5)) + 2*hours + 0.02*np.exp(hours/8) + rng.normal(0, 0.5, n)
+    return pd.DataFrame({'TotalSeconds': seconds, 'TotalHours': hours, 'u': u})
+
+
+@pytest.mark.parametrize('method', ['least squares', 'huber'])
+def test_sections_match_the_walk_over_the_records(method):
+    dataframe = creep_curve()
+    tR = dataframe.TotalSeconds.iloc[-1]
+    rates, times, values = calculate_rate_of_variable(dataframe, 'u', tR/150, 0, tR, method)
+    expected_rates, expected_times, expected_values = _rate_of_variable_loop(dataframe, 'u', tR/150, 0, tR, method)
+    assert len(rates) == len(expected_rates) > 0
+    np.testing.assert_allclose(rates, expected_rates, rtol=1e-6, atol=1e-9)
+    np.testing.assert_array_equal(times, expected_times)
+    np.testing.assert_array_equal(values, expected_values)
+
+
+def test_sections_of_a_line_have_its_slope():
+    seconds = np.arange(0, 100*3600, 60.0)
+    dataframe = pd.DataFrame({'TotalSeconds': seconds, 'TotalHours': seconds/3600, 'u': 3*seconds/3600 + 7})
+    rates, times, values = calculate_rate_of_variable(dataframe, 'u', 3600, 0, seconds[-1])
+    np.testing.assert_allclose(rates, 3)
+    np.testing.assert_allclose(values, 3*np.asarray(times) + 7)
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from Tools.SMPA_tools_WV01 import HUBER_CONSTANT, _group_medians, _section_slopes
+
+
+def sections_with_glitches(seed=4, sections=20, length=200):
+    # Lines of different slopes, with noise and 5% of spikes
+    rng = np.random.default_rng(seed)
+    x = np.arange(sections*length, dtype='float64')
+    slopes = rng.uniform(-2, 2, sections)
+    y = np.repeat(slopes, length)*(x - np.repeat(x[::length], length)) + rng.normal(0, 0.5, len(x))
+    spikes = rng.random(len(x)) < 0.05
+    y[spikes] += rng.choice([-1, 1], spikes.sum())*rng.uniform(50, 200, spikes.sum())
+    first = np.arange(0, len(x), length)
+    return x, y, first, first + length, slopes
+
+
+def huber_slope(x, y):
+    # Iteratively reweighted least squares of one section, with the Huber weights and the MAD scale of the first fit
+    weights = np.ones(len(x))
+    slope, intercept = np.polyfit(x, y, 1)
+    scale = 1.4826*np.median(np.abs(y - slope*x - intercept))
+    for iteration in range(50):
+        residuals = np.abs(y - slope*x - intercept)
+        with np.errstate(divide='ignore'):
+            weights = np.minimum(1, HUBER_CONSTANT*scale/residuals)
+        previous = slope
+        slope, intercept = np.polyfit(x, y, 1, w=np.sqrt(weights))
+        if np.isclose(slope, previous, rtol=1e-6, atol=0):
+            break
+    return slope
+
+
+def theil_sen_slope(x, y):
+    i, j = np.triu_indices(len(x), 1)
+    return np.median((y[j] - y[i])/(x[j] - x[i]))
+
+
+def repeated_median_slope(x, y):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pair_slopes = (y[None, :] - y[:, None])/(x[None, :] - x[:, None])
+    np.fill_diagonal(pair_slopes, np.nan)
+    return np.median(np.nanmedian(pair_slopes, axis=1))
+
+
+def test_group_medians_match_the_median_of_every_group():
+    rng = np.random.default_rng(5)
+    group = rng.integers(0, 30, 5000)
+    values = rng.normal(size=5000)
+    values[rng.random(5000) < 0.1] = np.nan
+    medians = _group_medians(group, values, 31)
+    for k in range(30):
+        np.testing.assert_allclose(medians[k], np.nanmedian(values[group == k]))
+    assert np.isnan(medians[30])
+
+
+def test_least_squares_matches_a_fit_per_section():
+    x, y, first, last, slopes = sections_with_glitches()
+    expected = [np.polyfit(x[a:b], y[a:b], 1)[0] for a, b in zip(first, last)]
+    np.testing.assert_allclose(_section_slopes(x, y, first, last, 'least squares'), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_huber_matches_the_reweighted_fit_of_every_section():
+    x, y, first, last, slopes = sections_with_glitches()
+    expected = [huber_slope(x[a:b], y[a:b]) for a, b in zip(first, last)]
+    np.testing.assert_allclose(_section_slopes(x, y, first, last, 'huber'), expected, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize('method, exact', [('theil-sen', theil_sen_slope), ('repeated median', repeated_median_slope)])
+def test_sampled_estimators_are_close_to_the_exact_ones(method, exact):
+    # The robust estimators use random subsets of the pairs of every section, hence they agree with the exact (all pairs) estimators
+    # within the noise of the slopes, and they are not pulled by the spikes as the least squares slopes are
+    x, y, first, last, slopes = sections_with_glitches()
+    estimated = _section_slopes(x, y, first, last, method)
+    expected = np.array([exact(x[a:b], y[a:b]) for a, b in zip(first, last)])
+    np.testing.assert_allclose(estimated, expected, atol=0.01)
+    np.testing.assert_allclose(estimated, slopes, atol=0.02)
+    np.testing.assert_array_equal(estimated, _section_slopes(x, y, first, last, method))
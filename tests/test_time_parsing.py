@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from Tools.SMPA_tools_WV01 import follow_csv, parse_time_column, read_csv_columns
+
+
+def write_day_first_log(path, hours=480):
+    # An hourly log from the 1st of January: all the days of the first 12 days are up to 12, hence they read month first as well
+    times = pd.date_range('2024-01-01', periods=hours, freq='h')
+    pd.DataFrame({'Time': times.strftime('%d/%m/%Y %H:%M'), 'u': np.arange(hours, dtype='float64')}).to_csv(path, index=False)
+    return times
+
+
+def test_read_csv_columns_corrects_the_chunks_read_month_first(tmp_path):
+    path = str(tmp_path / 'dayfirst.csv')
+    times = write_day_first_log(path)
+    dataframe = read_csv_columns(path, 'Time', ['u'], chunksize=100)
+    assert dataframe.attrs['coerced_timestamps'] == 0
+    np.testing.assert_array_equal(dataframe['Time'].to_numpy(), times.to_numpy())
+    np.testing.assert_array_equal(dataframe['u'].to_numpy(), np.arange(len(times)))
+
+
+def test_read_csv_columns_keeps_the_time_parsers_of_the_caller(tmp_path):
+    path = str(tmp_path / 'dayfirst.csv')
+    times = write_day_first_log(path)
+    time_parsers = {}
+    read_csv_columns(path, 'Time', ['u'], chunksize=100, source='rig', time_parsers=time_parsers)
+    assert time_parsers['rig']['format'].startswith('%d/%m')
+    dataframe = read_csv_columns(path, 'Time', ['u'], chunksize=100, source='rig', time_parsers=time_parsers)
+    np.testing.assert_array_equal(dataframe['Time'].to_numpy(), times.to_numpy())
+
+
+def test_follow_csv_corrects_the_rows_read_month_first(tmp_path):
+    path = str(tmp_path / 'dayfirst.csv')
+    times = write_day_first_log(path)
+    lines = open(path).read().splitlines(keepends=True)
+    live = tmp_path / 'live.csv'
+    live.write_text(''.join(lines[:100]))
+    dataframe, state = follow_csv(str(live), ['Time', 'u'], ['DateTime', 'u'])
+    live.write_text(''.join(lines))
+    dataframe, state = follow_csv(str(live), ['Time', 'u'], ['DateTime', 'u'], state)
+    np.testing.assert_array_equal(dataframe['DateTime'].to_numpy(), times.to_numpy())
+    np.testing.assert_allclose(dataframe['TotalSeconds'].to_numpy(), np.arange(len(times))*3600.0)
+
+
+def test_parse_time_column_remembers_the_parser_per_source():
+    time_parsers = {}
+    first, coerced = parse_time_column(pd.Series(['01/02/2024 00:00', '13/02/2024 00:00']), 'rig', time_parsers)
+    assert coerced == 0
+    assert list(first) == [pd.Timestamp('2024-02-01'), pd.Timestamp('2024-02-13')]
+    second, coerced = parse_time_column(pd.Series(['03/02/2024 00:00']), 'rig', time_parsers)
+    assert list(second) == [pd.Timestamp('2024-02-03')]
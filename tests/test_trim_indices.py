@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Tools.SMPA_tools_WV01 import calculate_t0_index, calculate_tR_index
+
+
+def loop_t0_index(dataframe, first_magn_check):
+    # The walk over the records of the original calculate_t0_index
+    du = dataframe.u.diff().abs()
+    for i in range(int(len(dataframe)/2)):
+        if du[i] > first_magn_check:
+            return i - 1
+
+
+def loop_tR_index(dataframe, first_magn_check, second_magn_check, variable):
+    # The walk over the records of the original calculate_tR_index
+    dvar = dataframe[variable].diff().abs()
+    for i in range(int(len(dataframe))-1, int(len(dataframe)/2), -1):
+        if dvar[i] > first_magn_check:
+            key = i
+            for j in range(i-1, int(len(dataframe)/5), -1):
+                if dvar[j] > second_magn_check:
+                    key = j
+            return key - 1
+
+
+def deflection_curve(seed):
+    # Noise before the load, a jump when the load is applied, creep, and jumps at the rupture (some of them before the last one)
+    rng = np.random.default_rng(seed)
+    n = 2000
+    u = np.cumsum(rng.exponential(1.0, n))
+    start = rng.integers(10, 500)
+    u[start:] += 300
+    for jump in rng.integers(n//5, n, 3):
+        u[jump:] += rng.uniform(250, 450)
+    u[rng.integers(n//2 + 1, n):] += 800
+    return pd.DataFrame({'u': u})
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_indices_match_the_walk_over_the_records(seed):
+    dataframe = deflection_curve(seed)
+    assert calculate_t0_index(dataframe.copy(), 20, 5) == loop_t0_index(dataframe, 20)
+    assert calculate_tR_index(dataframe.copy(), 500, 200, 'u') == loop_tR_index(dataframe, 500, 200, 'u')
+
+
+def test_indices_without_any_jump_raise():
+    dataframe = pd.DataFrame({'u': np.arange(100, dtype='float64')})
+    with pytest.raises(ValueError):
+        calculate_t0_index(dataframe, 20, 5)
+    with pytest.raises(ValueError):
+        calculate_tR_index(dataframe, 500, 200, 'u')